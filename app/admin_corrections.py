@@ -1,15 +1,19 @@
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app import attendance_state
 from app.admin_auth import get_current_admin
 from app.database import get_db
 from app.models import AttendanceEvent, DailyAttendance
+from app.monthly_summary import SummaryDelta
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-def _get_or_create_daily(db: Session, day: str, name: str) -> DailyAttendance:
+def _get_or_create_daily(db: Session, day: str, name: str, summary: SummaryDelta) -> DailyAttendance:
+    """Row daily (baru dibuat jika belum ada). Row lama dicatat ke `summary` sebelum diubah."""
     d = (
         db.query(DailyAttendance)
         .filter(DailyAttendance.day == day, DailyAttendance.person_name == name)
@@ -18,8 +22,8 @@ def _get_or_create_daily(db: Session, day: str, name: str) -> DailyAttendance:
     if d is None:
         d = DailyAttendance(day=day, person_name=name)
         db.add(d)
-        db.commit()
-        db.refresh(d)
+    else:
+        summary.remove(d)
     return d
 
 @router.patch("/events/{event_id}")
@@ -37,6 +41,14 @@ def correct_event(
     if not new_name:
         raise HTTPException(status_code=400, detail="final_name is required")
 
+    try:
+        return _apply_correction(db, event_id, new_name, edit_note, admin)
+    except IntegrityError:
+        # record_batch di worker lain membuat daily row yang sama bersamaan (uq_day_person) — ulangi sekali
+        db.rollback()
+        return _apply_correction(db, event_id, new_name, edit_note, admin)
+
+def _apply_correction(db: Session, event_id: int, new_name: str, edit_note: str | None, admin) -> dict:
     ev = db.query(AttendanceEvent).filter(AttendanceEvent.id == event_id).one_or_none()
     if ev is None:
         raise HTTPException(status_code=404, detail="event not found")
@@ -66,8 +78,9 @@ def correct_event(
     ev.final_name = new_name
     db.add(ev)
 
-    old_daily = _get_or_create_daily(db, day, old_name) if old_name else None
-    new_daily = _get_or_create_daily(db, day, new_name)
+    summary = SummaryDelta()
+    old_daily = _get_or_create_daily(db, day, old_name, summary) if old_name else None
+    new_daily = _get_or_create_daily(db, day, new_name, summary)
 
     # clear old slot if it matches this event timestamp
     if old_daily:
@@ -91,7 +104,15 @@ def correct_event(
     new_daily.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
     db.add(new_daily)
 
+    # Pindahkan kontribusi event dari rekap bulanan orang lama ke orang baru
+    if old_daily:
+        summary.add(old_daily)
+    summary.add(new_daily)
+    summary.apply(db)
+
     db.commit()
+    # Cooldown & in/out kedua orang berubah — muat ulang state harian dari DB
+    attendance_state.invalidate()
 
     return {
         "ok": True,
@@ -1,4 +1,18 @@
-from fastapi import APIRouter, Depends, Query
+"""
+Log absensi untuk dashboard admin: /admin/events dan /admin/daily.
+
+Dua mode pagination:
+    - offset/limit (lama) — makin lambat untuk halaman dalam, hasil bergeser saat ada event baru
+    - cursor (keyset) — `?cursor=` dari header `X-Next-Cursor` response sebelumnya;
+      query melanjutkan tepat setelah row terakhir memakai index, tanpa OFFSET
+Header `X-Next-Cursor` dikirim di kedua mode selama halaman penuh (mungkin masih ada row).
+"""
+import base64
+from datetime import datetime
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, tuple_
 from sqlalchemy.orm import Session
 
 from app.admin_auth import get_current_admin
@@ -7,8 +21,32 @@ from app.models import AttendanceEvent, DailyAttendance
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    """Cursor opaque → list nilai keyset. Cursor rusak/dimodifikasi → 400."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, UnicodeDecodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _check_mode(cursor: str | None, offset: int):
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset, not both")
+
 @router.get("/events")
 def list_events(
+    response: Response,
     db: Session = Depends(get_db),
     _admin=Depends(get_current_admin),
     limit: int = Query(default=50, ge=1, le=500),
@@ -17,8 +55,9 @@ def list_events(
     name: str | None = Query(default=None),
     day: str | None = Query(default=None),
     device_id: str | None = Query(default=None),
+    cursor: str | None = Query(default=None, description="Dari header X-Next-Cursor"),
 ):
-
+    _check_mode(cursor, offset)
 
     q = db.query(AttendanceEvent)
     if status:
@@ -30,7 +69,24 @@ def list_events(
     if device_id:
         q = q.filter(AttendanceEvent.device_id == device_id)
 
-    rows = q.order_by(AttendanceEvent.ts.desc()).offset(offset).limit(limit).all()
+    if cursor:
+        ts_str, last_id = _decode_cursor(cursor, 2)
+        try:
+            last_ts = datetime.fromisoformat(ts_str)
+        except (TypeError, ValueError) as err:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from err
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Keyset (ts, id) < (last_ts, last_id), urutan sama dengan ORDER BY di bawah.
+        # Row-value comparison agar MySQL bisa range scan di index ts (InnoDB: ts + PK id)
+        q = q.filter(tuple_(AttendanceEvent.ts, AttendanceEvent.id) < tuple_(last_ts, last_id))
+
+    # id sebagai tie-breaker agar urutan stabil untuk event dengan ts sama
+    q = q.order_by(AttendanceEvent.ts.desc(), AttendanceEvent.id.desc())
+    rows = (q if cursor else q.offset(offset)).limit(limit).all()
+
+    if len(rows) == limit:
+        response.headers[_CURSOR_HEADER] = _encode_cursor(rows[-1].ts.isoformat(), rows[-1].id)
 
     return [
         {
@@ -54,6 +110,7 @@ def list_events(
 
 @router.get("/daily")
 def list_daily(
+    response: Response,
     db: Session = Depends(get_db),
     _admin=Depends(get_current_admin),
     day: str | None = Query(default=None),
@@ -61,8 +118,9 @@ def list_daily(
     name: str | None = Query(default=None),
     limit: int = Query(default=200, ge=1, le=2000),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Dari header X-Next-Cursor"),
 ):
-
+    _check_mode(cursor, offset)
 
     q = db.query(DailyAttendance)
     if day:
@@ -72,7 +130,21 @@ def list_daily(
     if name:
         q = q.filter(DailyAttendance.person_name == name)
 
-    rows = q.order_by(DailyAttendance.day.desc(), DailyAttendance.person_name.asc()).offset(offset).limit(limit).all()
+    if cursor:
+        last_day, last_name = _decode_cursor(cursor, 2)
+        if not isinstance(last_day, str) or not isinstance(last_name, str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Keyset untuk ORDER BY day DESC, person_name ASC (unik via uq_day_person)
+        q = q.filter(or_(
+            DailyAttendance.day < last_day,
+            and_(DailyAttendance.day == last_day, DailyAttendance.person_name > last_name),
+        ))
+
+    q = q.order_by(DailyAttendance.day.desc(), DailyAttendance.person_name.asc())
+    rows = (q if cursor else q.offset(offset)).limit(limit).all()
+
+    if len(rows) == limit:
+        response.headers[_CURSOR_HEADER] = _encode_cursor(rows[-1].day, rows[-1].person_name)
 
     return [
         {
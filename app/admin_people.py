@@ -2,13 +2,26 @@ import os
 
 import cv2
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 import numpy as np
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from app import gallery_store, readiness
 from app.admin_auth import get_current_admin  # JWT dependency
 from app.database import get_db
+from app.logging_config import get_logger
 from app.models import Embedding, Person
-from app.recog import detect_faces_from_bgr, embed_face, rebuild_cache
+from app.recog import (
+    detect_faces_from_bgr,
+    embed_faces,
+    rebuild_cache,
+    remove_person_cache,
+    update_person_cache,
+)
+from app.vector_codec import encode_vec
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -16,10 +29,7 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 _ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
 _MAX_FILE_SIZE = 10 * 1024 * 1024   # 10 MB
 _ENROLL_MAX_IMAGE_PX = 1000         # resize jika dimensi image > ini
-
-
-def _vec_to_csv(v: np.ndarray) -> str:
-    return ",".join(f"{x:.6f}" for x in v.tolist())
+_ENROLL_EMBED_BATCH = 24            # crop per forward pass (4 foto x 6 augmentasi)
 
 
 @router.get("/persons")
@@ -77,37 +87,17 @@ def augment_image(bgr: np.ndarray) -> list:
     return augmented  # Returns 6 images total
 
 
-@router.post("/persons/{person_id}/enroll")
-async def enroll_person(
-    person_id: int,
-    files: list[UploadFile] = File(...),
-    db: Session = Depends(get_db),
-    _admin=Depends(get_current_admin),
-):
-    person = db.query(Person).filter(Person.id == person_id).one_or_none()
-    if person is None:
-        raise HTTPException(status_code=404, detail="person not found")
-
-    if not files:
-        raise HTTPException(status_code=400, detail="no files uploaded")
-
+def _extract_face_crops(payloads: list[bytes]) -> tuple[list[np.ndarray], int, int]:
+    """
+    Decode + detect wajah untuk semua foto, lalu augmentasi crop-nya.
+    Image full-size dibuang setelah deteksi; yang disimpan hanya crop kecil.
+    Return (augmented_crops, images_processed, skipped).
+    """
+    crops: list[np.ndarray] = []
     added = 0
     skipped = 0
-    augmented_count = 0
-
-    for f in files:
-        if f.filename:
-            ext = os.path.splitext(f.filename)[1].lower()
-            if ext not in _ALLOWED_EXTENSIONS:
-                skipped += 1
-                continue
-
-        img_bytes = await f.read()
-
-        if not img_bytes or len(img_bytes) > _MAX_FILE_SIZE:
-            skipped += 1
-            continue
 
+    for img_bytes in payloads:
         arr = np.frombuffer(img_bytes, dtype=np.uint8)
         bgr = cv2.imdecode(arr, cv2.IMREAD_COLOR)
         if bgr is None:
@@ -119,44 +109,90 @@ async def enroll_person(
             scale = _ENROLL_MAX_IMAGE_PX / max(h, w)
             bgr = cv2.resize(bgr, (int(w * scale), int(h * scale)))
 
-        # FIXED: Detect face FIRST, then augment and embed the face crop
+        # Detect face FIRST, then augment and embed the face crop
         # This matches the recognition flow for consistent embeddings
         faces = detect_faces_from_bgr(bgr, max_faces=1)
-
         if not faces:
-            # No face detected in this image
             skipped += 1
             continue
 
-        # Get the face crop (already aligned by detect_faces_from_bgr)
-        face_crop = faces[0]["crop"]
+        # Augmentasi FACE CROP (bukan full image) — 6 varian per foto
+        crops.extend(augment_image(faces[0]["crop"]))
+        added += 1
 
-        # Generate augmented versions of the FACE CROP (not full image)
-        aug_faces = augment_image(face_crop)
+    return crops, added, skipped
 
-        for aug_face in aug_faces:
-            try:
-                emb = embed_face(aug_face)
-                db.add(Embedding(person_id=person.id, vec_csv=_vec_to_csv(emb)))
-                augmented_count += 1
-            except Exception:
-                continue
 
-        added += 1
+def _enroll_embeddings(db: Session, person: Person, payloads: list[bytes]) -> dict:
+    """Pipeline enroll sinkron (CPU-bound) — dijalankan di threadpool, bukan di event loop."""
+    crops, added, skipped = _extract_face_crops(payloads)
+
+    rows = []
+    for start in range(0, len(crops), _ENROLL_EMBED_BATCH):
+        chunk = crops[start:start + _ENROLL_EMBED_BATCH]
+        try:
+            embs = embed_faces(chunk)
+        except Exception as e:
+            logger.warning(f"Enroll embedding batch failed ({len(chunk)} crops): {e}")
+            continue
+        rows.extend({"person_id": person.id, "vec_blob": encode_vec(emb)} for emb in embs)
 
+    # Bulk insert dalam satu statement (executemany), bukan N kali db.add()
+    if rows:
+        db.execute(insert(Embedding), rows)
+    gallery_store.bump_version(db)
     db.commit()
-    rebuild_cache(db)
+    # Incremental: hanya centroid orang ini yang dihitung ulang
+    update_person_cache(db, person)
 
     return {
         "ok": True,
         "person_id": person.id,
         "name": person.name,
         "images_processed": added,
-        "embeddings_added": augmented_count,
+        "embeddings_added": len(rows),
         "skipped": skipped,
     }
 
 
+@router.post("/persons/{person_id}/enroll")
+async def enroll_person(
+    person_id: int,
+    files: list[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    _admin=Depends(get_current_admin),
+    _ready=Depends(readiness.require_ready),
+):
+    person = db.query(Person).filter(Person.id == person_id).one_or_none()
+    if person is None:
+        raise HTTPException(status_code=404, detail="person not found")
+
+    if not files:
+        raise HTTPException(status_code=400, detail="no files uploaded")
+
+    payloads: list[bytes] = []
+    skipped = 0
+
+    for f in files:
+        if f.filename:
+            ext = os.path.splitext(f.filename)[1].lower()
+            if ext not in _ALLOWED_EXTENSIONS:
+                skipped += 1
+                continue
+
+        img_bytes = await f.read()
+
+        if not img_bytes or len(img_bytes) > _MAX_FILE_SIZE:
+            skipped += 1
+            continue
+
+        payloads.append(img_bytes)
+
+    result = await run_in_threadpool(_enroll_embeddings, db, person, payloads)
+    result["skipped"] += skipped
+    return result
+
+
 
 @router.delete("/persons/{person_id}")
 def delete_person(
@@ -168,11 +204,13 @@ def delete_person(
     if person is None:
         raise HTTPException(status_code=404, detail="person not found")
 
+    name = person.name
     db.query(Embedding).filter(Embedding.person_id == person_id).delete()
     db.delete(person)
+    gallery_store.bump_version(db)
     db.commit()
 
-    rebuild_cache(db)
+    remove_person_cache(db, name)
     return {"ok": True, "deleted_person_id": person_id}
 
 @router.post("/rebuild_cache")
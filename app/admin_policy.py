@@ -0,0 +1,69 @@
+import re
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.admin_auth import get_current_admin
+from app.database import get_db
+from app.models import AttendancePolicy
+from app.policy import get_policy, invalidate_policy_cache
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+_TIME_FIELDS = ("in_start_time", "late_after_time", "out_start_time", "out_end_time")
+_TIME_RE = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+def _policy_dict(db: Session) -> dict:
+    p = get_policy(db)
+    return {
+        "timezone": p.timezone,
+        "in_start_time": p.in_start_time,
+        "late_after_time": p.late_after_time,
+        "out_start_time": p.out_start_time,
+        "out_end_time": p.out_end_time,
+        "retention_days": p.retention_days,
+        "updated_at": p.updated_at.isoformat() if p.updated_at else None,
+    }
+
+@router.get("/policy")
+def read_policy(
+    db: Session = Depends(get_db),
+    _admin=Depends(get_current_admin),
+):
+    return _policy_dict(db)
+
+@router.put("/policy")
+def update_policy(
+    payload: dict,
+    db: Session = Depends(get_db),
+    _admin=Depends(get_current_admin),
+):
+    changes = {}
+    for field in _TIME_FIELDS:
+        if field in payload:
+            value = str(payload[field]).strip()
+            if not _TIME_RE.match(value):
+                raise HTTPException(status_code=400, detail=f"{field} must be HH:MM")
+            changes[field] = value
+    if "timezone" in payload:
+        try:
+            ZoneInfo(str(payload["timezone"]))
+        except (ZoneInfoNotFoundError, ValueError) as err:
+            raise HTTPException(status_code=400, detail="unknown timezone") from err
+        changes["timezone"] = str(payload["timezone"])
+    if "retention_days" in payload:
+        if not isinstance(payload["retention_days"], int) or payload["retention_days"] < 1:
+            raise HTTPException(status_code=400, detail="retention_days must be a positive integer")
+        changes["retention_days"] = payload["retention_days"]
+    if not changes:
+        raise HTTPException(status_code=400, detail="no policy fields given")
+
+    get_policy(db)  # pastikan row id=1 ada
+    row = db.get(AttendancePolicy, 1)
+    for field, value in changes.items():
+        setattr(row, field, value)
+    db.commit()
+    # Berlaku langsung di worker ini dan di worker lain (generation policy naik)
+    invalidate_policy_cache()
+    return _policy_dict(db)
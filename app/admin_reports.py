@@ -1,98 +1,136 @@
+from collections.abc import Callable, Iterator
 import csv
 from datetime import timedelta
 import io
 
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
 from sqlalchemy.orm import Session
 
+from app import monthly_summary
 from app.admin_auth import get_current_admin
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models import AttendanceEvent, DailyAttendance
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Export CSV di-stream: row diambil per _EXPORT_CHUNK_ROWS (server-side cursor di MySQL)
+# dan CSV dikirim per ~_EXPORT_FLUSH_BYTES, jadi memori tetap kecil berapa pun rentangnya.
+_EXPORT_CHUNK_ROWS = 1000
+_EXPORT_FLUSH_BYTES = 64 * 1024
+
 @router.get("/reports/monthly")
 def report_monthly(
     month: str = Query(..., description="YYYY-MM"),
+    by_day: bool = Query(False, description="Sertakan rekap per hari"),
     db: Session = Depends(get_db),
     _admin=Depends(get_current_admin),
 ):
-    """Get monthly attendance summary"""
-    rows = db.query(DailyAttendance).filter(DailyAttendance.day.startswith(month)).all()
-
-    summary: dict[str, dict] = {}
-    for r in rows:
-        s = summary.setdefault(
-            r.person_name,
-            {"person_name": r.person_name, "days_present": 0, "late_count": 0, "missing_out": 0},
-        )
-        if r.in_time is not None:
-            s["days_present"] += 1
-            if r.in_is_late:
-                s["late_count"] += 1
-        if r.in_time is not None and r.out_time is None:
-            s["missing_out"] += 1
-
-    return {"month": month, "total_records": len(rows), "summary": [summary[k] for k in sorted(summary.keys())]}
+    """Get monthly attendance summary (dari tabel monthly_summary, lihat app/monthly_summary.py)"""
+    rows = monthly_summary.get_month(db, month)
+
+    result = {
+        "month": month,
+        "total_records": sum(r.records for r in rows),
+        "summary": [
+            {
+                "person_name": r.person_name,
+                "days_present": r.days_present,
+                "late_count": r.late_count,
+                "missing_out": r.missing_out,
+            }
+            for r in rows
+        ],
+    }
+
+    if by_day:
+        days = db.execute(
+            select(DailyAttendance.day, *monthly_summary.presence_columns())
+            .where(DailyAttendance.day.startswith(month))
+            .group_by(DailyAttendance.day)
+            .order_by(DailyAttendance.day)
+        ).all()
+        result["days"] = [
+            {
+                "day": d.day,
+                "present": int(d.days_present),
+                "late_count": int(d.late_count),
+                "missing_out": int(d.missing_out),
+            }
+            for d in days
+        ]
+
+    return result
+
+
+def _stream_csv(stmt: Select, header: list[str], format_row: Callable) -> Iterator[str]:
+    """
+    Generator CSV bertahap. Memakai session sendiri (bukan get_db) karena body
+    response masih di-stream setelah endpoint return.
+    """
+    db = SessionLocal()
+    try:
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(header)
+        rows = db.execute(stmt.execution_options(yield_per=_EXPORT_CHUNK_ROWS))
+        for r in rows:
+            writer.writerow(format_row(r))
+            if output.tell() >= _EXPORT_FLUSH_BYTES:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+    finally:
+        db.close()
+
+
+def _wib_time(ts) -> str:
+    # Convert UTC to WIB (UTC+7)
+    return (ts + timedelta(hours=7)).strftime("%H:%M:%S") if ts else ""
 
 
 @router.get("/reports/export/csv")
 def export_csv(
     month: str = Query(None, description="Optional: YYYY-MM filter"),
-    db: Session = Depends(get_db),
     _admin=Depends(get_current_admin),
 ):
     """Export attendance data as CSV file"""
 
-    # Query daily attendance records
-    query = db.query(DailyAttendance)
+    # Query daily attendance records (kolom saja, tanpa ORM object)
+    stmt = select(
+        DailyAttendance.day,
+        DailyAttendance.person_name,
+        DailyAttendance.in_time,
+        DailyAttendance.out_time,
+        DailyAttendance.in_is_late,
+    )
     if month:
-        query = query.filter(DailyAttendance.day.startswith(month))
-
-    rows = query.order_by(DailyAttendance.day.desc(), DailyAttendance.person_name).all()
-
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
+        stmt = stmt.where(DailyAttendance.day.startswith(month))
+    stmt = stmt.order_by(DailyAttendance.day.desc(), DailyAttendance.person_name)
 
-    # Header
-    writer.writerow([
+    header = [
         "Tanggal",
         "Nama",
         "Jam Masuk (WIB)",
         "Jam Pulang (WIB)",
         "Status Terlambat"
-    ])
+    ]
 
-    # Data rows
-    for r in rows:
-        # Convert UTC to WIB (UTC+7)
-        in_time_str = ""
-        out_time_str = ""
-
-        if r.in_time:
-            in_wib = r.in_time + timedelta(hours=7)
-            in_time_str = in_wib.strftime("%H:%M:%S")
-
-        if r.out_time:
-            out_wib = r.out_time + timedelta(hours=7)
-            out_time_str = out_wib.strftime("%H:%M:%S")
-
-        writer.writerow([
+    def format_row(r) -> list:
+        return [
             r.day,
             r.person_name,
-            in_time_str,
-            out_time_str,
+            _wib_time(r.in_time),
+            _wib_time(r.out_time),
             "Terlambat" if r.in_is_late else "Tepat Waktu"
-        ])
+        ]
 
-    # Prepare response
-    output.seek(0)
     filename = f"absensi_{month or 'all'}.csv"
 
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _stream_csv(stmt, header, format_row),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -101,22 +139,26 @@ def export_csv(
 @router.get("/reports/export/events/csv")
 def export_events_csv(
     day: str = Query(None, description="Optional: YYYY-MM-DD filter"),
-    db: Session = Depends(get_db),
     _admin=Depends(get_current_admin),
 ):
     """Export all attendance events as CSV"""
 
-    query = db.query(AttendanceEvent).filter(AttendanceEvent.status == "ok")
+    stmt = select(
+        AttendanceEvent.id,
+        AttendanceEvent.day,
+        AttendanceEvent.ts,
+        AttendanceEvent.device_id,
+        AttendanceEvent.final_name,
+        AttendanceEvent.predicted_name,
+        AttendanceEvent.event_type,
+        AttendanceEvent.status,
+        AttendanceEvent.is_late,
+    ).where(AttendanceEvent.status == "ok")
     if day:
-        query = query.filter(AttendanceEvent.day == day)
+        stmt = stmt.where(AttendanceEvent.day == day)
+    stmt = stmt.order_by(AttendanceEvent.ts.desc())
 
-    rows = query.order_by(AttendanceEvent.ts.desc()).all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Header
-    writer.writerow([
+    header = [
         "ID",
         "Tanggal",
         "Jam (WIB)",
@@ -125,30 +167,24 @@ def export_events_csv(
         "Tipe",
         "Status",
         "Terlambat"
-    ])
-
-    for r in rows:
-        ts_str = ""
-        if r.ts:
-            ts_wib = r.ts + timedelta(hours=7)
-            ts_str = ts_wib.strftime("%H:%M:%S")
+    ]
 
-        writer.writerow([
+    def format_row(r) -> list:
+        return [
             r.id,
             r.day,
-            ts_str,
+            _wib_time(r.ts),
             r.device_id,
             r.final_name or r.predicted_name or "-",
             r.event_type or "-",
             r.status,
             "Ya" if r.is_late else "Tidak"
-        ])
+        ]
 
-    output.seek(0)
     filename = f"events_{day or 'all'}.csv"
 
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _stream_csv(stmt, header, format_row),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
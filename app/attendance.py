@@ -3,24 +3,77 @@ Attendance Logic with Time Rules
 - IN: anytime, but late if after late_after_time (from policy)
 - OUT: only allowed between out_start_time and out_end_time (from policy)
 - Only record successful events (status ok)
+
+Penolakan yang tidak menulis apa-apa (cooldown, duplicate, OUT di luar jendela)
+diputuskan dari state in-memory (app/attendance_state.py) tanpa query DB.
 """
 from datetime import datetime, timedelta, timezone
 from datetime import time as dtime
-from zoneinfo import ZoneInfo
 
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app import attendance_state
+from app.attendance_state import PersonDayState
 from app.config import settings
 from app.models import AttendanceEvent, DailyAttendance
+from app.monthly_summary import SummaryDelta
+from app.policy import PolicyData
+
+
+def _cooldown(person_name: str) -> dict:
+    return {
+        "status": "cooldown",
+        "event_type": None,
+        "is_late": False,
+        "audio_text": f"Halo {person_name}, mohon tunggu sebentar.",
+    }
+
+
+def _duplicate(person_name: str) -> dict:
+    return {
+        "status": "duplicate",
+        "event_type": None,
+        "is_late": False,
+        "audio_text": f"Halo {person_name}, absensi hari ini sudah lengkap.",
+    }
+
+
+def _out_window_rejection(person_name: str, current_time: dtime, out_start: dtime, out_end: dtime) -> dict | None:
+    if current_time < out_start:
+        return {
+            "status": "reject_out_early",
+            "event_type": None,
+            "is_late": False,
+            "audio_text": f"Halo {person_name}, absensi pulang belum dibuka. Buka jam 14:00.",
+        }
+    if current_time > out_end:
+        return {
+            "status": "reject_out_late",
+            "event_type": None,
+            "is_late": False,
+            "audio_text": f"Halo {person_name}, absensi pulang sudah ditutup.",
+        }
+    return None
 
 
-def _parse_time(time_str: str) -> dtime:
-    """Parse time string HH:MM to datetime.time object"""
-    try:
-        parts = time_str.strip().split(":")
-        return dtime(int(parts[0]), int(parts[1]))
-    except (ValueError, IndexError):
-        return dtime(8, 0)  # Default fallback
+def _memory_rejection(
+    state: PersonDayState,
+    person_name: str,
+    now_utc_naive: datetime,
+    current_time: dtime,
+    out_start: dtime,
+    out_end: dtime,
+) -> dict | None:
+    """Keputusan tanpa tulis (cooldown / duplicate / OUT di luar jendela) dari state in-memory."""
+    if state.last_ok_ts and (now_utc_naive - state.last_ok_ts) < timedelta(seconds=settings.cooldown_seconds):
+        return _cooldown(person_name)
+    if state.in_time is not None and state.out_time is not None:
+        return _duplicate(person_name)
+    if state.in_time is not None:
+        return _out_window_rejection(person_name, current_time, out_start, out_end)
+    return None
 
 
 def decide_and_record(
@@ -30,133 +83,187 @@ def decide_and_record(
     device_id: str,
     distance: float | None,
     status: str,
-    policy_timezone: str,
-    in_start_time: str,
-    late_after_time: str,
-    out_start_time: str,
-    out_end_time: str = "17:00",  # New parameter with default
+    policy: PolicyData,
     snapshot_path: str | None = None,
 ) -> dict:
     """
     Attendance logic with time rules (from policy):
     - IN: always allowed, late label if after late_after_time
     - OUT: only allowed between out_start_time and out_end_time
+    Satu wajah; lihat record_batch untuk semua wajah dalam satu frame.
+    """
+    return record_batch(
+        db,
+        [{"person_name": person_name, "distance": distance, "status": status, "snapshot_path": snapshot_path}],
+        device_id=device_id,
+        policy=policy,
+    )[0]
+
+
+def record_batch(
+    db: Session,
+    faces: list[dict],
+    *,
+    device_id: str,
+    policy: PolicyData,
+    _retry_on_conflict: bool = True,
+) -> list[dict]:
+    """
+    Catat absensi semua wajah dari satu frame dalam SATU transaksi.
+
+    faces: [{"person_name", "distance", "status", "snapshot_path"?}, ...]
+    Return satu hasil per wajah (urutan sama), format seperti decide_and_record.
+
+    Penolakan dari state in-memory tidak query DB. Sisanya: satu query daily rows,
+    satu query event ok terakhir (untuk semua nama), lalu semua event + update
+    daily di-commit sekali.
     """
-    # Parse policy times dynamically
-    LATE_AFTER = _parse_time(late_after_time)
-    OUT_START = _parse_time(out_start_time)
-    OUT_END = _parse_time(out_end_time)
+    # Jam policy sudah di-parse sekali di PolicyData (app/policy.py)
+    LATE_AFTER = policy.late_after
+    OUT_START = policy.out_start
+    OUT_END = policy.out_end
 
-    tz = ZoneInfo(policy_timezone)
-    now_local = datetime.now(tz=tz)
+    now_local = datetime.now(tz=policy.tz)
     day_str = now_local.date().isoformat()
-    now_utc_naive = now_local.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+    now_utc_naive = now_local.astimezone(timezone.utc).replace(tzinfo=None)
     current_time = now_local.timetz().replace(tzinfo=None)
 
-    # Skip recording for non-ok status
-    if status != "ok":
-        return {"status": status, "event_type": None, "is_late": False, "audio_text": None}
+    results: list[dict | None] = [None] * len(faces)
+    pending: dict[str, int] = {}  # nama → index wajah pertama yang perlu ditulis
 
-    # Check cooldown
-    last = (
-        db.query(AttendanceEvent)
+    for i, face in enumerate(faces):
+        name = face["person_name"]
+        # Skip recording for non-ok status
+        if face["status"] != "ok":
+            results[i] = {"status": face["status"], "event_type": None, "is_late": False, "audio_text": None}
+        elif name in pending:
+            # Nama yang sama dua kali dalam satu frame → yang kedua cooldown
+            results[i] = _cooldown(name)
+        else:
+            # Fast path: tolak dari state in-memory, tanpa query DB
+            state = attendance_state.get(db, day_str, name)
+            results[i] = _memory_rejection(state, name, now_utc_naive, current_time, OUT_START, OUT_END)
+            if results[i] is None:
+                pending[name] = i
+
+    if not pending:
+        return results
+
+    # Write path: validasi ulang terhadap DB (event dari worker lain), satu query per tabel
+    names = list(pending)
+    last_ok = dict(
+        db.query(AttendanceEvent.final_name, func.max(AttendanceEvent.ts))
         .filter(
             AttendanceEvent.day == day_str,
-            AttendanceEvent.final_name == person_name,
+            AttendanceEvent.final_name.in_(names),
             AttendanceEvent.status == "ok",
         )
-        .order_by(AttendanceEvent.ts.desc())
-        .first()
+        .group_by(AttendanceEvent.final_name)
+        .all()
     )
-    if last and (now_utc_naive - last.ts) < timedelta(seconds=settings.cooldown_seconds):
-        return {
-            "status": "cooldown",
-            "event_type": None,
-            "is_late": False,
-            "audio_text": f"Halo {person_name}, mohon tunggu sebentar.",
-        }
+    dailies = {
+        d.person_name: d
+        for d in db.query(DailyAttendance).filter(DailyAttendance.day == day_str, DailyAttendance.person_name.in_(names))
+    }
 
-    # Get or create daily attendance
-    daily = (
-        db.query(DailyAttendance)
-        .filter(DailyAttendance.day == day_str, DailyAttendance.person_name == person_name)
-        .one_or_none()
-    )
-    if daily is None:
-        daily = DailyAttendance(day=day_str, person_name=person_name)
-        db.add(daily)
-        db.commit()
-        db.refresh(daily)
-
-    event_type = None
-    is_late = False
-    audio_text = None
-    final_status = "ok"
-
-    if daily.in_time is None:
-        # IN - check if late
-        event_type = "IN"
-        is_late = (current_time > LATE_AFTER)
-        daily.in_time = now_utc_naive
-        daily.in_is_late = is_late
-
-        if is_late:
-            audio_text = f"Halo {person_name}, absensi masuk tercatat. Anda terlambat."
-        else:
-            audio_text = f"Halo {person_name}, absensi masuk berhasil."
-
-    elif daily.out_time is None:
-        # OUT - check time window (14:00 - 16:00)
-        if current_time < OUT_START:
-            return {
-                "status": "reject_out_early",
-                "event_type": None,
-                "is_late": False,
-                "audio_text": f"Halo {person_name}, absensi pulang belum dibuka. Buka jam 14:00.",
-            }
-        elif current_time > OUT_END:
-            return {
-                "status": "reject_out_late",
-                "event_type": None,
-                "is_late": False,
-                "audio_text": f"Halo {person_name}, absensi pulang sudah ditutup.",
-            }
-        else:
+    updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    written: list[tuple[str, PersonDayState]] = []
+    summary = SummaryDelta()
+
+    for name, i in pending.items():
+        last_ts = last_ok.get(name)
+        if last_ts and (now_utc_naive - last_ts) < timedelta(seconds=settings.cooldown_seconds):
+            attendance_state.update(day_str, name, last_ok_ts=last_ts)
+            results[i] = _cooldown(name)
+            continue
+
+        daily = dailies.get(name)
+        is_new = daily is None
+        if is_new:
+            daily = DailyAttendance(day=day_str, person_name=name)
+            db.add(daily)
+
+        if daily.in_time is None:
+            # IN - check if late
+            if not is_new:
+                summary.remove(daily)
+            event_type = "IN"
+            is_late = (current_time > LATE_AFTER)
+            daily.in_time = now_utc_naive
+            daily.in_is_late = is_late
+
+            if is_late:
+                audio_text = f"Halo {name}, absensi masuk tercatat. Anda terlambat."
+            else:
+                audio_text = f"Halo {name}, absensi masuk berhasil."
+
+        elif daily.out_time is None:
+            # OUT - check time window
+            rejection = _out_window_rejection(name, current_time, OUT_START, OUT_END)
+            if rejection is not None:
+                attendance_state.update(day_str, name, in_time=daily.in_time, in_is_late=bool(daily.in_is_late))
+                results[i] = rejection
+                continue
+            summary.remove(daily)
             event_type = "OUT"
+            is_late = False
             daily.out_time = now_utc_naive
-            audio_text = f"Terima kasih {person_name}, absensi pulang berhasil."
+            audio_text = f"Terima kasih {name}, absensi pulang berhasil."
 
-    else:
-        # Already complete
-        return {
-            "status": "duplicate",
-            "event_type": None,
-            "is_late": False,
-            "audio_text": f"Halo {person_name}, absensi hari ini sudah lengkap.",
-        }
+        else:
+            # Already complete
+            attendance_state.update(
+                day_str, name, in_time=daily.in_time, in_is_late=bool(daily.in_is_late), out_time=daily.out_time
+            )
+            results[i] = _duplicate(name)
+            continue
 
-    daily.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
-    db.add(daily)
+        daily.updated_at = updated_at
+        db.add(daily)
+        summary.add(daily)
 
-    # Record successful event
-    ev = AttendanceEvent(
-        day=day_str,
-        ts=now_utc_naive,
-        device_id=device_id,
-        predicted_name=person_name,
-        final_name=person_name,
-        event_type=event_type,
-        is_late=is_late,
-        status=final_status,
-        distance=distance,
-        snapshot_path=snapshot_path,
-    )
-    db.add(ev)
-    db.commit()
+        # Record successful event
+        db.add(AttendanceEvent(
+            day=day_str,
+            ts=now_utc_naive,
+            device_id=device_id,
+            predicted_name=name,
+            final_name=name,
+            event_type=event_type,
+            is_late=is_late,
+            status="ok",
+            distance=faces[i]["distance"],
+            snapshot_path=faces[i].get("snapshot_path"),
+        ))
+        # Nilai diambil sebelum commit (setelah commit atribut ORM expired → SELECT ulang)
+        written.append((name, PersonDayState(
+            last_ok_ts=now_utc_naive, in_time=daily.in_time, in_is_late=bool(daily.in_is_late), out_time=daily.out_time
+        )))
+        results[i] = {"status": "ok", "event_type": event_type, "is_late": is_late, "audio_text": audio_text}
 
-    return {
-        "status": final_status,
-        "event_type": event_type,
-        "is_late": is_late,
-        "audio_text": audio_text
-    }
+    if written:
+        summary.apply(db)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Worker lain membuat daily row yang sama bersamaan (uq_day_person) — ulangi sekali
+            db.rollback()
+            if not _retry_on_conflict:
+                raise
+            # Cukup reload lokal — state worker lain tidak jadi salah karena insert mereka sendiri
+            attendance_state.invalidate(publish=False)
+            retry = record_batch(
+                db,
+                [faces[i] for i in pending.values()],
+                device_id=device_id,
+                policy=policy,
+                _retry_on_conflict=False,
+            )
+            for i, result in zip(pending.values(), retry, strict=True):
+                results[i] = result
+            return results
+
+        for name, state in written:
+            attendance_state.update(day_str, name, **vars(state))
+
+    return results
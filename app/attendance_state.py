@@ -0,0 +1,116 @@
+"""
+State absensi harian in-memory untuk decide_and_record.
+
+Saat jam sibuk, sebagian besar wajah yang dikenali berakhir sebagai cooldown
+(orang masih berdiri di depan kamera), duplicate, atau reject di luar jendela OUT.
+Sebelumnya setiap keputusan itu butuh 2-4 query. Store ini memegang, per hari,
+state tiap orang: timestamp event ok terakhir + in/out, sehingga penolakan tersebut
+diputuskan tanpa menyentuh database.
+
+- Di-warm dari DB saat startup, saat hari berganti, dan setiap _MAX_AGE_SECONDS
+  (agar event/koreksi dari worker lain ikut terlihat bila WORKERS > 1).
+- Write-through: decide_and_record memperbarui state setelah commit.
+- Koreksi admin dan reset attendance memanggil `invalidate`, yang juga menaikkan
+  generation lintas worker (app/shared_generation.py). `get` membandingkan
+  generation itu (baca 8 byte) sehingga worker lain memuat ulang dari DB pada
+  keputusan berikutnya, bukan menolak dari state lama hingga _MAX_AGE_SECONDS.
+Keputusan yang MENULIS (IN/OUT) tetap divalidasi ulang terhadap DB.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import shared_generation
+from app.logging_config import get_logger
+from app.models import AttendanceEvent, DailyAttendance
+
+logger = get_logger(__name__)
+
+_MAX_AGE_SECONDS = 60.0
+_GENERATION = "attendance_state"
+
+
+@dataclass
+class PersonDayState:
+    last_ok_ts: datetime | None = None
+    in_time: datetime | None = None
+    in_is_late: bool = False
+    out_time: datetime | None = None
+
+
+_STATE: dict = {"day": None, "people": {}, "loaded_at": 0.0, "generation": None}
+_LOCK = threading.Lock()
+
+
+def _load_day(db: Session, day: str) -> dict[str, PersonDayState]:
+    people: dict[str, PersonDayState] = {}
+    for row in db.query(DailyAttendance).filter(DailyAttendance.day == day):
+        people[row.person_name] = PersonDayState(
+            in_time=row.in_time, in_is_late=bool(row.in_is_late), out_time=row.out_time
+        )
+    last_ok = (
+        db.query(AttendanceEvent.final_name, func.max(AttendanceEvent.ts))
+        .filter(AttendanceEvent.day == day, AttendanceEvent.status == "ok")
+        .group_by(AttendanceEvent.final_name)
+    )
+    for name, ts in last_ok:
+        if name:
+            people.setdefault(name, PersonDayState()).last_ok_ts = ts
+    return people
+
+
+def warm(db: Session, day: str):
+    """Muat ulang state seluruh orang untuk `day` (2 query)."""
+    # Dibaca sebelum query: invalidate yang terjadi selama load tetap memicu reload berikutnya
+    generation = shared_generation.current(_GENERATION)
+    people = _load_day(db, day)
+    with _LOCK:
+        _STATE["day"] = day
+        _STATE["people"] = people
+        _STATE["loaded_at"] = time.monotonic()
+        _STATE["generation"] = generation
+    logger.info(f"Attendance state warmed for {day}: {len(people)} people")
+
+
+def get(db: Session, day: str, person_name: str) -> PersonDayState:
+    """Snapshot state orang pada `day` (copy — ubah lewat `update`)."""
+    generation = shared_generation.current(_GENERATION)
+    with _LOCK:
+        fresh = (
+            _STATE["day"] == day
+            and _STATE["generation"] == generation
+            and time.monotonic() - _STATE["loaded_at"] <= _MAX_AGE_SECONDS
+        )
+    if not fresh:
+        warm(db, day)
+    with _LOCK:
+        state = _STATE["people"].get(person_name)
+        return PersonDayState(**vars(state)) if state else PersonDayState()
+
+
+def update(day: str, person_name: str, **fields):
+    """Write-through setelah commit. Diabaikan jika state yang dimuat untuk hari lain."""
+    with _LOCK:
+        if _STATE["day"] != day:
+            return
+        state = _STATE["people"].setdefault(person_name, PersonDayState())
+        for key, value in fields.items():
+            setattr(state, key, value)
+
+
+def invalidate(publish: bool = True):
+    """
+    Paksa reload dari DB pada akses berikutnya (setelah koreksi/reset).
+    `publish` juga memaksa reload di worker lain lewat generation.
+    """
+    with _LOCK:
+        _STATE["day"] = None
+        _STATE["people"] = {}
+        _STATE["loaded_at"] = 0.0
+        _STATE["generation"] = None
+    if publish:
+        shared_generation.bump(_GENERATION)
@@ -54,6 +54,13 @@ class Settings:
     min_face_px: int = int(os.getenv("MIN_FACE_PX", "80"))
     # Confidence threshold untuk MTCNN detection (0.0-1.0)
     detection_confidence: float = float(os.getenv("DETECTION_CONFIDENCE", "0.9"))
+    # MTCNN dijalankan di salinan frame dengan sisi terpanjang <= nilai ini (0 = resolusi penuh).
+    # Box/landmark dipetakan balik, crop tetap diambil dari frame asli.
+    detection_max_edge: int = int(os.getenv("DETECTION_MAX_EDGE", "0"))
+    # Upload JPEG besar di-decode langsung pada 1/2, 1/4, 1/8 resolusi selama sisi
+    # terpanjang hasil decode tetap >= nilai ini (0 = selalu decode penuh).
+    # Bbox di response tetap dalam koordinat gambar asli.
+    decode_max_edge: int = int(os.getenv("DECODE_MAX_EDGE", "0"))
 
     @property
     def MAX_DISTANCE(self) -> float:  # noqa: N802
@@ -63,6 +70,67 @@ class Settings:
     def MIN_FACE_PX(self) -> int:  # noqa: N802
         return self.min_face_px
 
+    # --- gallery snapshot (cold start cepat) ---
+    # Centroid gallery disimpan ke file .npy dan di-mmap saat boot
+    gallery_dir: str = os.getenv("GALLERY_DIR", "./data/gallery").strip()
+
+    # Backend nearest-neighbour: "exact" (brute force) atau "ivf" (approximate)
+    gallery_index: str = os.getenv("GALLERY_INDEX", "exact").strip().lower()
+    # Jumlah cluster IVF (0 = otomatis sqrt(N)) dan cluster yang diperiksa per query
+    ivf_nlist: int = int(os.getenv("IVF_NLIST", "0"))
+    ivf_nprobe: int = int(os.getenv("IVF_NPROBE", "8"))
+
+    @property
+    def GALLERY_DIR(self) -> str:  # noqa: N802
+        return self.gallery_dir
+
+    # Counter generation lintas worker (invalidasi cache policy / state absensi)
+    runtime_dir: str = os.getenv("RUNTIME_DIR", "./data/runtime").strip()
+
+    @property
+    def GALLERY_INDEX(self) -> str:  # noqa: N802
+        return self.gallery_index
+
+    # --- inference backend ---
+    # torch (eager) | torchscript | onnx (butuh onnxruntime) | int8 (terkuantisasi)
+    inference_backend: str = os.getenv("INFERENCE_BACKEND", "torch").strip().lower()
+    # Lokasi cache artifact model hasil export (.pt / .onnx)
+    model_cache_dir: str = os.getenv("MODEL_CACHE_DIR", "./data/models").strip()
+    onnx_intra_op_threads: int = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
+
+    @property
+    def INFERENCE_BACKEND(self) -> str:  # noqa: N802
+        return self.inference_backend
+
+    # --- inference executor ---
+    # Thread inference dan antrian maksimum; lebih dari itu → HTTP 503 (backpressure)
+    inference_workers: int = int(os.getenv("INFERENCE_WORKERS", "1"))
+    inference_queue_size: int = int(os.getenv("INFERENCE_QUEUE_SIZE", "4"))
+
+    # Micro-batching embedding lintas request (0 = nonaktif). Efektif jika INFERENCE_WORKERS > 1
+    embed_batch_window_ms: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "0"))
+    embed_max_batch: int = int(os.getenv("EMBED_MAX_BATCH", "16"))
+
+    @property
+    def INFERENCE_WORKERS(self) -> int:  # noqa: N802
+        return self.inference_workers
+
+    @property
+    def INFERENCE_QUEUE_SIZE(self) -> int:  # noqa: N802
+        return self.inference_queue_size
+
+    # --- face tracking lintas frame (per device) ---
+    # Identitas wajah yang ter-track dipakai ulang hingga N frame tanpa embedding ulang (0 = nonaktif)
+    track_reuse_frames: int = int(os.getenv("TRACK_REUSE_FRAMES", "0"))
+    track_iou_threshold: float = float(os.getenv("TRACK_IOU_THRESHOLD", "0.3"))
+    track_ttl_seconds: float = float(os.getenv("TRACK_TTL_SECONDS", "2.0"))
+    # Confidence deteksi minimum agar identitas boleh dipakai ulang (di bawahnya → embed ulang)
+    track_min_confidence: float = float(os.getenv("TRACK_MIN_CONFIDENCE", "0.95"))
+
+    @property
+    def TRACK_REUSE_FRAMES(self) -> int:  # noqa: N802
+        return self.track_reuse_frames
+
     # --- attendance/cooldown ---
     cooldown_seconds: int = int(os.getenv("COOLDOWN_SECONDS", "45"))
 
@@ -78,6 +146,14 @@ class Settings:
     def DETECTION_CONFIDENCE(self) -> float:  # noqa: N802
         return self.detection_confidence
 
+    @property
+    def DETECTION_MAX_EDGE(self) -> int:  # noqa: N802
+        return self.detection_max_edge
+
+    @property
+    def DECODE_MAX_EDGE(self) -> int:  # noqa: N802
+        return self.decode_max_edge
+
     @property
     def DB_MAX_RETRIES(self) -> int:  # noqa: N802
         return self.db_max_retries
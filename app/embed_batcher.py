@@ -0,0 +1,149 @@
+"""
+Micro-batching scheduler untuk embedding wajah.
+
+Dengan beberapa kamera yang mengirim frame bersamaan (INFERENCE_WORKERS > 1),
+tiap request biasanya menjalankan forward pass sendiri. Batcher ini
+mengumpulkan crop dari request-request yang datang hampir bersamaan selama
+`window_ms` (atau sampai `max_batch` crop), menjalankan SATU forward pass,
+lalu membagikan hasilnya kembali ke masing-masing pemanggil.
+
+Trade-off throughput vs latency diatur via EMBED_BATCH_WINDOW_MS dan
+EMBED_MAX_BATCH; gunakan `stats()` (distribusi ukuran batch & waktu tunggu
+antrian) untuk tuning.
+
+Kegagalan satu batch (embed, stack, split) hanya menggagalkan request di batch
+itu — thread tetap hidup. Pemanggil menunggu maksimal `timeout_s`, dan jika
+thread batcher mati, `submit` embed langsung tanpa batching.
+"""
+from collections import Counter, deque
+from collections.abc import Callable
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_WAIT_SAMPLES = 1000
+_RESULT_TIMEOUT_S = 10.0
+
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        embed_fn: Callable[[list[np.ndarray]], np.ndarray],
+        window_ms: float,
+        max_batch: int,
+        timeout_s: float = _RESULT_TIMEOUT_S,
+    ):
+        self._embed_fn = embed_fn
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout_s
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._waits_ms: deque = deque(maxlen=_WAIT_SAMPLES)
+        self._batches = 0
+        self._crops = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+                thread.start()
+                # Di-publish setelah start: pemanggil lain yang lolos cek cepat di atas
+                # tidak boleh melihat thread yang belum berjalan sebagai thread mati
+                self._thread = thread
+
+    def submit(self, crops: list[np.ndarray]) -> np.ndarray:
+        """Embed `crops` lewat batch bersama. Blocking sampai hasil tersedia. Return (N, 512)."""
+        if not crops:
+            return self._embed_fn([])
+        self._ensure_started()
+        if not self._thread.is_alive():
+            logger.error("Embedding batcher thread is dead, embedding without batching")
+            return self._embed_fn(crops)
+        future: Future = Future()
+        self._queue.put((crops, future, time.perf_counter()))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # belum diambil batch → dilewati; sudah berjalan → hasilnya dibuang
+            raise
+
+    def _collect(self, jobs: list[tuple]):
+        """Isi `jobs` (in-place, agar tetap bisa digagalkan jika terjadi error di tengah jalan)."""
+        jobs.append(self._queue.get())
+        total = len(jobs[0][0])
+        deadline = time.perf_counter() + self.window
+        while total < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            total += len(job[0])
+
+    def _loop(self):
+        while True:
+            jobs: list[tuple] = []
+            try:
+                self._collect(jobs)
+                self._run_batch(jobs)
+            except Exception as e:
+                logger.error(f"Batched embedding failed ({len(jobs)} requests): {e}")
+                for _, future, _ in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run_batch(self, jobs: list[tuple]):
+        # Request yang sudah timeout (future di-cancel) tidak ikut di-embed
+        jobs[:] = [job for job in jobs if job[1].set_running_or_notify_cancel()]
+        if not jobs:
+            return
+        started = time.perf_counter()
+        crops = [c for job in jobs for c in job[0]]
+        embs = self._embed_fn(crops)
+        if len(embs) != len(crops):
+            raise ValueError(f"embed_fn returned {len(embs)} embeddings for {len(crops)} crops")
+
+        offset = 0
+        for job_crops, future, _ in jobs:
+            future.set_result(embs[offset:offset + len(job_crops)])
+            offset += len(job_crops)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._crops += len(crops)
+            self._batch_sizes[len(crops)] += 1
+            self._waits_ms.extend((started - enqueued) * 1000 for _, _, enqueued in jobs)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            waits = np.asarray(self._waits_ms, dtype=np.float64)
+            return {
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "batches": self._batches,
+                "crops": self._crops,
+                "avg_batch_size": round(self._crops / self._batches, 2) if self._batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                "queue_wait_ms": {
+                    "avg": round(float(waits.mean()), 2) if len(waits) else 0.0,
+                    "p95": round(float(np.percentile(waits, 95)), 2) if len(waits) else 0.0,
+                    "max": round(float(waits.max()), 2) if len(waits) else 0.0,
+                },
+            }
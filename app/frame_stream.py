@@ -0,0 +1,39 @@
+"""
+Buffer frame untuk streaming recognition via WebSocket (/v1/stream).
+
+Kamera bisa mengirim frame lebih cepat dari kecepatan inference. Alih-alih
+mengantrikan semua frame (latency terus naik), slot ini hanya menyimpan frame
+TERBARU: frame yang belum sempat diproses saat frame baru datang dibuang
+(latest-frame-wins) dan dihitung sebagai `dropped`.
+"""
+import asyncio
+
+
+class LatestFrameSlot:
+    def __init__(self):
+        self._frame: bytes | None = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self.received += 1
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self) -> tuple[int, bytes] | None:
+        """Tunggu frame terbaru. Return (seq, frame), atau None jika stream ditutup."""
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        frame, self._frame = self._frame, None
+        return self.received, frame
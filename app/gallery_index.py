@@ -0,0 +1,253 @@
+"""
+Index nearest-neighbour untuk gallery centroid wajah (jarak euclidean / L2).
+
+Backend (dipilih via GALLERY_INDEX):
+    exact — brute force lewat norm expansion: |v - q|² = |v|² - 2 v·q + |q|².
+            Satu matmul terhadap squared norm yang sudah dihitung, tanpa
+            temporary N x 512 per query.
+    ivf   — inverted file (coarse k-means) murni NumPy. Query hanya dibandingkan
+            dengan anggota `nprobe` cluster terdekat. Cocok untuk gallery
+            puluhan ribu identitas; recall < 100% (cek dengan `evaluate_index`).
+"""
+from abc import ABC, abstractmethod
+import time
+
+import numpy as np
+
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class GalleryIndex(ABC):
+    """Interface index. `vectors` yang di-build tidak di-copy (boleh mmap read-only)."""
+
+    name = "base"
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray) -> None:
+        ...
+
+    @abstractmethod
+    def search(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        queries: (Q, D) float32.
+        Return (indices (Q,), distances (Q,)) untuk nearest neighbour masing-masing query.
+        """
+
+    def update(self, vectors: np.ndarray, rows) -> None:
+        """
+        `vectors` berubah hanya di baris `rows` (baris >= len(vectors) sudah dihapus).
+        Default build ulang; backend boleh override dengan update incremental.
+        """
+        self.build(vectors)
+
+
+class ExactIndex(GalleryIndex):
+    name = "exact"
+
+    def __init__(self):
+        self._vectors = np.zeros((0, 512), dtype=np.float32)
+        # Buffer dengan kapasitas >= len(vectors) agar update tidak copy semua norm
+        self._sq_buf = np.zeros(0, dtype=np.float32)
+        self._sq_norms = self._sq_buf
+
+    def build(self, vectors: np.ndarray) -> None:
+        self._vectors = vectors
+        self._sq_buf = np.einsum("ij,ij->i", vectors, vectors, dtype=np.float32)
+        self._sq_norms = self._sq_buf
+
+    def update(self, vectors: np.ndarray, rows) -> None:
+        n = len(vectors)
+        if n > len(self._sq_buf):
+            buf = np.zeros(max(n, 2 * len(self._sq_buf)), dtype=np.float32)
+            buf[: len(self._sq_norms)] = self._sq_norms
+            self._sq_buf = buf
+        self._vectors = vectors
+        self._sq_norms = self._sq_buf[:n]
+        rows = np.asarray([r for r in rows if r < n], dtype=np.int64)
+        if len(rows):
+            changed = vectors[rows]
+            self._sq_norms[rows] = np.einsum("ij,ij->i", changed, changed, dtype=np.float32)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors
+
+    @property
+    def sq_norms(self) -> np.ndarray:
+        """|v|² per baris, dihitung sekali saat build."""
+        return self._sq_norms
+
+    def search(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(queries).astype(np.float32, copy=False)
+        d2 = queries @ self._vectors.T  # (Q, N)
+        d2 *= -2.0
+        d2 += self._sq_norms[None, :]
+        idx = np.argmin(d2, axis=1)
+        best = d2[np.arange(len(idx)), idx] + np.einsum("ij,ij->i", queries, queries)
+        return idx, np.sqrt(np.maximum(best, 0.0))
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index centroid terdekat untuk tiap baris x."""
+    sq = np.einsum("ij,ij->i", centroids, centroids)
+    return np.argmin(sq[None, :] - 2.0 * (x @ centroids.T), axis=1)
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _assign(x, centroids)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                centroids[c] = x[rng.integers(len(x))]
+    return centroids
+
+
+class IVFIndex(GalleryIndex):
+    name = "ivf"
+
+    # Di bawah ukuran ini brute force sudah cukup cepat — IVF tidak dipakai
+    _MIN_TRAIN_SIZE = 1024
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, train_iters: int = 10):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self._exact = ExactIndex()
+        self._centroids: np.ndarray | None = None
+        self._trained_size = 0
+        self._lists: list[np.ndarray] = []
+        # Cluster tiap baris (dipakai update untuk mengeluarkan baris dari list lamanya)
+        self._row_cluster = np.zeros(0, dtype=np.int64)
+        self._size = 0
+
+    def _needs_training(self, n: int) -> bool:
+        if self._centroids is None:
+            return True
+        # Retrain jika ukuran gallery berubah > 2x sejak training terakhir
+        return n > 2 * self._trained_size or n < self._trained_size // 2
+
+    def build(self, vectors: np.ndarray) -> None:
+        self._exact.build(vectors)
+        n = len(vectors)
+        self._size = n
+        if n < self._MIN_TRAIN_SIZE:
+            self._centroids = None
+            self._lists = []
+            return
+
+        if self._needs_training(n):
+            k = self.nlist or int(np.sqrt(n))
+            k = max(1, min(k, n))
+            t0 = time.perf_counter()
+            self._centroids = _kmeans(np.asarray(vectors, dtype=np.float32), k, self.train_iters)
+            self._trained_size = n
+            logger.info(f"IVF index trained: n={n}, nlist={k} ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+
+        assign = _assign(vectors, self._centroids)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(len(self._centroids) + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self._centroids))]
+        self._row_cluster = assign
+
+    def update(self, vectors: np.ndarray, rows) -> None:
+        """
+        Assign ulang hanya baris yang berubah ke centroid yang ada. Retrain (build penuh)
+        memakai aturan yang sama dengan build: ukuran berubah > 2x sejak training terakhir.
+        """
+        n = len(vectors)
+        if (self._centroids is None) != (n < self._MIN_TRAIN_SIZE) or (
+            self._centroids is not None and self._needs_training(n)
+        ):
+            self.build(vectors)
+            return
+        self._exact.update(vectors, rows)
+        old_n, self._size = self._size, n
+        if self._centroids is None:
+            return
+
+        rows = {int(r) for r in rows if r < n}
+        # Baris yang berubah + baris yang sudah tidak ada keluar dari list lamanya
+        stale = sorted(r for r in rows | set(range(n, old_n)) if r < old_n)
+        for c in np.unique(self._row_cluster[stale]):
+            members = self._lists[c]
+            self._lists[c] = members[~np.isin(members, stale)]
+
+        if n > len(self._row_cluster):
+            grown = np.zeros(max(n, 2 * len(self._row_cluster)), dtype=np.int64)
+            grown[: len(self._row_cluster)] = self._row_cluster
+            self._row_cluster = grown
+        if rows:
+            changed = np.fromiter(sorted(rows), dtype=np.int64)
+            assign = _assign(vectors[changed], self._centroids)
+            self._row_cluster[changed] = assign
+            for c in np.unique(assign):
+                self._lists[c] = np.concatenate([self._lists[c], changed[assign == c]])
+
+    def search(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if self._centroids is None:
+            return self._exact.search(queries)
+
+        queries = np.atleast_2d(queries).astype(np.float32, copy=False)
+        vectors = self._exact.vectors
+        sq_norms = self._exact.sq_norms
+        nprobe = min(self.nprobe, len(self._centroids))
+
+        c_sq = np.einsum("ij,ij->i", self._centroids, self._centroids)
+        coarse = c_sq[None, :] - 2.0 * (queries @ self._centroids.T)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        out_idx = np.empty(len(queries), dtype=np.int64)
+        out_dist = np.empty(len(queries), dtype=np.float32)
+        for qi, q in enumerate(queries):
+            cand = np.concatenate([self._lists[c] for c in probes[qi]])
+            if len(cand) == 0:
+                i, d = self._exact.search(q[None, :])
+                out_idx[qi], out_dist[qi] = i[0], d[0]
+                continue
+            d2 = sq_norms[cand] - 2.0 * (vectors[cand] @ q)
+            j = int(np.argmin(d2))
+            out_idx[qi] = cand[j]
+            out_dist[qi] = np.sqrt(max(float(d2[j] + q @ q), 0.0))
+        return out_idx, out_dist
+
+
+def create_index(kind: str, *, nlist: int = 0, nprobe: int = 8) -> GalleryIndex:
+    kind = (kind or "exact").lower()
+    if kind == "exact":
+        return ExactIndex()
+    if kind == "ivf":
+        return IVFIndex(nlist=nlist, nprobe=nprobe)
+    raise ValueError(f"unknown gallery index: {kind}")
+
+
+def evaluate_index(index: GalleryIndex, vectors: np.ndarray, queries: np.ndarray) -> dict:
+    """
+    Bandingkan `index` dengan exact search: recall@1 dan latency per query (ms).
+    `index` harus sudah di-build dengan `vectors`.
+    """
+    exact = ExactIndex()
+    exact.build(vectors)
+
+    t0 = time.perf_counter()
+    truth, _ = exact.search(queries)
+    exact_ms = (time.perf_counter() - t0) * 1000 / max(len(queries), 1)
+
+    t0 = time.perf_counter()
+    got, _ = index.search(queries)
+    index_ms = (time.perf_counter() - t0) * 1000 / max(len(queries), 1)
+
+    return {
+        "index": index.name,
+        "gallery_size": len(vectors),
+        "queries": len(queries),
+        "recall_at_1": float(np.mean(got == truth)) if len(queries) else 1.0,
+        "exact_ms_per_query": round(exact_ms, 4),
+        "index_ms_per_query": round(index_ms, 4),
+    }
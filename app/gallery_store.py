@@ -0,0 +1,308 @@
+"""
+Snapshot gallery wajah di disk untuk cold start cepat dan sharing antar worker.
+
+File di GALLERY_DIR:
+    gallery.npy   — matrix centroid basis (N x 512 float32), dibaca via np.load(mmap_mode="r")
+    gallery.json  — {"version", "names", "sha1", "count", "epoch"} milik matrix basis
+    gallery.log   — log perubahan (put/hapus satu orang) sejak basis ditulis, append-only
+    gallery.gen   — generation counter uint64 (mmap shared), naik setiap snapshot/log ditulis
+    gallery.lock  — file lock untuk writer
+
+Snapshot valid hanya jika version terakhirnya (basis + log) sama dengan counter
+`gallery_state.version` di database. Setiap enroll/delete menaikkan counter (lihat
+`bump_version`), sehingga snapshot lama otomatis dianggap stale dan di-rebuild.
+
+Enroll/delete tidak menulis ulang matrix: satu record (nama + centroid, O(D)) di-append
+ke `gallery.log` (`append_log`). Worker lain membaca record baru saja mulai offset
+terakhirnya (`read_log`) dan menerapkannya ke cache sendiri. Jika log sudah panjang,
+writer menulis basis baru (`save_snapshot`, epoch baru, log dikosongkan) — biaya O(N)
+itu teramortisasi. sha1 matrix basis hanya diverifikasi saat cold load; tiap record
+log membawa crc32 sendiri.
+
+Dengan WORKERS>1, semua worker mmap file basis yang sama (page cache OS di-share,
+tidak duplikat per worker). Writer menaikkan generation; worker lain cukup
+membandingkan 8 byte di `gallery.gen` per request (`current_generation`).
+"""
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import struct
+from typing import NamedTuple
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev lokal) — single worker, lock tidak diperlukan
+    fcntl = None
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.logging_config import get_logger
+from app.models import GalleryState
+
+logger = get_logger(__name__)
+
+_VECTORS_FILE = "gallery.npy"
+_META_FILE = "gallery.json"
+_LOG_FILE = "gallery.log"
+_GEN_FILE = "gallery.gen"
+_LOCK_FILE = "gallery.lock"
+
+_GEN = {"map": None}
+
+
+def get_version(db: Session) -> int:
+    """Baca version counter gallery dari DB (buat row id=1 jika belum ada)."""
+    state = db.query(GalleryState).filter(GalleryState.id == 1).one_or_none()
+    if state is None:
+        state = GalleryState(id=1, version=0)
+        db.add(state)
+        db.commit()
+    return state.version
+
+
+def bump_version(db: Session) -> None:
+    """Naikkan version counter. Dipanggil sebelum commit enroll/delete (satu transaksi)."""
+    get_version(db)
+    db.execute(update(GalleryState).where(GalleryState.id == 1).values(version=GalleryState.version + 1))
+
+
+def _generation_map() -> np.memmap:
+    if _GEN["map"] is None:
+        os.makedirs(settings.gallery_dir, exist_ok=True)
+        path = os.path.join(settings.gallery_dir, _GEN_FILE)
+        if not os.path.exists(path) or os.path.getsize(path) < 8:
+            with open(path, "wb") as f:
+                f.write(b"\x00" * 8)
+        _GEN["map"] = np.memmap(path, dtype="<u8", mode="r+", shape=(1,))
+    return _GEN["map"]
+
+
+def current_generation() -> int:
+    """Generation snapshot terbaru (lintas proses). Cukup murah untuk dicek per request."""
+    try:
+        return int(_generation_map()[0])
+    except OSError:
+        return 0
+
+
+@contextmanager
+def writer_lock():
+    """Serialisasi writer snapshot antar worker (flock). No-op di platform tanpa fcntl."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(settings.gallery_dir, exist_ok=True)
+    with open(os.path.join(settings.gallery_dir, _LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _content_hash(names: list[str], vectors: np.ndarray) -> str:
+    h = hashlib.sha1()
+    h.update("\n".join(names).encode("utf-8"))
+    h.update(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+class LogRecord(NamedTuple):
+    """Satu perubahan gallery: `put` (insert/replace centroid) atau `pop` (hapus orang)."""
+    op: str
+    name: str
+    vector: np.ndarray | None
+    version: int
+
+
+class Snapshot(NamedTuple):
+    names: list[str]
+    vectors: np.ndarray
+    version: int
+    epoch: int
+    records: list[LogRecord]
+    log_offset: int
+
+    @property
+    def latest_version(self) -> int:
+        """Version setelah semua record log diterapkan ke basis."""
+        return self.records[-1].version if self.records else self.version
+
+
+# magic, epoch, version, op, panjang nama — lalu nama, vector (put saja), crc32
+_RECORD_HEAD = struct.Struct("<4sQqBH")
+_RECORD_MAGIC = b"GLOG"
+_OPS = {"put": 1, "pop": 2}
+_OP_NAMES = {v: k for k, v in _OPS.items()}
+_VEC_BYTES = 512 * 4
+
+
+def _encode_record(epoch: int, record: LogRecord) -> bytes:
+    name = record.name.encode("utf-8")
+    body = _RECORD_HEAD.pack(_RECORD_MAGIC, epoch, record.version, _OPS[record.op], len(name)) + name
+    if record.op == "put":
+        body += np.ascontiguousarray(record.vector, dtype="<f4").tobytes()
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def _decode_records(data: bytes, epoch: int) -> tuple[list[LogRecord], int, bool]:
+    """
+    Parse record berurutan. Return (records, byte terpakai, epoch_cocok).
+    Berhenti di record terakhir yang belum lengkap (sedang ditulis writer lain).
+    """
+    records: list[LogRecord] = []
+    pos = 0
+    while pos + _RECORD_HEAD.size <= len(data):
+        magic, rec_epoch, version, op, name_len = _RECORD_HEAD.unpack_from(data, pos)
+        if magic != _RECORD_MAGIC or op not in _OP_NAMES:
+            logger.warning("Gallery log corrupt (bad record header)")
+            break
+        if rec_epoch != epoch:
+            return records, pos, False
+        vec_len = _VEC_BYTES if _OP_NAMES[op] == "put" else 0
+        end = pos + _RECORD_HEAD.size + name_len + vec_len
+        if end + 4 > len(data):
+            break
+        (crc,) = struct.unpack_from("<I", data, end)
+        if crc != zlib.crc32(data[pos:end]):
+            logger.warning("Gallery log corrupt (crc mismatch)")
+            break
+        name_at = pos + _RECORD_HEAD.size
+        name = data[name_at:name_at + name_len].decode("utf-8")
+        vector = np.frombuffer(data, dtype="<f4", count=512, offset=name_at + name_len) if vec_len else None
+        records.append(LogRecord(_OP_NAMES[op], name, vector, version))
+        pos = end + 4
+    return records, pos, True
+
+
+def read_log(epoch: int, offset: int) -> tuple[list[LogRecord], int] | None:
+    """
+    Record log milik `epoch` mulai byte `offset`. Return (records, offset baru).
+    None jika basis sudah diganti (epoch lain / log lebih pendek dari offset) —
+    pemanggil harus reload snapshot penuh.
+    """
+    path = os.path.join(settings.gallery_dir, _LOG_FILE)
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < offset:
+                return None
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return None if offset else ([], 0)
+    except OSError as e:
+        logger.warning(f"Failed to read gallery log: {e}")
+        return None
+    records, used, same_epoch = _decode_records(data, epoch)
+    if not same_epoch and not records and used == 0 and offset == 0:
+        # Basis baru sudah dipublish tapi log lama belum diganti — belum ada record
+        return [], 0
+    if not same_epoch:
+        return None
+    return records, offset + used
+
+
+def append_log(epoch: int, record: LogRecord) -> int | None:
+    """
+    Append satu record ke log basis `epoch` lalu naikkan generation. Return offset akhir log.
+    Panggil di dalam `writer_lock()`. None jika gagal (pemanggil sebaiknya tulis basis penuh).
+    """
+    path = os.path.join(settings.gallery_dir, _LOG_FILE)
+    try:
+        with open(path, "ab") as f:
+            f.write(_encode_record(epoch, record))
+            f.flush()
+            end = f.tell()
+        gen = _generation_map()
+        gen[0] += 1
+        gen.flush()
+        return end
+    except OSError as e:
+        logger.warning(f"Failed to append gallery log: {e}")
+        return None
+
+
+def save_snapshot(names: list[str], vectors: np.ndarray, version: int) -> bool:
+    """
+    Tulis basis baru secara atomic (tmp file + os.replace) dengan epoch baru dan log
+    kosong, lalu naikkan generation. Panggil di dalam `writer_lock()` jika ada
+    kemungkinan beberapa writer.
+    """
+    os.makedirs(settings.gallery_dir, exist_ok=True)
+    vectors = np.ascontiguousarray(vectors[: len(names)], dtype=np.float32)
+    vec_path = os.path.join(settings.gallery_dir, _VECTORS_FILE)
+    meta_path = os.path.join(settings.gallery_dir, _META_FILE)
+    log_path = os.path.join(settings.gallery_dir, _LOG_FILE)
+    try:
+        gen = _generation_map()
+        # Unik & naik terus: generation yang akan dipublish oleh penulisan ini
+        epoch = int(gen[0]) + 1
+        with open(vec_path + ".tmp", "wb") as f:
+            np.save(f, vectors)
+        meta = {
+            "version": version,
+            "count": len(names),
+            "names": names,
+            "sha1": _content_hash(names, vectors),
+            "epoch": epoch,
+        }
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        open(log_path + ".tmp", "wb").close()
+        os.replace(vec_path + ".tmp", vec_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        os.replace(log_path + ".tmp", log_path)
+        gen[0] = epoch
+        gen.flush()
+        logger.info(f"Gallery snapshot saved (version={version}, persons={len(names)})")
+        return True
+    except OSError as e:
+        logger.warning(f"Failed to save gallery snapshot: {e}")
+        return False
+
+
+def load_snapshot(expected_version: int | None = None, verify: bool = True) -> Snapshot | None:
+    """
+    Load basis (read-only mmap) beserta record log yang belum di-compact.
+    Jika `expected_version` diberikan, version terakhir (basis + log) harus cocok dengan DB.
+    `verify=True` menghitung ulang sha1 seluruh matrix (O(N·D)) — cukup saat cold
+    load; reload per generation cukup cek shape karena file ditulis atomic.
+    Return None jika tidak ada, stale, atau corrupt (mis. sedang ditulis worker lain).
+    """
+    vec_path = os.path.join(settings.gallery_dir, _VECTORS_FILE)
+    meta_path = os.path.join(settings.gallery_dir, _META_FILE)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        epoch = int(meta.get("epoch", 0))
+        log = read_log(epoch, 0)
+        if log is None:
+            return None
+        records, log_offset = log
+        latest = records[-1].version if records else meta.get("version")
+        if expected_version is not None and latest != expected_version:
+            logger.info(f"Gallery snapshot stale (snapshot={latest}, db={expected_version})")
+            return None
+        vectors = np.load(vec_path, mmap_mode="r")
+        names = list(meta["names"])
+        if vectors.shape != (len(names), 512) or meta.get("count") != len(names):
+            logger.warning("Gallery snapshot corrupt (shape mismatch)")
+            return None
+        if verify and _content_hash(names, vectors) != meta.get("sha1"):
+            logger.warning("Gallery snapshot corrupt (hash mismatch)")
+            return None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Failed to load gallery snapshot: {e}")
+        return None
+    logger.info(
+        f"Gallery snapshot loaded (version={latest}, persons={len(names)}, log records={len(records)})"
+    )
+    return Snapshot(names, vectors, meta["version"], epoch, records, log_offset)
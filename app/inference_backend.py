@@ -0,0 +1,219 @@
+"""
+Backend inference untuk model embedding FaceNet (InceptionResnetV1 / VGGFace2).
+
+Dipilih via INFERENCE_BACKEND:
+    torch        — eager PyTorch (default, perilaku lama)
+    torchscript  — graph hasil trace + torch.jit.freeze, di-cache di MODEL_CACHE_DIR
+    onnx         — export ONNX sekali, dijalankan dengan ONNX Runtime CPU
+                   (butuh `pip install onnxruntime`; thread via ONNX_INTRA_OP_THREADS)
+    int8         — model terkuantisasi INT8. Jika artifact hasil kalibrasi static
+                   (conv + linear, lihat scripts/quantize_model.py) ada, itu yang dipakai;
+                   selain itu fallback ke dynamic quantization (linear saja).
+
+Artifact (.pt / .onnx) di-export sekali lalu dipakai ulang di start berikutnya.
+Jika artifact sudah ada, model eager tidak perlu dimuat sama sekali — hemat RAM.
+Jika backend gagal dibuat (mis. onnxruntime tidak terinstall), fallback ke torch.
+
+Semua backend menerima batch float32 (N, 3, 160, 160) yang sudah dinormalisasi
+dan mengembalikan embedding float32 (N, 512).
+"""
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+import os
+
+import numpy as np
+import torch
+
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Naikkan jika preprocessing/arsitektur berubah agar artifact lama tidak dipakai
+_ARTIFACT_VERSION = 1
+_INPUT_SHAPE = (1, 3, 160, 160)
+
+
+def _artifact_path(cache_dir: str, suffix: str) -> str:
+    return os.path.join(cache_dir, f"facenet_vggface2_v{_ARTIFACT_VERSION}.{suffix}")
+
+
+class EmbeddingBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        """batch (N, 3, 160, 160) float32 → embedding (N, 512) float32."""
+
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model: torch.nn.Module):
+        self.model = model
+
+    @torch.inference_mode()
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.model(torch.from_numpy(batch)).cpu().numpy().astype(np.float32)
+
+
+class TorchScriptBackend(EmbeddingBackend):
+    name = "torchscript"
+
+    def __init__(self, module: torch.jit.ScriptModule):
+        self.module = module
+
+    @classmethod
+    def load_or_export(cls, model_factory: Callable[[], torch.nn.Module], cache_dir: str) -> "TorchScriptBackend":
+        path = _artifact_path(cache_dir, "pt")
+        if not os.path.exists(path):
+            export_torchscript(model_factory(), path)
+        return cls(torch.jit.load(path, map_location="cpu").eval())
+
+    @torch.inference_mode()
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.module(torch.from_numpy(batch)).cpu().numpy().astype(np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    name = "onnx"
+
+    def __init__(self, path: str, intra_op_threads: int = 1):
+        import onnxruntime as ort  # optional dependency
+
+        opts = ort.SessionOptions()
+        if intra_op_threads > 0:
+            opts.intra_op_num_threads = intra_op_threads
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+
+    @classmethod
+    def load_or_export(
+        cls, model_factory: Callable[[], torch.nn.Module], cache_dir: str, intra_op_threads: int = 1
+    ) -> "OnnxBackend":
+        import onnxruntime  # noqa: F401 — gagal lebih awal sebelum export jika tidak terinstall
+
+        path = _artifact_path(cache_dir, "onnx")
+        if not os.path.exists(path):
+            export_onnx(model_factory(), path)
+        return cls(path, intra_op_threads)
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        out = self.session.run(None, {self._input: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+        return out.astype(np.float32, copy=False)
+
+
+class Int8Backend(EmbeddingBackend):
+    name = "int8"
+
+    def __init__(self, module: torch.nn.Module, mode: str):
+        self.module = module
+        self.mode = mode  # "static" (hasil kalibrasi) | "dynamic"
+
+    @classmethod
+    def load(cls, model_factory: Callable[[], torch.nn.Module], cache_dir: str) -> "Int8Backend":
+        _select_quantized_engine()
+        path = int8_artifact_path(cache_dir)
+        if os.path.exists(path):
+            return cls(torch.jit.load(path, map_location="cpu").eval(), "static")
+        logger.warning(
+            "Static INT8 artifact not found — using dynamic quantization (linear layers only). "
+            "Run scripts/quantize_model.py --calibrate for conv layers."
+        )
+        return cls(quantize_dynamic_int8(model_factory()), "dynamic")
+
+    @torch.inference_mode()
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.module(torch.from_numpy(batch)).cpu().numpy().astype(np.float32)
+
+
+def int8_artifact_path(cache_dir: str) -> str:
+    return _artifact_path(cache_dir, "int8.pt")
+
+
+def _select_quantized_engine() -> None:
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return
+
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic INT8: bobot Linear dikuantisasi, aktivasi dihitung saat runtime. Tanpa kalibrasi."""
+    _select_quantized_engine()
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static_int8(model: torch.nn.Module, calibration: Iterable[np.ndarray]) -> torch.nn.Module:
+    """
+    Static INT8 (FX graph mode) untuk conv + linear.
+    `calibration`: batch (N, 3, 160, 160) float32 dari crop wajah asli (sudah dipreprocess).
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    _select_quantized_engine()
+    qconfig = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(model.eval(), qconfig, (torch.zeros(_INPUT_SHAPE),))
+    seen = 0
+    with torch.no_grad():
+        for batch in calibration:
+            prepared(torch.from_numpy(np.ascontiguousarray(batch, dtype=np.float32)))
+            seen += len(batch)
+    if seen == 0:
+        raise ValueError("calibration set is empty")
+    logger.info(f"INT8 calibration done on {seen} face crops")
+    return convert_fx(prepared)
+
+
+def export_torchscript(model: torch.nn.Module, path: str) -> None:
+    """Trace + freeze model eager lalu simpan (atomic)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with torch.inference_mode(False), torch.no_grad():
+        traced = torch.jit.trace(model.eval(), torch.zeros(_INPUT_SHAPE))
+        frozen = torch.jit.freeze(traced)
+    torch.jit.save(frozen, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    logger.info(f"TorchScript model exported to {path}")
+
+
+def export_onnx(model: torch.nn.Module, path: str) -> None:
+    """Export model eager ke ONNX dengan batch dinamis (atomic)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model.eval(),
+            torch.zeros(_INPUT_SHAPE),
+            path + ".tmp",
+            input_names=["input"],
+            output_names=["embedding"],
+            dynamic_axes={"input": {0: "batch"}, "embedding": {0: "batch"}},
+            opset_version=17,
+        )
+    os.replace(path + ".tmp", path)
+    logger.info(f"ONNX model exported to {path}")
+
+
+def create_backend(
+    kind: str,
+    model_factory: Callable[[], torch.nn.Module],
+    *,
+    cache_dir: str,
+    intra_op_threads: int = 1,
+) -> EmbeddingBackend:
+    """Buat backend sesuai `kind`; fallback ke eager torch jika gagal."""
+    kind = (kind or "torch").lower()
+    try:
+        if kind == "torchscript":
+            return TorchScriptBackend.load_or_export(model_factory, cache_dir)
+        if kind == "onnx":
+            return OnnxBackend.load_or_export(model_factory, cache_dir, intra_op_threads)
+        if kind == "int8":
+            return Int8Backend.load(model_factory, cache_dir)
+        if kind != "torch":
+            logger.warning(f"Unknown INFERENCE_BACKEND '{kind}', using torch")
+    except Exception as e:
+        logger.error(f"Failed to initialize {kind} backend, falling back to torch: {e}")
+    return TorchBackend(model_factory())
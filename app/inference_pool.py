@@ -0,0 +1,75 @@
+"""
+Executor khusus inference (MTCNN + FaceNet + pencatatan absensi).
+
+Handler async tidak boleh menjalankan inference langsung di event loop —
+satu request bisa membekukan semua request lain termasuk /health.
+Pool ini memakai thread (PyTorch melepas GIL saat forward pass, dan model
+tidak perlu diduplikasi seperti pada process pool) dengan kapasitas terbatas:
+    INFERENCE_WORKERS     — jumlah thread inference
+    INFERENCE_QUEUE_SIZE  — jumlah request yang boleh menunggu di antrian
+Jika penuh, `run` langsung raise `InferenceQueueFullError` (→ HTTP 503) alih-alih
+menumpuk request sampai timeout.
+"""
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+from typing import Any
+
+from app.config import settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class InferenceQueueFullError(Exception):
+    """Antrian inference penuh — request harus ditolak (backpressure)."""
+
+
+class InferencePool:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Jalankan `fn` di thread inference. Raise InferenceQueueFullError jika kapasitas habis."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise InferenceQueueFullError()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        # Slot dilepas saat pekerjaan selesai, bukan saat client disconnect
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+inference_pool = InferencePool(settings.inference_workers, settings.inference_queue_size)
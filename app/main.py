@@ -1,7 +1,9 @@
 # load_dotenv() HARUS dipanggil sebelum import app modules
 # karena config.py membaca os.getenv() saat module di-load
+import asyncio
 import os
 from pathlib import Path
+import threading
 
 from dotenv import load_dotenv
 
@@ -13,25 +15,41 @@ from app.logging_config import get_logger, setup_logging  # noqa: E402
 setup_logging(app_name="absensi_api", log_level="INFO")
 logger = get_logger(__name__)
 
-from fastapi import Depends, FastAPI, File, Header, HTTPException, UploadFile  # noqa: E402
+from fastapi import (  # noqa: E402
+    Depends,
+    FastAPI,
+    File,
+    Header,
+    HTTPException,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
 from fastapi.responses import JSONResponse  # noqa: E402
 from fastapi.security import HTTPBearer  # noqa: E402
 from sqlalchemy.orm import Session  # noqa: E402
 
+from app import attendance_state, readiness  # noqa: E402
 from app.admin_auth import get_current_admin  # noqa: E402
 from app.admin_auth import router as admin_auth_router  # noqa: E402
 from app.admin_corrections import router as admin_corrections_router  # noqa: E402
 from app.admin_logs import router as admin_logs_router  # noqa: E402
 from app.admin_people import router as admin_people_router  # noqa: E402
+from app.admin_policy import router as admin_policy_router  # noqa: E402
 from app.admin_reports import router as admin_reports_router  # noqa: E402
-from app.attendance import decide_and_record  # noqa: E402
+from app.attendance import record_batch  # noqa: E402
 from app.config import settings  # noqa: E402
-from app.database import Base, engine, get_db  # noqa: E402
+from app.database import SessionLocal, engine, get_db  # noqa: E402
+from app.frame_stream import LatestFrameSlot  # noqa: E402
+from app.inference_pool import InferenceQueueFullError, inference_pool  # noqa: E402
+from app.migrations import run_migrations  # noqa: E402
 from app.policy import get_policy  # noqa: E402
-from app.recog import identify_multiple, rebuild_cache  # noqa: E402
+from app.recog import batcher_stats, identify_multiple, load_cache, load_models, rebuild_cache  # noqa: E402
 
-Base.metadata.create_all(bind=engine)
+# create_all + migrasi, diserialisasi antar worker (lihat app/migrations.py)
+run_migrations(engine)
 
 # Versi dibaca dari env var, fallback ke string default
 APP_VERSION = os.getenv("APP_VERSION", "2.0.0")
@@ -106,12 +124,82 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to check/create default admin: {e}")
 
+    # Model + gallery dimuat di background: uvicorn langsung bind port dan /health
+    # menjawab; recognition mengembalikan 503 sampai /ready melaporkan siap.
+    threading.Thread(target=_warm_up, name="model-warmup", daemon=True).start()
+
+
+def _warm_up():
+    """Muat model (30-60 s di CPU kecil) lalu warm gallery dari snapshot (mmap)."""
+    import time
+
+    readiness.set_status("models", "loading")
+    try:
+        load_models()
+    except Exception as e:
+        logger.error(f"Failed to load face recognition models: {e}")
+        readiness.set_status("models", "error", str(e))
+        return
+    readiness.set_status("models", "ready")
+
+    readiness.set_status("gallery", "loading")
+    for i in range(settings.db_max_retries):
+        try:
+            db = SessionLocal()
+            try:
+                load_cache(db)
+                _warm_attendance_state(db)
+            finally:
+                db.close()
+            readiness.set_status("gallery", "ready")
+            logger.info(f"Service ready: {readiness.snapshot()}")
+            return
+        except Exception as e:
+            logger.error(f"Failed to warm face gallery ({i+1}/{settings.db_max_retries}): {e}")
+            readiness.set_status("gallery", "error", str(e))
+            time.sleep(settings.db_retry_interval)
+
+
+def _warm_attendance_state(db: Session):
+    """State absensi hari ini (cooldown, in/out) ke memori agar penolakan tidak query DB."""
+    from datetime import datetime
+
+    try:
+        day = datetime.now(tz=get_policy(db).tz).date().isoformat()
+        attendance_state.warm(db, day)
+    except Exception as e:
+        logger.error(f"Failed to warm attendance state: {e}")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    inference_pool.shutdown()
+
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for monitoring & Docker healthcheck probe."""
+    """Liveness probe (Docker healthcheck): proses hidup, tanpa cek model/DB."""
     return {"status": "healthy", "version": APP_VERSION}
 
+
+@app.get("/ready")
+def ready_check():
+    """Readiness probe: model, gallery, dan database siap. 503 selama warm-up."""
+    from sqlalchemy import text
+
+    status = readiness.snapshot()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        status["database"] = "ready"
+    except Exception as e:
+        status["database"] = "error"
+        status["error"] = status["error"] or str(e)
+
+    ready = readiness.is_ready() and status["database"] == "ready"
+    status["status"] = "ready" if ready else "not_ready"
+    return JSONResponse(status, status_code=200 if ready else 503)
+
 security = HTTPBearer()
 
 app.add_middleware(
@@ -120,6 +208,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # cursor pagination /admin/events & /admin/daily
 )
 
 
@@ -146,6 +235,7 @@ def verify_device(device_id: str, token: str) -> bool:
 app.include_router(admin_people_router)
 app.include_router(admin_logs_router)
 app.include_router(admin_corrections_router)
+app.include_router(admin_policy_router)
 app.include_router(admin_reports_router)
 app.include_router(admin_auth_router)
 
@@ -153,57 +243,41 @@ app.include_router(admin_auth_router)
 # /health sudah didefinisikan di atas (baris 107) — endpoint ini dihapus (F811 duplicate)
 
 
-@app.post("/v1/recognize_multi")
-async def v1_recognize_multi(
-    file: UploadFile = File(...),
-    x_device_id: str = Header(default=""),
-    x_device_token: str = Header(default=""),
-    db: Session = Depends(get_db),
-):
-    """Recognize multiple faces (max 5) in a single image"""
-
-    logger.info(f"Multi-face recognition request from device: {x_device_id}")
-
-    if not verify_device(x_device_id, x_device_token):
-        logger.warning(f"Unauthorized device access attempt: {x_device_id}")
-        raise HTTPException(status_code=401, detail="Unauthorized device")
-
-    img_bytes = await file.read()
-
+def _recognize_and_record(img_bytes: bytes, device_id: str, db: Session) -> dict:
+    """Pipeline recognition sinkron (CPU-bound + DB). Dijalankan di inference pool."""
     # Detect and identify all faces
-    result = identify_multiple(img_bytes, db, max_faces=5)
+    result = identify_multiple(img_bytes, db, max_faces=5, device_id=device_id)
 
     if result["status"] == "no_face":
-        return JSONResponse({
+        return {
             "status": "no_face",
-            "device_id": x_device_id,
+            "device_id": device_id,
             "faces": [],
             "recognized_names": [],
             "combined_audio": None
-        })
+        }
 
-    # Process attendance for each recognized face
+    # Catat absensi semua wajah yang dikenali dalam satu transaksi. Identitas hasil
+    # reuse track (tanpa embedding frame ini) tidak dicatat — bisa saja orang lain
+    # yang masuk ke posisi yang sama; absensinya tercatat saat track di-embed ulang.
     policy = get_policy(db)
+    recognized = [
+        face for face in result["faces"] if face["status"] == "ok" and face["name"] and not face.get("tracked")
+    ]
+    outcomes = record_batch(
+        db,
+        [{"person_name": face["name"], "distance": face["distance"], "status": "ok"} for face in recognized],
+        device_id=device_id,
+        policy=policy,
+    ) if recognized else []
+    outcome_by_face = {id(face): out for face, out in zip(recognized, outcomes, strict=True)}
+
     processed_faces = []
     attendance_results = []
 
     for face in result["faces"]:
-        if face["status"] == "ok" and face["name"]:
-            # Record attendance for this person
-            out = decide_and_record(
-                db,
-                person_name=face["name"],
-                device_id=x_device_id,
-                distance=face["distance"],
-                status="ok",
-                policy_timezone=policy.timezone,
-                in_start_time=policy.in_start_time,
-                late_after_time=policy.late_after_time,
-                out_start_time=policy.out_start_time,
-                out_end_time=policy.out_end_time,  # NEW: pass out_end_time from policy
-                snapshot_path=None,
-            )
-
+        out = outcome_by_face.get(id(face))
+        if out is not None:
             processed_faces.append({
                 "queue_id": face["queue_id"],
                 "bbox": face["bbox"],
@@ -219,6 +293,15 @@ async def v1_recognize_multi(
                     "event_type": out["event_type"],
                     "late": bool(out.get("is_late", False))
                 })
+        elif face.get("tracked") and face["status"] == "ok":
+            processed_faces.append({
+                "queue_id": face["queue_id"],
+                "bbox": face["bbox"],
+                "name": face["name"],
+                "status": "tracked",
+                "event_type": None,
+                "late": False
+            })
         else:
             processed_faces.append({
                 "queue_id": face["queue_id"],
@@ -236,15 +319,119 @@ async def v1_recognize_multi(
 
     logger.info(f"Multi-face: {len(processed_faces)} faces, {len(recognized_names)} recorded")
 
-    return JSONResponse({
+    return {
         "status": "ok",
-        "device_id": x_device_id,
+        "device_id": device_id,
         "faces": processed_faces,
         "recognized_names": recognized_names,
         "combined_audio": None
-    })
+    }
+
+
+def _recognize_with_session(img_bytes: bytes, device_id: str) -> dict:
+    """
+    `_recognize_and_record` dengan session pendek milik job ini sendiri.
+    Transaksi selesai (commit/rollback + close) per frame, sehingga frame berikutnya
+    melihat tulisan worker/device lain dan koneksi pool tidak ditahan antar frame.
+    """
+    with SessionLocal() as db:
+        return _recognize_and_record(img_bytes, device_id, db)
+
+
+@app.post("/v1/recognize_multi")
+async def v1_recognize_multi(
+    file: UploadFile = File(...),
+    x_device_id: str = Header(default=""),
+    x_device_token: str = Header(default=""),
+    _ready=Depends(readiness.require_ready),
+):
+    """Recognize multiple faces (max 5) in a single image"""
 
+    logger.info(f"Multi-face recognition request from device: {x_device_id}")
 
+    if not verify_device(x_device_id, x_device_token):
+        logger.warning(f"Unauthorized device access attempt: {x_device_id}")
+        raise HTTPException(status_code=401, detail="Unauthorized device")
+
+    img_bytes = await file.read()
+
+    # Inference berjalan di thread pool terpisah agar event loop (& /health) tetap responsif.
+    # Session dibuka di dalam job: session request-scoped bisa ditutup get_db saat job masih antri
+    try:
+        payload = await inference_pool.run(_recognize_with_session, img_bytes, x_device_id)
+    except InferenceQueueFullError as err:
+        logger.warning(f"Inference queue full, rejecting request from {x_device_id}")
+        raise HTTPException(
+            status_code=503,
+            detail="Recognition busy, retry shortly",
+            headers={"Retry-After": "1"},
+        ) from err
+
+    return JSONResponse(payload)
+
+
+
+
+@app.websocket("/v1/stream")
+async def v1_stream(websocket: WebSocket):
+    """
+    Streaming recognition untuk kamera kontinu.
+
+    Device diautentikasi SEKALI saat handshake (header X-Device-Id / X-Device-Token,
+    atau query ?device_id=&token= untuk client yang tidak bisa set header), lalu
+    mengirim frame JPEG sebagai pesan binary. Tiap frame yang diproses dibalas JSON
+    yang sama dengan /v1/recognize_multi plus `seq` dan `dropped`.
+    Jika inference tertinggal, hanya frame terbaru yang diproses (frame lama dibuang).
+    Tiap frame memakai DB session sendiri (tidak ada transaksi/koneksi yang ditahan
+    selama koneksi WebSocket).
+    """
+    device_id = websocket.headers.get("x-device-id") or websocket.query_params.get("device_id", "")
+    token = websocket.headers.get("x-device-token") or websocket.query_params.get("token", "")
+    if not verify_device(device_id, token):
+        logger.warning(f"Unauthorized device stream attempt: {device_id}")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not readiness.is_ready():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    logger.info(f"Stream opened for device: {device_id}")
+    slot = LatestFrameSlot()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    slot.put(message["bytes"])
+        finally:
+            slot.close()
+
+    async def process_frames():
+        while (item := await slot.get()) is not None:
+            seq, frame = item
+            try:
+                payload = await inference_pool.run(_recognize_with_session, frame, device_id)
+            except InferenceQueueFullError:
+                # Pool penuh oleh request lain — frame ini dibuang, lanjut ke frame terbaru
+                slot.dropped += 1
+                payload = {"status": "busy", "device_id": device_id, "faces": [], "recognized_names": []}
+            except Exception as e:
+                logger.error(f"Stream frame failed for {device_id}: {e}")
+                payload = {"status": "error", "device_id": device_id, "faces": [], "recognized_names": []}
+            await websocket.send_json({"seq": seq, "dropped": slot.dropped, **payload})
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        await process_frames()
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # client menutup koneksi saat hasil frame terakhir sedang dikirim
+    finally:
+        receiver.cancel()
+        logger.info(f"Stream closed for device {device_id}: {slot.received} frames, {slot.dropped} dropped")
 
 
 @app.post("/admin/rebuild_cache")
@@ -256,6 +443,14 @@ def admin_rebuild_cache(
     rebuild_cache(db)
     return {"ok": True}
 
+@app.get("/admin/metrics/inference")
+def admin_inference_metrics(_admin=Depends(get_current_admin)):
+    """Statistik inference pool & micro-batcher (ukuran batch, waktu tunggu antrian)."""
+    return {
+        "pool": inference_pool.stats(),
+        "batcher": batcher_stats(),
+    }
+
 @app.post("/admin/cleanup")
 def admin_cleanup(
     days: int = 30,
@@ -292,7 +487,7 @@ def admin_reset_attendance(
     _admin=Depends(get_current_admin)
 ):
     """Reset all attendance data (for demo purposes)"""
-    from app.models import AttendanceEvent, DailyAttendance
+    from app.models import AttendanceEvent, DailyAttendance, MonthlySummary
 
     logger.info("Resetting all attendance data (demo)")
 
@@ -301,8 +496,10 @@ def admin_reset_attendance(
 
     # Delete all daily attendance records
     daily_deleted = db.query(DailyAttendance).delete()
+    db.query(MonthlySummary).delete()
 
     db.commit()
+    attendance_state.invalidate()
 
     logger.info(f"Reset complete: {events_deleted} events, {daily_deleted} daily records deleted")
 
@@ -0,0 +1,276 @@
+"""
+Migrasi schema/data ringan yang dijalankan saat startup (idempotent).
+
+Project ini tidak memakai Alembic — `Base.metadata.create_all` hanya membuat
+tabel yang belum ada, tidak mengubah tabel lama. Step di sini menutup gap itu
+untuk database yang sudah berjalan di production.
+
+Dengan WORKERS>1 setiap worker meng-import app.main dan memanggil `run_migrations`
+bersamaan. Semua step dijalankan di bawah `migration_lock` (advisory lock MySQL
+GET_LOCK, file lock untuk SQLite), sehingga worker berikutnya hanya melihat
+bahwa semuanya sudah diterapkan. DDL yang tetap gagal karena sudah diterapkan
+proses lain (mis. `python -m app.migrations` manual) dianggap sukses.
+
+Bisa juga dijalankan manual:
+    python -m app.migrations
+"""
+from collections.abc import Callable
+from contextlib import contextmanager
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev lokal) — single worker, lock tidak diperlukan
+    fcntl = None
+
+import numpy as np
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import monthly_summary
+from app.config import settings
+from app.database import Base
+from app.logging_config import get_logger
+from app.models import AttendanceEvent
+from app.vector_codec import csv_to_vec, encode_vec
+
+logger = get_logger(__name__)
+
+_EMBEDDING_BATCH = 500
+_LOCK_NAME = "absensi_migrations"
+_LOCK_TIMEOUT_S = 600
+
+
+@contextmanager
+def migration_lock(engine: Engine):
+    """Serialisasi migrasi antar worker/proses."""
+    if engine.dialect.name == "mysql":
+        with engine.connect() as conn:
+            acquired = conn.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"), {"name": _LOCK_NAME, "timeout": _LOCK_TIMEOUT_S}
+            ).scalar()
+            if acquired != 1:
+                raise RuntimeError(f"Timed out waiting for migration lock '{_LOCK_NAME}'")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": _LOCK_NAME})
+        return
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(settings.runtime_dir, exist_ok=True)
+    with open(os.path.join(settings.runtime_dir, "migrations.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _apply_ddl(what: str, apply: Callable[[], None], applied: Callable[[], bool]) -> bool:
+    """
+    Jalankan DDL `apply`. Jika gagal tetapi `applied()` menunjukkan perubahan sudah
+    ada (diterapkan proses lain lebih dulu), anggap sukses. Return True jika step
+    ini yang menerapkannya.
+    """
+    try:
+        apply()
+        return True
+    except DBAPIError as e:
+        if applied():
+            logger.info(f"Migration: {what} already applied ({e.orig})")
+            return False
+        raise
+
+
+def _columns(engine: Engine, table: str) -> dict[str, dict]:
+    return {c["name"]: c for c in inspect(engine).get_columns(table)}
+
+
+def _migrate_embeddings_schema(engine: Engine) -> None:
+    """Tambah kolom `vec_blob` dan jadikan `vec_csv` nullable."""
+    cols = _columns(engine, "embeddings")
+    if "vec_blob" not in cols:
+        logger.info("Migration: adding embeddings.vec_blob column")
+
+        def add_vec_blob():
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE embeddings ADD COLUMN vec_blob BLOB NULL"))
+
+        _apply_ddl("add embeddings.vec_blob", add_vec_blob, lambda: "vec_blob" in _columns(engine, "embeddings"))
+
+    if cols.get("vec_csv", {}).get("nullable", True):
+        return
+
+    logger.info("Migration: making embeddings.vec_csv nullable")
+    if engine.dialect.name == "mysql":
+        def make_nullable():
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE embeddings MODIFY vec_csv TEXT NULL"))
+    elif engine.dialect.name == "sqlite":
+        # SQLite tidak bisa ALTER COLUMN — copy ke tabel baru (satu transaksi DDL)
+        def make_nullable():
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE embeddings RENAME TO embeddings_old"))
+                conn.execute(text(
+                    "CREATE TABLE embeddings ("
+                    "id INTEGER NOT NULL PRIMARY KEY, "
+                    "person_id INTEGER NOT NULL REFERENCES persons (id), "
+                    "vec_blob BLOB, "
+                    "vec_csv TEXT)"
+                ))
+                conn.execute(text(
+                    "INSERT INTO embeddings (id, person_id, vec_blob, vec_csv) "
+                    "SELECT id, person_id, vec_blob, vec_csv FROM embeddings_old"
+                ))
+                conn.execute(text("DROP TABLE embeddings_old"))
+                conn.execute(text("CREATE INDEX ix_embeddings_person_id ON embeddings (person_id)"))
+    else:
+        logger.warning(f"Migration: cannot alter vec_csv on dialect {engine.dialect.name}")
+        return
+    _apply_ddl(
+        "make embeddings.vec_csv nullable", make_nullable, lambda: _columns(engine, "embeddings")["vec_csv"]["nullable"]
+    )
+
+
+def _parse_csv_vec(vec_csv: str) -> np.ndarray:
+    if not vec_csv.strip():
+        raise ValueError("empty vec_csv")
+    vec = csv_to_vec(vec_csv)
+    if vec.ndim != 1 or vec.size == 0 or not np.isfinite(vec).all():
+        raise ValueError("not a 1-D finite vector")
+    return vec
+
+
+def _convert_csv_embeddings(engine: Engine) -> int:
+    """
+    Konversi row lama (vec_csv) ke vec_blob secara batch, lalu kosongkan vec_csv.
+    Row yang tidak bisa di-parse di-log dan dilewati (vec_csv-nya dibiarkan) —
+    satu row rusak tidak boleh menggagalkan boot aplikasi.
+    """
+    converted = skipped = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, vec_csv FROM embeddings "
+                    "WHERE vec_blob IS NULL AND vec_csv IS NOT NULL AND id > :last_id "
+                    "ORDER BY id LIMIT :lim"
+                ),
+                {"last_id": last_id, "lim": _EMBEDDING_BATCH},
+            ).all()
+            if not rows:
+                break
+            params = []
+            for r in rows:
+                try:
+                    params.append({"id": r.id, "blob": encode_vec(_parse_csv_vec(r.vec_csv))})
+                except ValueError as e:
+                    logger.warning(f"Migration: skipping embedding id={r.id}, malformed vec_csv: {e}")
+                    skipped += 1
+            if params:
+                conn.execute(
+                    text("UPDATE embeddings SET vec_blob = :blob, vec_csv = NULL WHERE id = :id AND vec_blob IS NULL"),
+                    params,
+                )
+        converted += len(params)
+        last_id = rows[-1].id
+    if converted or skipped:
+        logger.info(f"Migration: converted {converted} CSV embeddings to binary ({skipped} malformed skipped)")
+    return converted
+
+
+def _index_names(engine: Engine, table: str) -> set[str]:
+    return {ix["name"] for ix in inspect(engine).get_indexes(table)}
+
+
+def _create_missing_indexes(engine: Engine, table: Table) -> list[str]:
+    """Buat index yang dideklarasikan di model tapi belum ada di tabel lama."""
+    existing = _index_names(engine, table.name)
+    created = []
+    for index in sorted(table.indexes, key=lambda ix: ix.name):
+        if index.name in existing:
+            continue
+        # Di MySQL tabel besar ini bisa makan waktu (online DDL, tabel tetap bisa ditulis)
+        logger.info(f"Migration: creating index {index.name} on {table.name}")
+        # "Duplicate key name" dari proses lain = sudah diterapkan
+        if _apply_ddl(
+            f"create index {index.name}",
+            lambda index=index: index.create(bind=engine),
+            lambda index=index: index.name in _index_names(engine, table.name),
+        ):
+            created.append(index.name)
+    return created
+
+
+# Index satu kolom lama yang sudah tercakup sebagai prefix index komposit
+_REDUNDANT_EVENT_INDEXES = (
+    "ix_attendance_events_day",
+    "ix_attendance_events_final_name",
+    "ix_attendance_events_device_id",
+)
+
+
+def _drop_redundant_indexes(engine: Engine, table: Table, redundant: tuple[str, ...]) -> list[str]:
+    existing = _index_names(engine, table.name)
+    dropped = []
+    for name in redundant:
+        if name not in existing:
+            continue
+        logger.info(f"Migration: dropping redundant index {name}")
+        # Bukan Index(...).drop(): Index yang terikat kolom ikut terdaftar di metadata model
+        on_table = f" ON {table.name}" if engine.dialect.name == "mysql" else ""
+
+        def drop(name=name, on_table=on_table):
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP INDEX {name}{on_table}"))
+
+        # "index doesn't exist" dari proses lain = sudah di-drop
+        if _apply_ddl(f"drop index {name}", drop, lambda name=name: name not in _index_names(engine, table.name)):
+            dropped.append(name)
+    return dropped
+
+
+def _backfill_monthly_summary(engine: Engine) -> int:
+    """Isi monthly_summary sekali dari daily_attendance (tabel baru di DB lama)."""
+    with engine.connect() as conn:
+        has_summary = conn.execute(text("SELECT 1 FROM monthly_summary LIMIT 1")).first()
+        has_daily = conn.execute(text("SELECT 1 FROM daily_attendance LIMIT 1")).first()
+    if has_summary or not has_daily:
+        return 0
+    logger.info("Migration: backfilling monthly_summary from daily_attendance")
+    with Session(bind=engine) as db:
+        return monthly_summary.rebuild(db)
+
+
+def run_migrations(engine: Engine) -> None:
+    """
+    Buat tabel baru lalu jalankan semua step migrasi di bawah `migration_lock`.
+    Aman dipanggil berulang kali dan dari beberapa worker sekaligus.
+    """
+    with migration_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        _run_steps(engine)
+
+
+def _run_steps(engine: Engine) -> None:
+    tables = set(inspect(engine).get_table_names())
+    if "embeddings" in tables:
+        _migrate_embeddings_schema(engine)
+        _convert_csv_embeddings(engine)
+    if "attendance_events" in tables:
+        _create_missing_indexes(engine, AttendanceEvent.__table__)
+        _drop_redundant_indexes(engine, AttendanceEvent.__table__, _REDUNDANT_EVENT_INDEXES)
+    if {"monthly_summary", "daily_attendance"} <= tables:
+        _backfill_monthly_summary(engine)
+
+
+if __name__ == "__main__":
+    from app.database import engine
+
+    run_migrations(engine)
+    print("Migrations complete.")
@@ -1,6 +1,17 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -16,9 +27,19 @@ class Embedding(Base):
     __tablename__ = "embeddings"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     person_id: Mapped[int] = mapped_column(ForeignKey("persons.id"), index=True)
-    vec_csv: Mapped[str] = mapped_column(Text, nullable=False)
+    # Format binary (lihat app/vector_codec.py): header 8 byte + float32 LE
+    vec_blob: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    # Legacy: text CSV, hanya terisi untuk row lama sebelum migrasi
+    vec_csv: Mapped[str | None] = mapped_column(Text, nullable=True)
     person = relationship("Person", back_populates="embeddings")
 
+class GalleryState(Base):
+    """Version counter gallery (single row: id=1). Naik setiap enroll/delete person."""
+    __tablename__ = "gallery_state"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
 class AttendancePolicy(Base):
     __tablename__ = "attendance_policy"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)  # single row: id=1
@@ -28,22 +49,40 @@ class AttendancePolicy(Base):
     out_start_time: Mapped[str] = mapped_column(String(5), default="15:00")
     out_end_time: Mapped[str] = mapped_column(String(5), default="17:00")  # NEW: OUT window end
     retention_days: Mapped[int] = mapped_column(Integer, default=60)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    # Dipakai app/policy.py untuk mendeteksi perubahan policy
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+        onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+    )
 
 class AttendanceEvent(Base):
     __tablename__ = "attendance_events"
+    # Index komposit sesuai pola akses (dibuat untuk DB lama oleh app/migrations.py):
+    #   cooldown / state harian: day = ? AND status = 'ok' AND final_name IN (...) → MAX(ts)
+    #   export CSV per hari & /admin/events?day=&status=: day + status, urut ts
+    #   /admin/events filter hari / status / nama / device, urut ts DESC
+    # Index tunggal lama pada day/final_name/device_id jadi prefix index ini (di-drop).
+    __table_args__ = (
+        Index("ix_events_day_ts", "day", "ts"),
+        Index("ix_events_day_status_name_ts", "day", "status", "final_name", "ts"),
+        Index("ix_events_day_status_ts", "day", "status", "ts"),
+        Index("ix_events_status_ts", "status", "ts"),
+        Index("ix_events_final_name_ts", "final_name", "ts"),
+        Index("ix_events_device_ts", "device_id", "ts"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
     # day in local policy timezone at record time
-    day: Mapped[str] = mapped_column(String(10), index=True)  # YYYY-MM-DD
+    day: Mapped[str] = mapped_column(String(10))  # YYYY-MM-DD
 
     # store UTC naive for simplicity
     ts: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), index=True)
 
-    device_id: Mapped[str] = mapped_column(String(80), index=True)
+    device_id: Mapped[str] = mapped_column(String(80))
 
     predicted_name: Mapped[str | None] = mapped_column(String(120), nullable=True, index=True)
-    final_name: Mapped[str | None] = mapped_column(String(120), nullable=True, index=True)
+    final_name: Mapped[str | None] = mapped_column(String(120), nullable=True)
 
     event_type: Mapped[str | None] = mapped_column(String(3), nullable=True)  # IN/OUT
     is_late: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -72,6 +111,16 @@ class DailyAttendance(Base):
 
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
 
+class MonthlySummary(Base):
+    """Rekap bulanan per orang dari daily_attendance, dijaga inkremental (app/monthly_summary.py)."""
+    __tablename__ = "monthly_summary"
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)  # YYYY-MM
+    person_name: Mapped[str] = mapped_column(String(120), primary_key=True)
+    records: Mapped[int] = mapped_column(Integer, default=0)  # jumlah row daily_attendance
+    days_present: Mapped[int] = mapped_column(Integer, default=0)
+    late_count: Mapped[int] = mapped_column(Integer, default=0)
+    missing_out: Mapped[int] = mapped_column(Integer, default=0)
+
 class AdminUser(Base):
     __tablename__ = "admin_users"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
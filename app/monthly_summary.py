@@ -0,0 +1,153 @@
+"""
+Tabel monthly_summary: rekap bulanan per orang yang dijaga inkremental.
+
+Setiap row daily_attendance menyumbang ke (bulan, orang):
+    records      1
+    days_present 1 jika in_time terisi
+    late_count   1 jika in_time terisi dan in_is_late
+    missing_out  1 jika in_time terisi dan out_time kosong
+Penulis daily_attendance (record_batch, correct_event) mencatat kontribusi row
+sebelum (`remove`) dan sesudah (`add`) diubah; `apply` menulis selisihnya dalam
+transaksi yang sama, sehingga /admin/reports/monthly cukup membaca range PK.
+
+Backfill / perbaikan: `rebuild` (lihat scripts/rebuild_monthly_summary.py),
+cek konsistensi terhadap daily_attendance: `find_mismatches`.
+"""
+from collections import defaultdict
+
+from sqlalchemy import and_, case, delete, func, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models import DailyAttendance, MonthlySummary
+
+_FIELDS = ("records", "days_present", "late_count", "missing_out")
+
+
+def presence_columns():
+    """Conditional SUM hadir / terlambat / tidak absen pulang atas daily_attendance."""
+    present = DailyAttendance.in_time.isnot(None)
+    return (
+        func.count().label("records"),
+        func.sum(case((present, 1), else_=0)).label("days_present"),
+        func.sum(case((and_(present, DailyAttendance.in_is_late), 1), else_=0)).label("late_count"),
+        func.sum(case((and_(present, DailyAttendance.out_time.is_(None)), 1), else_=0)).label("missing_out"),
+    )
+
+
+def _contribution(daily: DailyAttendance) -> tuple[int, int, int, int]:
+    present = daily.in_time is not None
+    return (
+        1,
+        int(present),
+        int(present and bool(daily.in_is_late)),
+        int(present and daily.out_time is None),
+    )
+
+
+class SummaryDelta:
+    """Kumpulan selisih monthly_summary untuk satu transaksi."""
+
+    def __init__(self):
+        self._deltas: dict[tuple[str, str], list[int]] = defaultdict(lambda: [0, 0, 0, 0])
+
+    def _accumulate(self, daily: DailyAttendance, sign: int):
+        delta = self._deltas[(daily.day[:7], daily.person_name)]
+        for i, value in enumerate(_contribution(daily)):
+            delta[i] += sign * value
+
+    def remove(self, daily: DailyAttendance):
+        """Panggil SEBELUM mengubah row daily yang sudah ada."""
+        self._accumulate(daily, -1)
+
+    def add(self, daily: DailyAttendance):
+        """Panggil SETELAH row daily dibuat/diubah."""
+        self._accumulate(daily, +1)
+
+    def apply(self, db: Session):
+        """Tulis selisih ke monthly_summary (belum commit — ikut transaksi pemanggil)."""
+        for (month, name), delta in self._deltas.items():
+            if any(delta):
+                _upsert(db, month, name, dict(zip(_FIELDS, delta, strict=True)))
+        self._deltas.clear()
+
+
+def _upsert(db: Session, month: str, name: str, delta: dict[str, int]):
+    dialect = db.get_bind().dialect.name
+    increments = {field: getattr(MonthlySummary, field) + value for field, value in delta.items()}
+    if dialect in ("sqlite", "mysql"):
+        insert = sqlite_insert if dialect == "sqlite" else mysql_insert
+        stmt = insert(MonthlySummary).values(month=month, person_name=name, **delta)
+        if dialect == "sqlite":
+            stmt = stmt.on_conflict_do_update(index_elements=["month", "person_name"], set_=increments)
+        else:
+            stmt = stmt.on_duplicate_key_update(**increments)
+        db.execute(stmt)
+        return
+    result = db.execute(
+        update(MonthlySummary)
+        .where(MonthlySummary.month == month, MonthlySummary.person_name == name)
+        .values(**increments)
+    )
+    if result.rowcount == 0:
+        db.add(MonthlySummary(month=month, person_name=name, **delta))
+
+
+def _aggregate(month: str | None = None):
+    month_col = func.substr(DailyAttendance.day, 1, 7)
+    stmt = select(month_col.label("month"), DailyAttendance.person_name, *presence_columns())
+    if month:
+        stmt = stmt.where(DailyAttendance.day.startswith(month))
+    return stmt.group_by(month_col, DailyAttendance.person_name)
+
+
+def rebuild(db: Session, month: str | None = None) -> int:
+    """Hitung ulang monthly_summary dari daily_attendance (semua bulan atau satu bulan). Commit."""
+    clear = delete(MonthlySummary)
+    if month:
+        clear = clear.where(MonthlySummary.month == month)
+    db.execute(clear)
+    rows = db.execute(_aggregate(month)).all()
+    db.add_all(
+        MonthlySummary(month=r.month, person_name=r.person_name, **{f: int(getattr(r, f)) for f in _FIELDS})
+        for r in rows
+    )
+    db.commit()
+    return len(rows)
+
+
+def find_mismatches(db: Session, month: str | None = None) -> list[dict]:
+    """Bandingkan monthly_summary dengan agregat daily_attendance. List kosong = konsisten."""
+    expected = {
+        (r.month, r.person_name): tuple(int(getattr(r, f)) for f in _FIELDS)
+        for r in db.execute(_aggregate(month))
+    }
+    stored_query = select(MonthlySummary)
+    if month:
+        stored_query = stored_query.where(MonthlySummary.month == month)
+    stored = {
+        (s.month, s.person_name): tuple(getattr(s, f) for f in _FIELDS)
+        for s in db.scalars(stored_query)
+    }
+    zero = (0, 0, 0, 0)
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(key, zero), stored.get(key, zero)
+        if want != have:
+            mismatches.append({
+                "month": key[0],
+                "person_name": key[1],
+                "expected": dict(zip(_FIELDS, want, strict=True)),
+                "stored": dict(zip(_FIELDS, have, strict=True)),
+            })
+    return mismatches
+
+
+def get_month(db: Session, month: str) -> list[MonthlySummary]:
+    """Rekap satu bulan, urut nama (range read pada PK (month, person_name))."""
+    return list(db.scalars(
+        select(MonthlySummary)
+        .where(MonthlySummary.month == month, MonthlySummary.records > 0)
+        .order_by(MonthlySummary.person_name)
+    ))
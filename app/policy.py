@@ -1,11 +1,42 @@
-from dataclasses import dataclass
+"""
+Attendance policy (row tunggal id=1) yang sudah "dikompilasi" untuk hot path.
+
+PolicyData menyimpan nilai mentah (string) sekaligus hasil parse-nya: objek
+`time` untuk jendela IN/OUT dan `ZoneInfo` yang sudah di-resolve, sehingga
+record_batch tidak parse ulang tiap wajah, frame, dan device.
+
+Hot path tidak menyentuh DB: `get_policy` hanya membandingkan generation policy
+lintas worker (app/shared_generation.py, baca 8 byte). Endpoint admin policy
+memanggil `invalidate_policy_cache` setelah commit, yang menaikkan generation
+sehingga semua worker membaca ulang row pada keputusan berikutnya.
+
+_CHECK_INTERVAL hanya backstop untuk edit di luar aplikasi (SQL manual): row dibaca
+ulang (satu lookup PK, tanpa ORM) dan PolicyData hanya dibangun ulang jika isinya —
+termasuk `updated_at` — berubah.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from datetime import time as dtime
+import threading
 import time
+from zoneinfo import ZoneInfo
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app import shared_generation
 from app.models import AttendancePolicy
 
 
+def _parse_time(time_str: str) -> dtime:
+    """Parse time string HH:MM to datetime.time object"""
+    try:
+        parts = time_str.strip().split(":")
+        return dtime(int(parts[0]), int(parts[1]))
+    except (ValueError, IndexError, AttributeError):
+        return dtime(8, 0)  # Default fallback
+
+
 @dataclass
 class PolicyData:
     """Simple data class to hold policy values (avoids SQLAlchemy DetachedInstanceError)"""
@@ -15,36 +46,85 @@ class PolicyData:
     out_start_time: str = "15:00"
     out_end_time: str = "17:00"  # NEW: OUT window end
     retention_days: int = 60
+    updated_at: datetime | None = None
+
+    # Nilai pre-parsed (dihitung sekali di __post_init__)
+    tz: ZoneInfo = field(init=False, repr=False, compare=False)
+    in_start: dtime = field(init=False, repr=False, compare=False)
+    late_after: dtime = field(init=False, repr=False, compare=False)
+    out_start: dtime = field(init=False, repr=False, compare=False)
+    out_end: dtime = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.tz = ZoneInfo(self.timezone)
+        self.in_start = _parse_time(self.in_start_time)
+        self.late_after = _parse_time(self.late_after_time)
+        self.out_start = _parse_time(self.out_start_time)
+        self.out_end = _parse_time(self.out_end_time)
+
+
+_POLICY_COLUMNS = (
+    AttendancePolicy.timezone,
+    AttendancePolicy.in_start_time,
+    AttendancePolicy.late_after_time,
+    AttendancePolicy.out_start_time,
+    AttendancePolicy.out_end_time,
+    AttendancePolicy.retention_days,
+    AttendancePolicy.updated_at,
+)
+
+_GENERATION = "policy"
+_CACHE = {"policy": None, "row": None, "checked_at": 0.0, "generation": None}
+_CHECK_INTERVAL = 300.0
+_LOCK = threading.Lock()
+
+
+def _read_row(db: Session) -> tuple:
+    row = db.execute(select(*_POLICY_COLUMNS).where(AttendancePolicy.id == 1)).one_or_none()
+    if row is None:
+        db.add(AttendancePolicy(id=1))
+        db.commit()
+        row = db.execute(select(*_POLICY_COLUMNS).where(AttendancePolicy.id == 1)).one()
+    return tuple(row)
 
-_CACHE = {"policy": None, "built_at": 0.0}
-_TTL = 5.0
 
 def get_policy(db: Session) -> PolicyData:
-    now = time.time()
-    if _CACHE["policy"] is not None and (now - _CACHE["built_at"]) < _TTL:
+    now = time.monotonic()
+    generation = shared_generation.current(_GENERATION)
+    with _LOCK:
+        if (
+            _CACHE["policy"] is not None
+            and _CACHE["generation"] == generation
+            and (now - _CACHE["checked_at"]) < _CHECK_INTERVAL
+        ):
+            return _CACHE["policy"]
+
+    row = _read_row(db)
+    with _LOCK:
+        # Row sama (termasuk updated_at) → pakai PolicyData lama, tanpa parse ulang
+        if _CACHE["policy"] is None or _CACHE["row"] != row:
+            timezone, in_start, late_after, out_start, out_end, retention_days, updated_at = row
+            _CACHE["policy"] = PolicyData(
+                timezone=timezone,
+                in_start_time=in_start,
+                late_after_time=late_after,
+                out_start_time=out_start,
+                out_end_time=out_end or "17:00",  # Handle old DB without value
+                retention_days=retention_days,
+                updated_at=updated_at,
+            )
+            _CACHE["row"] = row
+        _CACHE["checked_at"] = now
+        _CACHE["generation"] = generation
         return _CACHE["policy"]
 
-    policy_row = db.query(AttendancePolicy).filter(AttendancePolicy.id == 1).one_or_none()
-    if policy_row is None:
-        policy_row = AttendancePolicy(id=1)
-        db.add(policy_row)
-        db.commit()
-        db.refresh(policy_row)
-
-    # Cache plain data values, not the SQLAlchemy object
-    policy_data = PolicyData(
-        timezone=policy_row.timezone,
-        in_start_time=policy_row.in_start_time,
-        late_after_time=policy_row.late_after_time,
-        out_start_time=policy_row.out_start_time,
-        out_end_time=getattr(policy_row, 'out_end_time', '17:00'),  # Handle old DB without column
-        retention_days=policy_row.retention_days,
-    )
-
-    _CACHE["policy"] = policy_data
-    _CACHE["built_at"] = now
-    return policy_data
-
-def invalidate_policy_cache():
-    _CACHE["policy"] = None
-    _CACHE["built_at"] = 0.0
+
+def invalidate_policy_cache(publish: bool = True):
+    """Buang cache lokal; `publish` juga memberi tahu worker lain lewat generation."""
+    with _LOCK:
+        _CACHE["policy"] = None
+        _CACHE["row"] = None
+        _CACHE["checked_at"] = 0.0
+        _CACHE["generation"] = None
+    if publish:
+        shared_generation.bump(_GENERATION)
@@ -0,0 +1,59 @@
+"""
+Status readiness service (beda dengan liveness).
+
+    /health  — liveness: proses hidup & event loop responsif (Docker HEALTHCHECK)
+    /ready   — readiness: model, gallery, dan database siap melayani recognition
+
+Model & gallery dimuat di background saat startup (lihat main.py), jadi
+selama beberapa puluh detik pertama proses sudah hidup tapi belum siap.
+Endpoint recognition/enroll memakai `require_ready` → HTTP 503 + Retry-After.
+"""
+import threading
+import time
+
+from fastapi import HTTPException
+
+_RETRY_AFTER_SECONDS = 5
+
+# Status per komponen: "pending" | "loading" | "ready" | "error"
+_STATE = {
+    "models": "pending",
+    "gallery": "pending",
+    "error": None,
+    "started_at": time.time(),
+    "ready_at": None,
+}
+_LOCK = threading.Lock()
+
+
+def set_status(component: str, status: str, error: str | None = None):
+    with _LOCK:
+        _STATE[component] = status
+        _STATE["error"] = error
+        if _STATE["models"] == "ready" and _STATE["gallery"] == "ready" and _STATE["ready_at"] is None:
+            _STATE["ready_at"] = time.time()
+
+
+def is_ready() -> bool:
+    return _STATE["models"] == "ready" and _STATE["gallery"] == "ready"
+
+
+def snapshot() -> dict:
+    with _LOCK:
+        ready_at = _STATE["ready_at"]
+        return {
+            "models": _STATE["models"],
+            "gallery": _STATE["gallery"],
+            "error": _STATE["error"],
+            "startup_seconds": round(ready_at - _STATE["started_at"], 1) if ready_at else None,
+        }
+
+
+def require_ready():
+    """FastAPI dependency: tolak request selama model/gallery belum siap."""
+    if not is_ready():
+        raise HTTPException(
+            status_code=503,
+            detail="Service warming up, retry shortly",
+            headers={"Retry-After": str(_RETRY_AFTER_SECONDS)},
+        )
@@ -1,133 +1,612 @@
+import threading
+
 import cv2
 from facenet_pytorch import MTCNN, InceptionResnetV1
+from facenet_pytorch.models.utils.detect_face import detect_face
 import numpy as np
 from PIL import Image
 from sqlalchemy.orm import Session
 import torch
 
+from app import gallery_store, tracking
 from app.config import settings
+from app.embed_batcher import EmbeddingBatcher
+from app.gallery_index import create_index
+from app.inference_backend import create_backend
 from app.logging_config import get_logger
-from app.models import Person
+from app.models import Embedding, Person
+from app.vector_codec import row_to_vec
 
 logger = get_logger(__name__)
 
 _DEVICE = "cpu"
-_MODEL = InceptionResnetV1(pretrained="vggface2").eval().to(_DEVICE)
-logger.info(f"Face recognition model loaded on device: {_DEVICE}")
+
+
+def _load_eager_model() -> torch.nn.Module:
+    return InceptionResnetV1(pretrained="vggface2").eval().to(_DEVICE)
+
 
 # MTCNN detector with landmark detection for alignment
 # MTCNN detection thresholds: [P-Net, R-Net, O-Net]
 # Ekstrak ke konstanta agar konsisten (tidak duplikat di defensive reset L117)
 _MTCNN_THRESHOLDS = [0.6, 0.7, 0.8]
+_MTCNN_FACTOR = 0.709
+# Ukuran wajah minimum MTCNN (px di frame asli). Saat deteksi di frame yang
+# diperkecil, nilai ini ikut diskalakan, dengan batas bawah _MTCNN_MIN_FACE_FLOOR
+# (window P-Net 12px — di bawah ~20px deteksi terlalu noisy).
+_MTCNN_MIN_FACE = 80
+_MTCNN_MIN_FACE_FLOOR = 20
 # Minimum face detection confidence (filter post-MTCNN)
 _MIN_DETECTION_PROB = 0.9
 
-_MTCNN = MTCNN(
-    image_size=160,
-    margin=20,
-    keep_all=True,
-    device=_DEVICE,
-    post_process=False,
-    min_face_size=80,
-    thresholds=_MTCNN_THRESHOLDS,
-)
-logger.info("MTCNN face detector initialized")
+# Model dimuat lazy (load_models) — bukan saat import — agar uvicorn bisa bind
+# port dan /health menjawab selagi model dimuat di background (lihat main.py).
+_MODELS = {"backend": None, "mtcnn": None}
+_MODELS_LOCK = threading.Lock()
 
 
-def _align_face(img_rgb: np.ndarray, landmarks: np.ndarray) -> np.ndarray:
-    """
-    Align face using eye landmarks.
-    landmarks: [left_eye_x, left_eye_y, right_eye_x, right_eye_y, nose_x, nose_y, ...]
-    """
-    try:
-        # Extract eye positions (MTCNN returns 5 landmarks: left_eye, right_eye, nose, left_mouth, right_mouth)
-        left_eye = landmarks[0]   # (x, y)
-        right_eye = landmarks[1]  # (x, y)
+def _load_backend():
+    # Backend embedding (torch / torchscript / onnx / int8) — lihat app/inference_backend.py
+    backend = create_backend(
+        settings.inference_backend,
+        _load_eager_model,
+        cache_dir=settings.model_cache_dir,
+        intra_op_threads=settings.onnx_intra_op_threads,
+    )
+    logger.info(f"Face recognition model loaded on device: {_DEVICE} (backend={backend.name})")
+    return backend
 
-        # Calculate angle between eyes
-        dy = right_eye[1] - left_eye[1]
-        dx = right_eye[0] - left_eye[0]
-        angle = np.degrees(np.arctan2(dy, dx))
 
-        # Get center point between eyes
-        eye_center = ((left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2)
+def _load_mtcnn() -> MTCNN:
+    mtcnn = MTCNN(
+        image_size=160,
+        margin=20,
+        keep_all=True,
+        device=_DEVICE,
+        post_process=False,
+        min_face_size=_MTCNN_MIN_FACE,
+        thresholds=_MTCNN_THRESHOLDS,
+        factor=_MTCNN_FACTOR,
+    )
+    logger.info("MTCNN face detector initialized")
+    return mtcnn
+
+
+_LOADERS = {"backend": _load_backend, "mtcnn": _load_mtcnn}
+
+
+def _get_model(key: str):
+    model = _MODELS[key]
+    if model is None:
+        with _MODELS_LOCK:
+            if _MODELS[key] is None:
+                _MODELS[key] = _LOADERS[key]()
+            model = _MODELS[key]
+    return model
 
-        # Get rotation matrix
-        h, w = img_rgb.shape[:2]
-        M = cv2.getRotationMatrix2D(eye_center, angle, 1.0)
 
-        # Apply affine transformation
-        aligned = cv2.warpAffine(img_rgb, M, (w, h), flags=cv2.INTER_CUBIC)
+def load_models():
+    """Muat backend embedding + MTCNN sekali (idempotent, thread-safe). Blocking."""
+    for key in _MODELS:
+        _get_model(key)
+
+
+def models_ready() -> bool:
+    return all(model is not None for model in _MODELS.values())
+
+
+def _get_backend():
+    return _get_model("backend")
+
+
+def _get_mtcnn() -> MTCNN:
+    return _get_model("mtcnn")
+
+
+_ALIGN_SIZE = 160
+
+
+def _align_crop(bgr: np.ndarray, landmarks: np.ndarray, box: tuple[int, int, int, int]) -> np.ndarray:
+    """
+    Align + crop + resize satu wajah dengan SATU warpAffine langsung dari frame BGR ke 160x160.
+
+    Transform = scale(box → 160) · translate(-box) · rotasi(garis mata horizontal di eye center) —
+    geometri sama dengan pipeline lama (rotasi full-frame → crop padded box → resize 160),
+    sehingga embedding yang sudah tersimpan tetap kompatibel. Tanpa warp/konversi warna full-frame.
+    landmarks: 5 titik MTCNN (left_eye, right_eye, nose, left_mouth, right_mouth)
+    box: padded box (x1, y1, x2, y2) dalam koordinat frame
+    """
+    x1, y1, x2, y2 = box
+    sx = _ALIGN_SIZE / max(1, x2 - x1)
+    sy = _ALIGN_SIZE / max(1, y2 - y1)
 
-        return aligned
+    try:
+        left_eye, right_eye = landmarks[0], landmarks[1]
+        angle = np.degrees(np.arctan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0]))
+        eye_center = ((left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2)
+        rot = cv2.getRotationMatrix2D(eye_center, float(angle), 1.0)
     except Exception as e:
         logger.warning(f"Alignment failed, using original: {e}")
-        return img_rgb
+        rot = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+    # Konvensi pixel-center sama dengan resize: u = s * (x - x1 + 0.5) - 0.5
+    crop_to_out = np.array([[sx, 0.0, sx * (0.5 - x1) - 0.5], [0.0, sy, sy * (0.5 - y1) - 0.5], [0.0, 0.0, 1.0]])
+    M = crop_to_out @ np.vstack([rot, [0.0, 0.0, 1.0]])
+    src = bgr
+
+    shrink = min(sx, sy)
+    if shrink < 0.5:
+        # Downscale besar (wajah dekat kamera): perkecil dulu HANYA region sumber wajah
+        # dengan INTER_AREA agar tidak aliasing (setara resize antialias di pipeline lama)
+        inv = cv2.invertAffineTransform(M[:2])
+        corners = inv @ np.array([[0, 0, 1], [_ALIGN_SIZE, 0, 1], [0, _ALIGN_SIZE, 1], [_ALIGN_SIZE, _ALIGN_SIZE, 1]], dtype=np.float64).T
+        h, w = bgr.shape[:2]
+        rx1 = max(0, int(np.floor(corners[0].min())) - 1)
+        ry1 = max(0, int(np.floor(corners[1].min())) - 1)
+        rx2 = min(w, int(np.ceil(corners[0].max())) + 2)
+        ry2 = min(h, int(np.ceil(corners[1].max())) + 2)
+        if rx2 - rx1 > 1 and ry2 - ry1 > 1:
+            dw = max(1, round((rx2 - rx1) * shrink))
+            dh = max(1, round((ry2 - ry1) * shrink))
+            src = cv2.resize(bgr[ry1:ry2, rx1:rx2], (dw, dh), interpolation=cv2.INTER_AREA)
+            fx, fy = dw / (rx2 - rx1), dh / (ry2 - ry1)
+            # Koordinat ROI kecil → koordinat frame
+            M = M @ np.array([[1.0 / fx, 0.0, rx1 + 0.5 / fx - 0.5], [0.0, 1.0 / fy, ry1 + 0.5 / fy - 0.5], [0.0, 0.0, 1.0]])
+
+    return cv2.warpAffine(src, M[:2], (_ALIGN_SIZE, _ALIGN_SIZE), flags=cv2.INTER_CUBIC)
+
+
+# Gallery cache: satu centroid per orang.
+# "vectors" adalah buffer dengan kapasitas >= size (tumbuh 2x / menyusut 1/2),
+# baris valid hanya [0:size]. "rows" memetakan nama → index baris.
+# Setelah load/compaction, "vectors" berupa mmap read-only dari snapshot yang di-share
+# antar worker (di-copy hanya saat ada update). "generation" = generation snapshot
+# yang sedang dipakai proses ini (lihat gallery_store.current_generation).
+# "epoch"/"log_offset"/"log_records" = basis snapshot yang dipakai dan posisi baca
+# di gallery.log (lihat gallery_store.read_log).
+_EMB_DIM = 512
+_MIN_CAPACITY = 16
+# Log ditulis ulang jadi basis baru (O(N)) setelah sekian record — teramortisasi
+_MIN_COMPACT_RECORDS = 64
+# "index" = GalleryIndex (exact/ivf, lihat GALLERY_INDEX) atas vectors[0:size].
+_CACHE = {
+    "names": None, "vectors": None, "size": 0, "rows": {}, "version": None, "generation": None,
+    "epoch": None, "log_offset": 0, "log_records": 0,
+}
+_CACHE["index"] = create_index(settings.gallery_index, nlist=settings.ivf_nlist, nprobe=settings.ivf_nprobe)
+_CACHE_LOCK = threading.RLock()
+
+
+def _centroid(vecs: list[np.ndarray]) -> np.ndarray:
+    return np.vstack(vecs).mean(axis=0).astype(np.float32)
+
+
+def _set_cache(names: list[str], vectors: np.ndarray, version: int, generation: int | None = None):
+    with _CACHE_LOCK:
+        _CACHE["names"] = names
+        _CACHE["vectors"] = vectors
+        _CACHE["size"] = len(names)
+        _CACHE["rows"] = {name: i for i, name in enumerate(names)}
+        _CACHE["version"] = version
+        _CACHE["generation"] = generation
+        _CACHE["epoch"] = None
+        _CACHE["log_offset"] = 0
+        _CACHE["log_records"] = 0
+        _CACHE["index"].build(vectors[: len(names)])
+
+
+def _set_snapshot(snapshot: gallery_store.Snapshot, generation: int):
+    """Pasang basis snapshot lalu terapkan record log-nya."""
+    with _CACHE_LOCK:
+        _set_cache(snapshot.names, snapshot.vectors, snapshot.version, generation)
+        _CACHE["epoch"] = snapshot.epoch
+        _CACHE["log_offset"] = snapshot.log_offset
+        _apply_records(snapshot.records)
+
+
+def _apply_records(records: list[gallery_store.LogRecord]):
+    """Terapkan record log ke cache dan update index hanya di baris yang berubah."""
+    if not records:
+        return
+    changed: set[int] = set()
+    for record in records:
+        if record.op == "put":
+            changed.update(_cache_put(record.name, record.vector))
+        else:
+            changed.update(_cache_pop(record.name))
+        _CACHE["version"] = record.version
+    _CACHE["log_records"] += len(records)
+    _CACHE["index"].update(_CACHE["vectors"][:_CACHE["size"]], changed)
+
+
+def load_cache(db: Session):
+    """Load gallery dari snapshot di disk jika masih valid, selain itu rebuild dari DB."""
+    version = gallery_store.get_version(db)
+    generation = gallery_store.current_generation()
+    snapshot = gallery_store.load_snapshot(version)
+    if snapshot is None:
+        rebuild_cache(db)
+        return
+    _set_snapshot(snapshot, generation)
 
-_CACHE = {"names": None, "vectors": None}
 
-def _csv_to_vec(s: str) -> np.ndarray:
-    from io import StringIO
-    return np.loadtxt(StringIO(s), delimiter=',', dtype=np.float32)
+def sync_cache() -> bool:
+    """
+    Ikuti perubahan yang sudah dipublish worker lain. Murah (baca 8 byte mmap) jika
+    generation tidak berubah sehingga aman dipanggil per request. Jika berubah, cukup
+    baca record baru dari gallery.log; reload snapshot penuh hanya jika basis diganti.
+    Return True jika cache berubah.
+    """
+    if _CACHE["names"] is None:
+        return False
+    generation = gallery_store.current_generation()
+    if generation == _CACHE["generation"]:
+        return False
+    with _CACHE_LOCK:
+        if generation == _CACHE["generation"]:
+            return False
+        log = None
+        if _CACHE["epoch"] is not None:
+            log = gallery_store.read_log(_CACHE["epoch"], _CACHE["log_offset"])
+        if log is not None and log[0]:
+            records, _CACHE["log_offset"] = log
+            _apply_records(records)
+            _CACHE["generation"] = generation
+        else:
+            snapshot = gallery_store.load_snapshot(verify=False)
+            if snapshot is None:
+                # Snapshot sedang ditulis / corrupt — coba lagi di request berikutnya
+                return False
+            _set_snapshot(snapshot, generation)
+    logger.info(f"Gallery synced to generation {generation} ({_CACHE['size']} persons)")
+    return True
+
+
+def _publish():
+    """
+    Tulis cache ke basis snapshot baru (log dikosongkan) lalu re-map dari file agar
+    memory di-share antar worker. O(N) — dipakai saat rebuild dan compaction.
+    Harus dipanggil di dalam _CACHE_LOCK + gallery_store.writer_lock().
+    """
+    names = list(_CACHE["names"])
+    if not gallery_store.save_snapshot(names, _CACHE["vectors"], _CACHE["version"]):
+        _CACHE["index"].build(_CACHE["vectors"][:_CACHE["size"]])
+        return
+    generation = gallery_store.current_generation()
+    snapshot = gallery_store.load_snapshot(verify=False)
+    if snapshot is not None:
+        _set_snapshot(snapshot, generation)
+    else:
+        _CACHE["generation"] = generation
+        _CACHE["epoch"] = None
+        _CACHE["index"].build(_CACHE["vectors"][:_CACHE["size"]])
+
+
+def _publish_change(record: gallery_store.LogRecord, rows: list[int]):
+    """
+    Publish satu perubahan: append record ke gallery.log (O(D)) dan update index di
+    baris `rows` saja. Compaction ke basis baru jika log sudah panjang, atau jika
+    cache ini tidak berada di generation terbaru (append ke basis lama tidak valid).
+    Harus dipanggil di dalam _CACHE_LOCK + gallery_store.writer_lock().
+    """
+    stale = _CACHE["epoch"] is None or _CACHE["generation"] != gallery_store.current_generation()
+    if stale or _CACHE["log_records"] + 1 >= max(_MIN_COMPACT_RECORDS, _CACHE["size"] // 4):
+        _publish()
+        return
+    offset = gallery_store.append_log(_CACHE["epoch"], record)
+    if offset is None:
+        _publish()
+        return
+    _CACHE["log_offset"] = offset
+    _CACHE["log_records"] += 1
+    _CACHE["generation"] = gallery_store.current_generation()
+    _CACHE["index"].update(_CACHE["vectors"][:_CACHE["size"]], rows)
+
 
 def rebuild_cache(db: Session):
     logger.info("Rebuilding face recognition cache...")
-    persons = db.query(Person).all()
-    names, vecs = [], []
-    for p in persons:
-        if not p.embeddings:
-            continue
-        mats = [_csv_to_vec(e.vec_csv) for e in p.embeddings]
-        mean = np.vstack(mats).mean(axis=0)
-        names.append(p.name)
-        vecs.append(mean)
-    _CACHE["names"] = names
-    _CACHE["vectors"] = np.vstack(vecs).astype(np.float32) if vecs else np.zeros((0, 512), dtype=np.float32)
+    version = gallery_store.get_version(db)
+    rows = (
+        db.query(Person.name, Embedding.vec_blob, Embedding.vec_csv)
+        .join(Embedding, Embedding.person_id == Person.id)
+        .order_by(Person.id)
+        .all()
+    )
+    grouped: dict[str, list[np.ndarray]] = {}
+    for name, vec_blob, vec_csv in rows:
+        grouped.setdefault(name, []).append(row_to_vec(vec_blob, vec_csv))
+
+    names = list(grouped.keys())
+    vectors = np.zeros((max(len(names), _MIN_CAPACITY), _EMB_DIM), dtype=np.float32)
+    for i, name in enumerate(names):
+        vectors[i] = _centroid(grouped[name])
+
+    with _CACHE_LOCK, gallery_store.writer_lock():
+        _set_cache(names, vectors, version)
+        _publish()
     logger.info(f"Cache rebuilt with {len(names)} persons")
 
-def _bytes_to_bgr(img_bytes: bytes) -> np.ndarray:
+
+def _resize_buffer(capacity: int):
+    size = _CACHE["size"]
+    buf = np.zeros((capacity, _EMB_DIM), dtype=np.float32)
+    buf[:size] = _CACHE["vectors"][:size]
+    _CACHE["vectors"] = buf
+
+
+def _ensure_writable():
+    # Buffer dari snapshot adalah mmap read-only → copy sekali sebelum dimodifikasi
+    if not _CACHE["vectors"].flags.writeable:
+        _resize_buffer(max(_MIN_CAPACITY, _CACHE["size"] * 2))
+
+
+def _cache_put(name: str, vec: np.ndarray) -> list[int]:
+    """Insert/replace centroid satu orang. Amortized O(1). Return baris yang berubah."""
+    _ensure_writable()
+    row = _CACHE["rows"].get(name)
+    if row is None:
+        row = _CACHE["size"]
+        if row >= _CACHE["vectors"].shape[0]:
+            _resize_buffer(max(_MIN_CAPACITY, row * 2))
+        _CACHE["names"].append(name)
+        _CACHE["rows"][name] = row
+        _CACHE["size"] = row + 1
+    _CACHE["vectors"][row] = vec
+    return [row]
+
+
+def _cache_pop(name: str) -> list[int]:
+    """
+    Hapus centroid dengan swap-with-last, lalu compact jika buffer terlalu longgar.
+    Return baris yang isinya berubah (baris terakhir yang hilang tidak termasuk).
+    """
+    if name not in _CACHE["rows"]:
+        return []
+    _ensure_writable()
+    row = _CACHE["rows"].pop(name)
+    last = _CACHE["size"] - 1
+    changed = []
+    if row != last:
+        moved = _CACHE["names"][last]
+        _CACHE["vectors"][row] = _CACHE["vectors"][last]
+        _CACHE["names"][row] = moved
+        _CACHE["rows"][moved] = row
+        changed.append(row)
+    _CACHE["names"].pop()
+    _CACHE["size"] = last
+
+    capacity = _CACHE["vectors"].shape[0]
+    if capacity > _MIN_CAPACITY and last < capacity // 4:
+        _resize_buffer(max(_MIN_CAPACITY, capacity // 2))
+    return changed
+
+
+def update_person_cache(db: Session, person: Person):
+    """
+    Refresh centroid satu orang setelah enroll — O(embedding orang tsb), bukan O(database).
+    Perubahan dipublish sebagai satu record log (lihat _publish_change), bukan snapshot penuh.
+    Jika cache proses ini belum dimuat (warm-up masih berjalan / request pertama setelah
+    restart), build penuh dari DB lalu publish — tanpa publish generation tidak naik dan
+    worker lain tetap memakai gallery lama.
+    """
+    if _CACHE["names"] is None:
+        rebuild_cache(db)
+        return
+    rows = (
+        db.query(Embedding.vec_blob, Embedding.vec_csv)
+        .filter(Embedding.person_id == person.id)
+        .all()
+    )
+    vecs = [row_to_vec(vec_blob, vec_csv) for vec_blob, vec_csv in rows]
+    version = gallery_store.get_version(db)
+    with _CACHE_LOCK, gallery_store.writer_lock():
+        # Pastikan mulai dari generation terbaru sebelum update (worker lain mungkin sudah publish)
+        sync_cache()
+        if vecs:
+            centroid = _centroid(vecs)
+            changed = _cache_put(person.name, centroid)
+            record = gallery_store.LogRecord("put", person.name, centroid, version)
+        else:
+            changed = _cache_pop(person.name)
+            record = gallery_store.LogRecord("pop", person.name, None, version)
+        _CACHE["version"] = version
+        _publish_change(record, changed)
+    logger.info(f"Cache updated for {person.name} ({len(vecs)} embeddings)")
+
+
+def remove_person_cache(db: Session, name: str):
+    """Hapus satu orang dari cache (setelah delete person). Cache belum dimuat → build penuh + publish."""
+    if _CACHE["names"] is None:
+        rebuild_cache(db)
+        return
+    version = gallery_store.get_version(db)
+    with _CACHE_LOCK, gallery_store.writer_lock():
+        sync_cache()
+        changed = _cache_pop(name)
+        _CACHE["version"] = version
+        _publish_change(gallery_store.LogRecord("pop", name, None, version), changed)
+    logger.info(f"Cache entry removed for {name}")
+
+
+def _bytes_to_bgr(img_bytes: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
     arr = np.frombuffer(img_bytes, dtype=np.uint8)
-    bgr = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    bgr = cv2.imdecode(arr, flags)
     if bgr is None:
         raise ValueError("invalid_image")
     return bgr
 
-def _preprocess(face_bgr: np.ndarray) -> torch.Tensor:
+
+# Decode JPEG langsung di domain DCT pada 1/2, 1/4, 1/8 resolusi (libjpeg scaling)
+_JPEG_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# Marker SOF (start of frame) berisi dimensi; C4/C8/CC bukan SOF
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(data: bytes) -> tuple[int, int] | None:
+    """Baca (width, height) dari header JPEG tanpa decode. None jika bukan JPEG / tidak valid."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0x01, *range(0xD0, 0xD8)):  # marker tanpa payload
+            i += 2
+            continue
+        length = int.from_bytes(data[i + 2:i + 4], "big")
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return (width, height) if width and height else None
+        i += 2 + length
+    return None
+
+
+def _decode_for_detection(img_bytes: bytes, max_edge: int | None = None) -> tuple[np.ndarray, float]:
+    """
+    Decode upload untuk recognition. Jika JPEG jauh lebih besar dari DECODE_MAX_EDGE,
+    decode langsung di 1/2, 1/4, atau 1/8 resolusi (sisi terpanjang tetap >= max_edge).
+    Return (bgr, coord_scale): koordinat asli = koordinat hasil decode * coord_scale.
+    """
+    max_edge = settings.decode_max_edge if max_edge is None else max_edge
+    size = _jpeg_size(img_bytes) if max_edge > 0 else None
+    if size is not None:
+        long_edge = max(size)
+        for factor, flag in _JPEG_REDUCED_FLAGS:
+            if long_edge / factor >= max_edge:
+                bgr = _bytes_to_bgr(img_bytes, flag)
+                # Rasio sisi terpanjang — tetap benar jika EXIF orientation memutar gambar
+                return bgr, long_edge / max(bgr.shape[:2])
+    return _bytes_to_bgr(img_bytes), 1.0
+
+def _preprocess_array(face_bgr: np.ndarray) -> np.ndarray:
+    """BGR crop → array float32 (160, 160, 3) ternormalisasi."""
     rgb = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2RGB)
     pil = Image.fromarray(rgb).resize((160, 160))
     x = np.asarray(pil).astype(np.float32)
-    x = (x - 127.5) / 128.0
-    return torch.from_numpy(x).permute(2, 0, 1).unsqueeze(0).to(_DEVICE)
+    return (x - 127.5) / 128.0
+
+def _preprocess_batch(faces_bgr: list[np.ndarray]) -> np.ndarray:
+    """List BGR crop → batch NCHW float32 (N, 3, 160, 160)."""
+    batch = np.stack([_preprocess_array(f) for f in faces_bgr])
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
 
-@torch.inference_mode()
 def embed_face(face_bgr: np.ndarray) -> np.ndarray:
-    t = _preprocess(face_bgr)
-    return _MODEL(t).cpu().numpy().astype(np.float32)[0]
+    return embed_faces([face_bgr])[0]
 
+def embed_faces(faces_bgr: list[np.ndarray]) -> np.ndarray:
+    """Embed banyak crop dalam satu forward pass. Return (N, 512) float32."""
+    if not faces_bgr:
+        return np.zeros((0, _EMB_DIM), dtype=np.float32)
+    return _get_backend()(_preprocess_batch(faces_bgr))
 
-def _detect_faces_internal(bgr: np.ndarray, max_faces: int = 5, sort_left_to_right: bool = False, include_queue_id: bool = False) -> list:
+
+# Micro-batching lintas request (None = embed langsung per request)
+_BATCHER = (
+    EmbeddingBatcher(embed_faces, settings.embed_batch_window_ms, settings.embed_max_batch)
+    if settings.embed_batch_window_ms > 0
+    else None
+)
+
+
+def embed_faces_batched(faces_bgr: list[np.ndarray]) -> np.ndarray:
+    """Seperti embed_faces, tapi lewat micro-batcher jika EMBED_BATCH_WINDOW_MS > 0."""
+    if _BATCHER is None:
+        return embed_faces(faces_bgr)
+    return _BATCHER.submit(faces_bgr)
+
+
+def batcher_stats() -> dict | None:
+    return _BATCHER.stats() if _BATCHER is not None else None
+
+
+def _detection_scale(shape: tuple, max_edge: int) -> float:
+    """Faktor skala (<= 1) agar sisi terpanjang frame <= max_edge. 0 = nonaktif."""
+    long_edge = max(shape[:2])
+    if max_edge <= 0 or long_edge <= max_edge:
+        return 1.0
+    return max_edge / long_edge
+
+
+def _mtcnn_detect(rgb: np.ndarray, min_face_size: int) -> tuple:
+    """
+    Setara MTCNN.detect(rgb, landmarks=True) tapi dengan min_face_size per panggilan
+    (instance MTCNN dipakai bersama antar thread inference, jadi tidak boleh dimutasi).
+    """
+    mtcnn = _get_mtcnn()
+
+    # Defensive Fix: Validate thresholds to prevent IndexError
+    if isinstance(mtcnn.thresholds, list) and len(mtcnn.thresholds) < 3:
+        logger.warning(f"MTCNN thresholds corrupted (len={len(mtcnn.thresholds)}). Resetting to defaults.")
+        mtcnn.thresholds = list(_MTCNN_THRESHOLDS)  # pakai konstanta, bukan literal duplikat
+
+    with torch.no_grad():
+        batch_boxes, batch_points = detect_face(
+            rgb, min_face_size, mtcnn.pnet, mtcnn.rnet, mtcnn.onet, mtcnn.thresholds, mtcnn.factor, mtcnn.device
+        )
+    boxes = np.asarray(batch_boxes[0])
+    points = np.asarray(batch_points[0])
+    if len(boxes) == 0:
+        return None, None, None
+    # Urut dari wajah terbesar (perilaku select_largest MTCNN)
+    order = np.argsort((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]))[::-1]
+    return boxes[order, :4], boxes[order, 4], points[order]
+
+
+def _detect_faces_internal(
+    bgr: np.ndarray,
+    max_faces: int = 5,
+    sort_left_to_right: bool = False,
+    include_queue_id: bool = False,
+    max_edge: int | None = None,
+    coord_scale: float = 1.0,
+) -> list:
     """
     Internal helper for face detection. Used by both detect_faces and detect_faces_from_bgr.
 
+    MTCNN dijalankan pada salinan frame yang diperkecil (sisi terpanjang <= DETECTION_MAX_EDGE),
+    lalu box & landmark dipetakan kembali ke koordinat asli; crop diambil dari frame asli.
+
     Args:
         bgr: BGR image array
         max_faces: Maximum number of faces to detect
         sort_left_to_right: Sort faces by x position
         include_queue_id: Include queue_id in results
+        max_edge: Override DETECTION_MAX_EDGE (0 = deteksi di resolusi penuh)
+        coord_scale: `bgr` sudah diperkecil saat decode; bbox/face_px dikembalikan
+            dalam koordinat gambar asli (dikali faktor ini)
     """
-    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-
-    # Defensive Fix: Validate thresholds to prevent IndexError
-    if isinstance(_MTCNN.thresholds, list) and len(_MTCNN.thresholds) < 3:
-        logger.warning(f"MTCNN thresholds corrupted (len={len(_MTCNN.thresholds)}). Resetting to defaults.")
-        _MTCNN.thresholds = list(_MTCNN_THRESHOLDS)  # pakai konstanta, bukan literal duplikat
+    h, w = bgr.shape[:2]
+    scale = _detection_scale(bgr.shape, settings.detection_max_edge if max_edge is None else max_edge)
+    if scale < 1.0:
+        small = cv2.resize(bgr, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        fx, fy = w / small.shape[1], h / small.shape[0]
+    else:
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        fx = fy = 1.0
 
     # Use MTCNN to detect faces and landmarks
-    boxes, probs, landmarks = _MTCNN.detect(rgb, landmarks=True)
+    min_face_size = max(_MTCNN_MIN_FACE_FLOOR, round(_MTCNN_MIN_FACE * scale / coord_scale))
+    boxes, probs, landmarks = _mtcnn_detect(rgb, min_face_size)
 
     if boxes is None or len(boxes) == 0:
         return []
 
+    if scale < 1.0:
+        boxes = boxes * np.array([fx, fy, fx, fy])
+        landmarks = landmarks * np.array([fx, fy])
+
     valid_faces = []
 
     # Filter by probability and collect valid faces
@@ -148,7 +627,6 @@ def _detect_faces_internal(bgr: np.ndarray, max_faces: int = 5, sort_left_to_rig
     valid_faces = valid_faces[:max_faces]
 
     results = []
-    h, w = bgr.shape[:2]
 
     for i, (box, prob, lm) in enumerate(valid_faces):
         x1, y1, x2, y2 = [int(v) for v in box]
@@ -167,17 +645,16 @@ def _detect_faces_internal(bgr: np.ndarray, max_faces: int = 5, sort_left_to_rig
         x2_pad = min(w, x2 + pad_w)
         y2_pad = min(h, y2 + pad_h)
 
-        # Align face using landmarks before cropping
-        aligned_rgb = _align_face(rgb, lm)
-        aligned_bgr = cv2.cvtColor(aligned_rgb, cv2.COLOR_RGB2BGR)
-
-        # Crop from aligned image
-        crop = aligned_bgr[y1_pad:y2_pad, x1_pad:x2_pad]
+        # Align + crop + resize ke 160x160 dalam satu warp (hanya region wajah)
+        crop = _align_crop(bgr, lm, (x1_pad, y1_pad, x2_pad, y2_pad))
 
         result = {
             "crop": crop,
             "confidence": float(prob),
-            "bbox": [x1, y1, x2, y2]
+            "bbox": [round(v * coord_scale) for v in (x1, y1, x2, y2)],
+            # Ukuran padded crop di frame asli (crop selalu 160x160) — sama dengan
+            # ukuran yang dulu dicek MIN_FACE_PX sebelum resize
+            "face_px": round(min(x2_pad - x1_pad, y2_pad - y1_pad) * coord_scale),
         }
 
         if include_queue_id:
@@ -198,45 +675,66 @@ def detect_faces_from_bgr(bgr: np.ndarray, max_faces: int = 1) -> list:
 
 def detect_faces(img_bytes: bytes, max_faces: int = 5) -> list:
     """Detect multiple faces using MTCNN, with alignment. Returns list sorted left-to-right."""
-    bgr = _bytes_to_bgr(img_bytes)
-    results = _detect_faces_internal(bgr, max_faces=max_faces, sort_left_to_right=True, include_queue_id=True)
+    bgr, coord_scale = _decode_for_detection(img_bytes)
+    results = _detect_faces_internal(
+        bgr, max_faces=max_faces, sort_left_to_right=True, include_queue_id=True, coord_scale=coord_scale
+    )
     logger.info(f"MTCNN detected {len(results)} faces (aligned)")
     return results
 
 
-def identify_single(face_crop: np.ndarray, db: Session) -> dict:
-    """Identify a single face crop against the cache"""
+def identify_faces(face_crops: list[np.ndarray], db: Session, face_sizes: list[int] | None = None) -> list[dict]:
+    """
+    Identify banyak face crop sekaligus: satu forward pass untuk semua crop yang valid,
+    lalu satu pencarian gallery untuk seluruh matrix embedding.
+    face_sizes: ukuran wajah (px) di frame asli untuk cek MIN_FACE_PX; default ukuran crop.
+    """
     if _CACHE["names"] is None:
-        rebuild_cache(db)
-
-    names = _CACHE["names"] or []
-    vectors = _CACHE["vectors"]
+        load_cache(db)
+    else:
+        sync_cache()
 
-    if vectors is None or vectors.shape[0] == 0:
-        return {"status": "error", "name": None, "distance": None}
+    if _CACHE["size"] == 0:
+        return [{"status": "error", "name": None, "distance": None} for _ in face_crops]
 
-    h, w = face_crop.shape[:2]
-    if min(h, w) < settings.min_face_px:
-        return {"status": "reject", "name": None, "distance": None}
+    results: list[dict] = [{"status": "reject", "name": None, "distance": None} for _ in face_crops]
+    if face_sizes is None:
+        face_sizes = [min(crop.shape[:2]) for crop in face_crops]
+    valid = [i for i, size in enumerate(face_sizes) if size >= settings.min_face_px]
+    if not valid:
+        return results
 
     try:
-        emb = embed_face(face_crop)
-        dists = np.linalg.norm(vectors - emb[None, :], axis=1)
-        best_idx = int(np.argmin(dists))
-        dist = float(dists[best_idx])
-        name = names[best_idx]
+        embs = embed_faces_batched([face_crops[i] for i in valid])
+        with _CACHE_LOCK:
+            idx, dists = _CACHE["index"].search(embs)
+            names = [_CACHE["names"][int(j)] for j in idx]
+    except Exception as e:
+        logger.error(f"identify_faces error: {e}")
+        for i in valid:
+            results[i] = {"status": "error", "name": None, "distance": None}
+        return results
 
+    for i, name, dist in zip(valid, names, dists.tolist(), strict=True):
         if dist > settings.max_distance:
-            return {"status": "unknown", "name": None, "distance": dist}
+            results[i] = {"status": "unknown", "name": None, "distance": dist}
+        else:
+            results[i] = {"status": "ok", "name": name, "distance": dist}
+    return results
 
-        return {"status": "ok", "name": name, "distance": dist}
-    except Exception as e:
-        logger.error(f"identify_single error: {e}")
-        return {"status": "error", "name": None, "distance": None}
+
+def identify_single(face_crop: np.ndarray, db: Session) -> dict:
+    """Identify a single face crop against the cache"""
+    return identify_faces([face_crop], db)[0]
 
 
-def identify_multiple(img_bytes: bytes, db: Session, max_faces: int = 5) -> dict:
-    """Detect and identify multiple faces in a single image"""
+def identify_multiple(img_bytes: bytes, db: Session, max_faces: int = 5, device_id: str | None = None) -> dict:
+    """
+    Detect and identify multiple faces in a single image.
+    Dengan device_id dan TRACK_REUSE_FRAMES > 0, wajah yang ter-track dari frame
+    sebelumnya memakai ulang identitasnya tanpa embedding (lihat app/tracking.py);
+    wajah tersebut ditandai "tracked": True dan tidak dipakai untuk mencatat absensi.
+    """
     try:
         faces_data = detect_faces(img_bytes, max_faces)
 
@@ -250,9 +748,30 @@ def identify_multiple(img_bytes: bytes, db: Session, max_faces: int = 5) -> dict
         results = []
         recognized_names = []
 
-        for face in faces_data:
-            result = identify_single(face["crop"], db)
-
+        tracker = tracking.get_tracker(device_id)
+        if tracker is None:
+            tracks = [None] * len(faces_data)
+            reused = [False] * len(faces_data)
+        else:
+            if _CACHE["names"] is not None:
+                sync_cache()  # versi gallery terbaru untuk validasi identitas track
+            version = _CACHE["version"]
+            tracks = tracker.match(faces_data)
+            reused = [tracker.reusable(t, f, version) for t, f in zip(tracks, faces_data, strict=True)]
+
+        # Semua wajah yang perlu di-embed dalam frame diproses dalam satu batch
+        todo = [i for i, r in enumerate(reused) if not r]
+        embedded = identify_faces(
+            [faces_data[i]["crop"] for i in todo], db, face_sizes=[faces_data[i]["face_px"] for i in todo]
+        ) if todo else []
+        identified: list[dict] = [
+            {"status": t.status, "name": t.name, "distance": t.distance} if r else {}
+            for t, r in zip(tracks, reused, strict=True)
+        ]
+        for i, result in zip(todo, embedded, strict=True):
+            identified[i] = result
+
+        for face, result, track, was_reused in zip(faces_data, identified, tracks, reused, strict=True):
             face_result = {
                 "queue_id": face["queue_id"],
                 "bbox": face["bbox"],
@@ -260,12 +779,19 @@ def identify_multiple(img_bytes: bytes, db: Session, max_faces: int = 5) -> dict
                 "name": result["name"],
                 "distance": result["distance"]
             }
+            if tracker is not None:
+                track = tracker.observe(track, face, result, embedded=not was_reused, gallery_version=_CACHE["version"])
+                face_result["track_id"] = track.track_id
+                face_result["tracked"] = was_reused
             results.append(face_result)
 
             if result["status"] == "ok" and result["name"]:
                 recognized_names.append(result["name"])
 
-        logger.info(f"Multi-face: {len(results)} detected, {len(recognized_names)} recognized")
+        logger.info(
+            f"Multi-face: {len(results)} detected, {len(recognized_names)} recognized, "
+            f"{len(results) - len(todo)} reused from tracks"
+        )
 
         return {
             "status": "ok",
@@ -0,0 +1,72 @@
+"""
+Counter generation lintas worker untuk invalidasi cache in-memory.
+
+Mekanisme sama dengan `gallery.gen` di gallery_store: satu uint64 di file kecil
+(`RUNTIME_DIR/<name>.gen`) yang di-mmap oleh semua worker. Penulis memanggil
+`bump` setelah commit; pembaca cukup membandingkan `current` (baca 8 byte) dengan
+nilai yang terakhir dilihat dan membuang cache-nya jika berbeda.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows (dev lokal) — single worker, lock tidak diperlukan
+    fcntl = None
+
+import numpy as np
+
+from app.config import settings
+
+_MAPS: dict[str, np.memmap] = {}
+_LOCK = threading.Lock()
+
+
+def _path(name: str) -> str:
+    return os.path.join(settings.runtime_dir, f"{name}.gen")
+
+
+def _map(name: str) -> np.memmap:
+    m = _MAPS.get(name)
+    if m is not None:
+        return m
+    with _LOCK:
+        if name not in _MAPS:
+            os.makedirs(settings.runtime_dir, exist_ok=True)
+            # "ab" tidak menimpa counter yang sudah ditulis worker lain
+            with open(_path(name), "ab") as f:
+                if f.tell() < 8:
+                    f.truncate(8)
+            _MAPS[name] = np.memmap(_path(name), dtype="<u8", mode="r+", shape=(1,))
+        return _MAPS[name]
+
+
+def current(name: str) -> int:
+    try:
+        return int(_map(name)[0])
+    except OSError:
+        return 0
+
+
+def bump(name: str) -> int:
+    """Naikkan counter (flock antar proses agar increment tidak hilang). Return nilai baru."""
+    try:
+        m = _map(name)
+        with open(_path(name), "rb") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                m[0] += 1
+                m.flush()
+                return int(m[0])
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+    except OSError:
+        return 0
+
+
+def reset():
+    """Lepas semua mmap (dipakai test saat RUNTIME_DIR diganti)."""
+    with _LOCK:
+        _MAPS.clear()
@@ -0,0 +1,151 @@
+"""
+Tracking wajah lintas frame per device untuk melewati embedding yang berulang.
+
+Orang yang berdiri di depan kamera muncul di banyak frame berturut-turut; tiap
+frame sebelumnya menjalankan MTCNN + FaceNet + pencarian gallery penuh. Tracker
+ini mencocokkan bbox hasil deteksi dengan track frame sebelumnya (IoU greedy, minimal
+TRACK_IOU_THRESHOLD — tanpa overlap tidak pernah dianggap orang yang sama) dan memakai
+ulang identitas track selama:
+    - track masih segar: < TRACK_REUSE_FRAMES frame sejak embedding terakhir
+      dan terlihat dalam TRACK_TTL_SECONDS terakhir
+    - confidence deteksi tidak turun di bawah TRACK_MIN_CONFIDENCE
+    - wajah masih >= MIN_FACE_PX (syarat yang sama dengan identify_faces)
+    - gallery belum berubah (versi sama) sejak identitas ditentukan
+Hanya identitas "ok" yang dipakai ulang; wajah unknown/reject selalu di-embed ulang.
+Identitas hasil reuse hanya untuk tampilan — absensi dicatat dari frame yang di-embed.
+"""
+from dataclasses import dataclass
+import itertools
+import threading
+import time
+
+from app.config import settings
+
+
+@dataclass
+class Track:
+    track_id: int
+    bbox: list[int]
+    name: str | None
+    status: str
+    distance: float | None
+    gallery_version: int | None
+    frames_since_embed: int = 0
+    last_seen: float = 0.0
+
+
+def _iou(a: list[int], b: list[int]) -> float:
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTracker:
+    def __init__(
+        self,
+        reuse_frames: int,
+        iou_threshold: float = 0.3,
+        ttl_seconds: float = 2.0,
+        min_confidence: float = 0.95,
+        min_face_px: int = 80,
+    ):
+        self.reuse_frames = reuse_frames
+        self.iou_threshold = iou_threshold
+        self.ttl_seconds = ttl_seconds
+        self.min_confidence = min_confidence
+        self.min_face_px = min_face_px
+        self._tracks: list[Track] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def match(self, faces: list[dict], now: float | None = None) -> list[Track | None]:
+        """Pasangkan tiap wajah (dict dengan "bbox") ke track aktif; None = wajah baru."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._tracks = [t for t in self._tracks if now - t.last_seen <= self.ttl_seconds]
+            pairs = []
+            for fi, face in enumerate(faces):
+                for ti, track in enumerate(self._tracks):
+                    iou = _iou(face["bbox"], track.bbox)
+                    if iou >= self.iou_threshold:
+                        pairs.append((iou, fi, ti))
+            # Greedy: pasangan dengan IoU terbesar lebih dulu, tiap track/wajah sekali
+            matched: list[Track | None] = [None] * len(faces)
+            used: set[int] = set()
+            for _, fi, ti in sorted(pairs, key=lambda p: -p[0]):
+                if matched[fi] is None and ti not in used:
+                    matched[fi] = self._tracks[ti]
+                    used.add(ti)
+            return matched
+
+    def reusable(self, track: Track | None, face: dict, gallery_version: int | None, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        x1, y1, x2, y2 = face["bbox"]
+        face_px = face.get("face_px", min(x2 - x1, y2 - y1))
+        return (
+            track is not None
+            and track.status == "ok"
+            and track.frames_since_embed < self.reuse_frames
+            and now - track.last_seen <= self.ttl_seconds
+            and face.get("confidence", 1.0) >= self.min_confidence
+            and face_px >= self.min_face_px
+            and track.gallery_version == gallery_version
+        )
+
+    def observe(
+        self,
+        track: Track | None,
+        face: dict,
+        result: dict,
+        embedded: bool,
+        gallery_version: int | None,
+        now: float | None = None,
+    ) -> Track:
+        """Perbarui track dengan hasil frame ini (buat track baru jika belum ada)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if track is None:
+                track = Track(
+                    track_id=next(self._ids),
+                    bbox=face["bbox"],
+                    name=result["name"],
+                    status=result["status"],
+                    distance=result["distance"],
+                    gallery_version=gallery_version,
+                )
+                self._tracks.append(track)
+            elif embedded:
+                track.name = result["name"]
+                track.status = result["status"]
+                track.distance = result["distance"]
+                track.gallery_version = gallery_version
+                track.frames_since_embed = 0
+            else:
+                track.frames_since_embed += 1
+            track.bbox = face["bbox"]
+            track.last_seen = now
+            return track
+
+
+_TRACKERS: dict[str, FaceTracker] = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def get_tracker(device_id: str) -> FaceTracker | None:
+    """Tracker milik device; None jika tracking nonaktif (TRACK_REUSE_FRAMES=0)."""
+    if not device_id or settings.track_reuse_frames <= 0:
+        return None
+    with _TRACKERS_LOCK:
+        tracker = _TRACKERS.get(device_id)
+        if tracker is None:
+            tracker = FaceTracker(
+                reuse_frames=settings.track_reuse_frames,
+                iou_threshold=settings.track_iou_threshold,
+                ttl_seconds=settings.track_ttl_seconds,
+                min_confidence=settings.track_min_confidence,
+                min_face_px=settings.min_face_px,
+            )
+            _TRACKERS[device_id] = tracker
+        return tracker
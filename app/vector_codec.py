@@ -0,0 +1,57 @@
+"""
+Binary codec untuk embedding wajah (kolom `embeddings.vec_blob`).
+
+Format (little-endian):
+    [0:2]  magic b"FV"
+    [2]    versi format (saat ini 1)
+    [3]    dtype code (0 = float32)
+    [4:8]  dimensi vektor (uint32)
+    [8:]   data vektor, raw float32 LE (512 dim = 2048 byte)
+
+Header 8 byte menjaga payload tetap aligned 4-byte sehingga `decode_vec`
+bisa memakai `np.frombuffer` tanpa copy.
+"""
+from io import StringIO
+import struct
+
+import numpy as np
+
+_MAGIC = b"FV"
+FORMAT_VERSION = 1
+_DTYPE_FLOAT32 = 0
+_HEADER = struct.Struct("<2sBBI")
+HEADER_SIZE = _HEADER.size  # 8 byte
+
+
+def encode_vec(v: np.ndarray) -> bytes:
+    """Encode 1-D vector menjadi blob versi terbaru."""
+    arr = np.ascontiguousarray(v, dtype="<f4").reshape(-1)
+    return _HEADER.pack(_MAGIC, FORMAT_VERSION, _DTYPE_FLOAT32, arr.shape[0]) + arr.tobytes()
+
+
+def decode_vec(blob: bytes) -> np.ndarray:
+    """Decode blob menjadi vector float32 (read-only view, zero-copy)."""
+    if len(blob) < HEADER_SIZE:
+        raise ValueError("embedding blob too short")
+    magic, version, dtype_code, dim = _HEADER.unpack_from(blob)
+    if magic != _MAGIC:
+        raise ValueError("embedding blob has invalid magic")
+    if version != FORMAT_VERSION or dtype_code != _DTYPE_FLOAT32:
+        raise ValueError(f"unsupported embedding blob format v{version}/dtype{dtype_code}")
+    if len(blob) != HEADER_SIZE + dim * 4:
+        raise ValueError("embedding blob length does not match header")
+    return np.frombuffer(blob, dtype="<f4", count=dim, offset=HEADER_SIZE)
+
+
+def csv_to_vec(s: str) -> np.ndarray:
+    """Parse format lama (`embeddings.vec_csv`). Hanya untuk migrasi/fallback."""
+    return np.loadtxt(StringIO(s), delimiter=",", dtype=np.float32)
+
+
+def row_to_vec(vec_blob: bytes | None, vec_csv: str | None) -> np.ndarray:
+    """Ambil vector dari row `Embedding`, utamakan kolom binary."""
+    if vec_blob is not None:
+        return decode_vec(vec_blob)
+    if vec_csv:
+        return csv_to_vec(vec_csv)
+    raise ValueError("embedding row has no vector data")
@@ -0,0 +1,111 @@
+"""
+Benchmark deteksi wajah: latency & recall MTCNN untuk DETECTION_MAX_EDGE berbeda.
+
+Setiap foto di-resize ke beberapa resolusi frame (sisi terpanjang, mis. 1280/1920/3840
+≈ 720p/1080p/4K), lalu dideteksi dengan beberapa DETECTION_MAX_EDGE. Recall dihitung
+terhadap deteksi resolusi penuh (max_edge=0) pada frame yang sama (match IoU >= 0.5).
+
+Contoh:
+    python scripts/bench_detection.py --images ./samples --resolutions 1920 3840 --max-edge 0 1280 960 640
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.recog import _detect_faces_internal
+
+_IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _load_images(paths: list[str]) -> list[np.ndarray]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, f) for f in sorted(os.listdir(path))
+                if os.path.splitext(f)[1].lower() in _IMAGE_EXTS
+            )
+        else:
+            files.append(path)
+    images = [cv2.imread(f, cv2.IMREAD_COLOR) for f in files]
+    return [img for img in images if img is not None]
+
+
+def _resize_long_edge(bgr: np.ndarray, long_edge: int) -> np.ndarray:
+    h, w = bgr.shape[:2]
+    scale = long_edge / max(h, w)
+    interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(bgr, (round(w * scale), round(h * scale)), interpolation=interp)
+
+
+def _iou(a, b) -> float:
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _matched(reference: list, found: list, threshold: float = 0.5) -> int:
+    return sum(1 for ref in reference if any(_iou(ref, box) >= threshold for box in found))
+
+
+def _detect(frame: np.ndarray, max_edge: int, max_faces: int, repeat: int) -> tuple[list, float]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        faces = _detect_faces_internal(frame, max_faces=max_faces, max_edge=max_edge)
+    return [f["bbox"] for f in faces], (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MTCNN detection on downscaled frames")
+    parser.add_argument("--images", nargs="+", required=True, help="File atau folder foto")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[1280, 1920, 3840])
+    parser.add_argument("--max-edge", type=int, nargs="+", default=[0, 1280, 960, 640])
+    parser.add_argument("--max-faces", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = _load_images(args.images)
+    if not images:
+        sys.exit("No readable images")
+
+    # Warm-up (load MTCNN) agar tidak ikut terukur
+    _detect_faces_internal(images[0], max_faces=1, max_edge=0)
+
+    print("=" * 72)
+    print(f"Images: {len(images)}  |  repeat: {args.repeat}")
+    print("=" * 72)
+    print(f"{'Frame':>7} {'max_edge':>9} {'ms/frame':>10} {'faces':>7} {'recall':>8} {'speedup':>9}")
+    print("-" * 72)
+    for resolution in args.resolutions:
+        frames = [_resize_long_edge(img, resolution) for img in images]
+        reference = [_detect(f, 0, args.max_faces, 1)[0] for f in frames]
+        n_ref = sum(len(r) for r in reference)
+        baseline_ms = None
+        for max_edge in args.max_edge:
+            total_ms, found, matched = 0.0, 0, 0
+            for frame, ref in zip(frames, reference, strict=True):
+                boxes, ms = _detect(frame, max_edge, args.max_faces, args.repeat)
+                total_ms += ms
+                found += len(boxes)
+                matched += _matched(ref, boxes)
+            ms_per_frame = total_ms / len(frames)
+            if baseline_ms is None:
+                baseline_ms = ms_per_frame  # speedup relatif terhadap max_edge pertama
+            recall = matched / n_ref if n_ref else 1.0
+            label = "full" if max_edge == 0 else str(max_edge)
+            print(
+                f"{resolution:>7} {label:>9} {ms_per_frame:>10.1f} {found:>7} {recall:>8.3f} "
+                f"{baseline_ms / ms_per_frame:>8.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
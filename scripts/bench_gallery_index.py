@@ -0,0 +1,76 @@
+"""
+Benchmark index gallery: recall@1 dan latency exact vs IVF.
+
+Memakai snapshot gallery (GALLERY_DIR) jika ada, selain itu data sintetis.
+
+Contoh:
+    python scripts/bench_gallery_index.py --synthetic 50000 --nprobe 4 8 16
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.gallery_index import ExactIndex, IVFIndex, evaluate_index
+
+
+def _synthetic_gallery(n: int, dim: int = 512, seed: int = 0) -> np.ndarray:
+    # Embedding FaceNet ~ unit norm; buat cluster agar mirip distribusi nyata
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 50), dim)).astype(np.float32)
+    x = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _load_gallery(synthetic: int) -> np.ndarray:
+    if synthetic:
+        return _synthetic_gallery(synthetic)
+    from app.gallery_store import load_snapshot
+
+    snapshot = load_snapshot()
+    if snapshot is None:
+        print("No gallery snapshot found, using 20000 synthetic identities")
+        return _synthetic_gallery(20000)
+    return np.asarray(snapshot.vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gallery index (exact vs IVF)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Pakai N identitas sintetis")
+    parser.add_argument("--queries", type=int, default=500, help="Jumlah query")
+    parser.add_argument("--noise", type=float, default=0.3, help="Noise query relatif terhadap gallery")
+    parser.add_argument("--nlist", type=int, default=0, help="Jumlah cluster IVF (0 = sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    vectors = _load_gallery(args.synthetic).astype(np.float32)
+    rng = np.random.default_rng(1)
+    picks = rng.integers(len(vectors), size=args.queries)
+    queries = vectors[picks] + args.noise * rng.standard_normal((args.queries, vectors.shape[1])).astype(np.float32) / np.sqrt(vectors.shape[1])
+
+    exact = ExactIndex()
+    exact.build(vectors)
+    results = [evaluate_index(exact, vectors, queries)]
+
+    ivf = IVFIndex(nlist=args.nlist)
+    ivf.build(vectors)
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        r = evaluate_index(ivf, vectors, queries)
+        r["index"] = f"ivf(nprobe={nprobe})"
+        results.append(r)
+
+    print("=" * 70)
+    print(f"Gallery size: {len(vectors)}  |  Queries: {len(queries)}")
+    print("=" * 70)
+    print(f"{'Index':<20} {'Recall@1':>10} {'ms/query':>12} {'exact ms/query':>16}")
+    print("-" * 70)
+    for r in results:
+        print(f"{r['index']:<20} {r['recall_at_1']:>10.4f} {r['index_ms_per_query']:>12.4f} {r['exact_ms_per_query']:>16.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 API_ROOT = os.path.dirname(SCRIPT_DIR)
 sys.path.append(API_ROOT)
 
+from app.config import settings  # noqa: E402
 from app.database import engine, Base, SessionLocal
 from app.models import AdminUser # Ensure models are loaded
 from app.security import hash_password
@@ -74,6 +75,8 @@ def main():
 
     # 2. Clean API Files
     clean_directory(os.path.join(API_ROOT, "data", "snapshots"))
+    # Snapshot gallery lama bisa lolos cek version (DB baru mulai dari 0) — hapus juga
+    clean_directory(os.path.join(API_ROOT, settings.gallery_dir))
     clean_directory(os.path.join(API_ROOT, "logs"))
     
     sqlite_path = os.path.join(API_ROOT, "absensi.db")
@@ -0,0 +1,205 @@
+"""
+Kalibrasi INT8 model embedding + laporan regresi akurasi vs FP32.
+
+Dataset berlabel lokal: satu subfolder per orang, berisi foto wajah
+(sama seperti foto yang dipakai saat enroll). Crop diambil lewat pipeline
+deteksi + alignment yang sama dengan enroll (detect_faces_from_bgr), plus
+augmentasi enroll, sehingga kalibrasi melihat distribusi yang sama dengan gallery.
+
+    dataset/
+        alice/ 1.jpg 2.jpg ...
+        bob/   1.jpg ...
+
+Contoh:
+    # Kalibrasi static INT8 (conv + linear) lalu simpan artifact ke MODEL_CACHE_DIR
+    python scripts/quantize_model.py --dataset ./dataset --calibrate
+
+    # Hanya laporan akurasi (memakai artifact int8 yang sudah ada / dynamic)
+    python scripts/quantize_model.py --dataset ./dataset --report report.json
+
+Setelah kalibrasi, set INFERENCE_BACKEND=int8.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.admin_people import augment_image
+from app.config import settings
+from app.inference_backend import (
+    Int8Backend,
+    TorchBackend,
+    export_torchscript,
+    int8_artifact_path,
+    quantize_static_int8,
+)
+from app.recog import _centroid, _load_eager_model, _preprocess_batch, detect_faces_from_bgr
+
+_IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def _load_dataset(root: str) -> tuple[list[str], list[np.ndarray]]:
+    """Return (labels, crops) — satu crop wajah ter-align per foto yang terdeteksi."""
+    labels, crops = [], []
+    for person in sorted(os.listdir(root)):
+        folder = os.path.join(root, person)
+        if not os.path.isdir(folder):
+            continue
+        for fname in sorted(os.listdir(folder)):
+            if os.path.splitext(fname)[1].lower() not in _IMAGE_EXTS:
+                continue
+            bgr = cv2.imread(os.path.join(folder, fname), cv2.IMREAD_COLOR)
+            if bgr is None:
+                continue
+            faces = detect_faces_from_bgr(bgr, max_faces=1)
+            if faces:
+                labels.append(person)
+                crops.append(faces[0]["crop"])
+    return labels, crops
+
+
+def _batches(crops: list[np.ndarray], batch_size: int):
+    for i in range(0, len(crops), batch_size):
+        yield _preprocess_batch(crops[i:i + batch_size])
+
+
+def _embed(backend, crops: list[np.ndarray], batch_size: int) -> tuple[np.ndarray, float]:
+    started = time.perf_counter()
+    embs = np.concatenate([backend(b) for b in _batches(crops, batch_size)])
+    return embs, (time.perf_counter() - started) * 1000 / max(1, len(crops))
+
+
+def _summary(values: np.ndarray) -> dict:
+    if len(values) == 0:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean": round(float(values.mean()), 4),
+        "std": round(float(values.std()), 4),
+        "p5": round(float(np.percentile(values, 5)), 4),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+    }
+
+
+def _pair_distances(embs: np.ndarray, labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    d = np.linalg.norm(embs[:, None, :] - embs[None, :, :], axis=2)
+    iu = np.triu_indices(len(embs), k=1)
+    same = labels[iu[0]] == labels[iu[1]]
+    return d[iu][same], d[iu][~same]
+
+
+def _identification(embs: np.ndarray, labels: np.ndarray, max_distance: float) -> dict:
+    """
+    Leave-one-out: tiap foto dicocokkan ke centroid per orang dari foto-foto LAIN
+    (recog._centroid, sama persis dengan gallery produksi), dengan threshold MAX_DISTANCE.
+    """
+    people = sorted(set(labels))
+    correct = unknown = evaluated = 0
+    for i in range(len(embs)):
+        names, centroids = [], []
+        for p in people:
+            mask = labels == p
+            mask[i] = False
+            if mask.any():
+                centroids.append(_centroid(list(embs[mask])))
+                names.append(p)
+        if labels[i] not in names:
+            continue  # orang dengan satu foto tidak bisa dievaluasi
+        evaluated += 1
+        dists = np.linalg.norm(np.stack(centroids) - embs[i], axis=1)
+        best = int(np.argmin(dists))
+        if dists[best] > max_distance:
+            unknown += 1
+        elif names[best] == labels[i]:
+            correct += 1
+    return {
+        "evaluated": evaluated,
+        "accuracy": round(correct / evaluated, 4) if evaluated else 0.0,
+        "unknown_rate": round(unknown / evaluated, 4) if evaluated else 0.0,
+    }
+
+
+def _model_report(embs: np.ndarray, labels: np.ndarray, ms_per_face: float) -> dict:
+    genuine, impostor = _pair_distances(embs, labels)
+    return {
+        "ms_per_face": round(ms_per_face, 3),
+        "genuine_distance": _summary(genuine),
+        "impostor_distance": _summary(impostor),
+        "false_reject_rate": round(float((genuine > settings.max_distance).mean()), 4) if len(genuine) else 0.0,
+        "false_accept_rate": round(float((impostor <= settings.max_distance).mean()), 4) if len(impostor) else 0.0,
+        "identification": _identification(embs, labels, settings.max_distance),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 calibration + accuracy report vs FP32")
+    parser.add_argument("--dataset", required=True, help="Folder berlabel: satu subfolder per orang")
+    parser.add_argument("--calibrate", action="store_true", help="Kalibrasi static INT8 dan simpan artifact")
+    parser.add_argument("--max-calib", type=int, default=512, help="Maksimum crop untuk kalibrasi")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--cache-dir", default=settings.model_cache_dir)
+    parser.add_argument("--report", default="", help="Simpan laporan JSON ke path ini")
+    args = parser.parse_args()
+
+    labels, crops = _load_dataset(args.dataset)
+    if not crops:
+        sys.exit(f"No faces found in {args.dataset}")
+    print(f"Dataset: {len(crops)} faces, {len(set(labels))} people")
+
+    fp32 = TorchBackend(_load_eager_model())
+
+    if args.calibrate:
+        # Augmentasi enroll → kalibrasi melihat variasi yang sama dengan embedding gallery
+        calib = [aug for crop in crops for aug in augment_image(crop)]
+        rng = np.random.default_rng(0)
+        calib = [calib[i] for i in rng.permutation(len(calib))[:args.max_calib]]
+        quantized = quantize_static_int8(_load_eager_model(), _batches(calib, args.batch_size))
+        path = int8_artifact_path(args.cache_dir)
+        export_torchscript(quantized, path)
+        print(f"Static INT8 model saved to {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    int8 = Int8Backend.load(_load_eager_model, args.cache_dir)
+
+    ref, fp32_ms = _embed(fp32, crops, args.batch_size)
+    out, int8_ms = _embed(int8, crops, args.batch_size)
+    label_arr = np.asarray(labels)
+    drift = np.linalg.norm(out - ref, axis=1)
+
+    report = {
+        "dataset": {"faces": len(crops), "people": len(set(labels))},
+        "max_distance": settings.max_distance,
+        "int8_mode": int8.mode,
+        "embedding_drift_l2": _summary(drift),
+        "fp32": _model_report(ref, label_arr, fp32_ms),
+        "int8": _model_report(out, label_arr, int8_ms),
+    }
+
+    print("=" * 70)
+    print(f"INT8 mode: {int8.mode}  |  MAX_DISTANCE: {settings.max_distance}")
+    print(f"Embedding drift L2: mean={report['embedding_drift_l2']['mean']}  p95={report['embedding_drift_l2']['p95']}")
+    print("=" * 70)
+    print(f"{'':<8} {'ms/face':>9} {'genuine':>9} {'impostor':>9} {'FRR':>7} {'FAR':>7} {'ident acc':>10}")
+    print("-" * 70)
+    for name in ("fp32", "int8"):
+        r = report[name]
+        print(
+            f"{name:<8} {r['ms_per_face']:>9.2f} {r['genuine_distance'].get('mean', 0):>9.4f} "
+            f"{r['impostor_distance'].get('mean', 0):>9.4f} {r['false_reject_rate']:>7.3f} "
+            f"{r['false_accept_rate']:>7.3f} {r['identification']['accuracy']:>10.4f}"
+        )
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
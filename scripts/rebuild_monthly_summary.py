@@ -0,0 +1,47 @@
+"""
+Rebuild / cek tabel monthly_summary dari daily_attendance.
+
+monthly_summary dijaga inkremental oleh pencatatan absensi dan koreksi admin.
+Script ini untuk backfill, memperbaiki setelah edit manual di database, atau
+memastikan keduanya konsisten.
+
+Contoh:
+    python scripts/rebuild_monthly_summary.py --check               # cek semua bulan
+    python scripts/rebuild_monthly_summary.py --month 2025-01       # rebuild satu bulan
+    python scripts/rebuild_monthly_summary.py                       # rebuild semua
+Exit code 1 jika --check menemukan selisih.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import monthly_summary
+from app.database import Base, SessionLocal, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or check the monthly_summary table")
+    parser.add_argument("--month", help="YYYY-MM (default: semua bulan)")
+    parser.add_argument("--check", action="store_true", help="Hanya cek konsistensi, tanpa menulis")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.check:
+            mismatches = monthly_summary.find_mismatches(db, args.month)
+            for m in mismatches:
+                print(f"{m['month']} {m['person_name']}: expected={m['expected']} stored={m['stored']}")
+            print(f"{len(mismatches)} mismatch(es)")
+            sys.exit(1 if mismatches else 0)
+
+        rows = monthly_summary.rebuild(db, args.month)
+        print(f"monthly_summary rebuilt for {args.month or 'all months'}: {rows} rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
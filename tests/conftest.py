@@ -0,0 +1,69 @@
+"""
+Fixture bersama: database SQLite in-memory per test.
+
+StaticPool agar semua session (termasuk yang dibuka endpoint/generator lain)
+memakai koneksi yang sama — database in-memory hanya hidup di satu koneksi.
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import attendance_state, shared_generation
+from app.admin_auth import get_current_admin
+from app.config import settings
+from app.database import Base, get_db
+from app.policy import invalidate_policy_cache
+
+
+@pytest.fixture(autouse=True)
+def runtime_dir(tmp_path, monkeypatch):
+    """Counter generation lintas worker ditulis ke direktori sementara per test."""
+    monkeypatch.setattr(settings, "runtime_dir", str(tmp_path / "runtime"))
+    shared_generation.reset()
+    yield tmp_path / "runtime"
+    shared_generation.reset()
+
+
+@pytest.fixture
+def memory_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(memory_engine):
+    return sessionmaker(bind=memory_engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    """Session pada database kosong; cache in-memory (policy, state absensi) di-reset."""
+    attendance_state.invalidate()
+    invalidate_policy_cache()
+    session = session_factory()
+    yield session
+    session.close()
+    attendance_state.invalidate()
+    invalidate_policy_cache()
+
+
+@pytest.fixture
+def admin_client(session_factory):
+    """Factory TestClient untuk satu router admin: get_db → database test, auth dilewati."""
+    def override_get_db():
+        with session_factory() as session:
+            yield session
+
+    def make(router) -> TestClient:
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_current_admin] = lambda: None
+        return TestClient(app)
+
+    return make
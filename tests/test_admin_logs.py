@@ -0,0 +1,71 @@
+"""
+Pagination /admin/events & /admin/daily: mode offset (lama) dan cursor (keyset).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.admin_logs import router
+from app.models import AttendanceEvent, DailyAttendance
+
+
+@pytest.fixture
+def client(session_factory, admin_client):
+    db = session_factory()
+    base = datetime(2025, 1, 6, 1, 0, 0)
+    for i in range(7):
+        # Dua event per ts → tie-break id harus menjaga urutan stabil
+        db.add(AttendanceEvent(day="2025-01-06", ts=base + timedelta(minutes=i // 2), device_id="cam-1",
+                               final_name=f"p{i}", status="ok"))
+    for day in ("2025-01-05", "2025-01-06"):
+        for name in ("alice", "bob", "carol"):
+            db.add(DailyAttendance(day=day, person_name=name))
+    db.commit()
+    db.close()
+    return admin_client(router)
+
+
+def _walk(client, path, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit} | ({"cursor": cursor} if cursor else {})
+        resp = client.get(path, params=params)
+        assert resp.status_code == 200
+        pages.append(resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_event_cursor_pages_match_offset_order(client):
+    full = client.get("/admin/events", params={"limit": 50}).json()
+    pages = _walk(client, "/admin/events", 3)
+    assert [r["id"] for page in pages for r in page] == [r["id"] for r in full]
+    assert [len(p) for p in pages] == [3, 3, 1]
+
+
+def test_cursor_is_stable_when_new_events_arrive(client, session_factory):
+    first = client.get("/admin/events", params={"limit": 3})
+    with session_factory() as db:
+        db.add(AttendanceEvent(day="2025-01-07", ts=datetime(2025, 1, 7), device_id="cam-1", final_name="new",
+                               status="ok"))
+        db.commit()
+    second = client.get("/admin/events", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]})
+    assert "new" not in [r["final_name"] for r in second.json()]
+    assert second.json()[0]["id"] < first.json()[-1]["id"]
+
+
+def test_daily_cursor_pages(client):
+    pages = _walk(client, "/admin/daily", 2)
+    rows = [(r["day"], r["person_name"]) for page in pages for r in page]
+    assert rows == [(d, n) for d in ("2025-01-06", "2025-01-05") for n in ("alice", "bob", "carol")]
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bnVsbA", "WyJ4IiwxXQ"])
+def test_invalid_cursor_is_rejected(client, cursor):
+    assert client.get("/admin/events", params={"cursor": cursor}).status_code == 400
+
+
+def test_cursor_and_offset_are_exclusive(client):
+    cursor = client.get("/admin/daily", params={"limit": 1}).headers["X-Next-Cursor"]
+    assert client.get("/admin/daily", params={"cursor": cursor, "offset": 5}).status_code == 400
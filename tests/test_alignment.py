@@ -0,0 +1,66 @@
+"""
+Alignment satu-pass (_align_crop) harus setara dengan pipeline lama:
+rotasi full-frame → crop padded box → resize 160x160.
+"""
+import cv2
+import numpy as np
+from PIL import Image
+import pytest
+
+from app import recog
+from app.config import settings
+from app.recog import _align_crop
+
+
+def _reference_align(bgr, landmarks, box):
+    left_eye, right_eye = landmarks[0], landmarks[1]
+    angle = np.degrees(np.arctan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0]))
+    center = ((left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2)
+    h, w = bgr.shape[:2]
+    rotated = cv2.warpAffine(bgr, cv2.getRotationMatrix2D(center, angle, 1.0), (w, h), flags=cv2.INTER_CUBIC)
+    x1, y1, x2, y2 = box
+    crop = rotated[y1:y2, x1:x2]
+    return np.asarray(Image.fromarray(crop).resize((160, 160)))
+
+
+@pytest.fixture(scope="module")
+def frame():
+    # Frame 1080p halus (tanpa noise) agar perbedaan interpolasi tidak mendominasi
+    yy, xx = np.mgrid[0:1080, 0:1920]
+    channels = [127 + 100 * np.sin(xx / 37.0 + k) * np.cos(yy / 53.0) for k in range(3)]
+    return np.stack(channels, axis=-1).clip(0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize(
+    ("box", "landmarks"),
+    [
+        ((500, 300, 700, 520), [[560, 380], [640, 392]]),     # wajah sedang, sedikit miring
+        ((900, 100, 1500, 760), [[1050, 350], [1350, 300]]),  # wajah besar → jalur pre-shrink
+        ((0, 0, 150, 170), [[40, 60], [110, 64]]),            # menempel tepi frame
+    ],
+)
+def test_single_pass_matches_full_frame_warp(frame, box, landmarks):
+    lm = np.asarray(landmarks, dtype=np.float32)
+    out = _align_crop(frame, lm, box)
+
+    assert out.shape == (160, 160, 3)
+    diff = np.abs(out.astype(np.float32) - _reference_align(frame, lm, box).astype(np.float32))
+    assert diff.mean() < 1.0
+
+
+@pytest.mark.parametrize(
+    ("side", "coord_scale", "face_px", "accepted"),
+    [(70, 1.0, 90, True), (60, 1.0, 78, False), (70, 2.0, 180, True)],
+)
+def test_face_px_uses_padded_box(frame, monkeypatch, side, coord_scale, face_px, accepted):
+    # MIN_FACE_PX dicek terhadap padded crop (bbox + 15% tiap sisi), seperti sebelum alignment satu-pass
+    box = np.array([[400.0, 300.0, 400.0 + side, 300.0 + side]])
+    lm = np.array([[[420.0, 320.0], [450.0, 320.0], [435, 335], [425, 350], [445, 350]]])
+    monkeypatch.setattr(recog, "_mtcnn_detect", lambda rgb, min_face_size: (box, np.array([0.999]), lm))
+
+    faces = recog._detect_faces_internal(frame, max_faces=1, max_edge=0, coord_scale=coord_scale)
+
+    assert faces[0]["face_px"] == face_px
+    # bbox 70 px lolos MIN_FACE_PX=80 (padded 90 px), bbox 60 px tidak
+    assert settings.min_face_px == 80
+    assert (faces[0]["face_px"] >= settings.min_face_px) == accepted
@@ -0,0 +1,67 @@
+"""
+Pencatatan absensi batch per frame: satu transaksi untuk semua wajah.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import attendance_state
+from app.attendance import record_batch
+from app.models import AttendanceEvent, DailyAttendance
+from app.policy import PolicyData
+
+_POLICY = PolicyData(
+    timezone="UTC", in_start_time="00:00", late_after_time="23:59", out_start_time="00:00", out_end_time="23:59"
+)
+
+
+@pytest.fixture
+def db(db, memory_engine):
+    """Session dari conftest + penghitung commit/SELECT."""
+    session = db
+    session.commits = 0
+    session.selects = 0
+
+    def count_commit(_conn):
+        session.commits += 1
+
+    def count_select(_conn, _cursor, statement, *_args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            session.selects += 1
+
+    event.listen(memory_engine, "commit", count_commit)
+    event.listen(memory_engine, "before_cursor_execute", count_select)
+    return session
+
+
+def _face(name, status="ok"):
+    return {"person_name": name, "distance": 0.4, "status": status}
+
+
+def test_frame_is_recorded_in_one_transaction(db):
+    # Warm state dulu agar hanya query write path yang terhitung
+    attendance_state.get(db, datetime.now(timezone.utc).date().isoformat(), "warmup")
+    db.commits = db.selects = 0
+
+    out = record_batch(
+        db, [_face("alice"), _face("bob"), _face("alice"), _face(None, "unknown")], device_id="cam-1", policy=_POLICY
+    )
+
+    assert [o["status"] for o in out] == ["ok", "ok", "cooldown", "unknown"]
+    assert [o["event_type"] for o in out[:2]] == ["IN", "IN"]
+    assert db.commits == 1
+    # event ok terakhir (1) + daily rows (1), bukan 2-4 query per wajah
+    assert db.selects == 2
+    assert db.query(AttendanceEvent).count() == 2
+    assert db.query(DailyAttendance).count() == 2
+
+
+def test_second_frame_is_cooldown_without_commit(db):
+    record_batch(db, [_face("alice"), _face("bob")], device_id="cam-1", policy=_POLICY)
+    db.commits = db.selects = 0
+
+    out = record_batch(db, [_face("alice"), _face("bob")], device_id="cam-1", policy=_POLICY)
+    assert [o["status"] for o in out] == ["cooldown", "cooldown"]
+    assert db.commits == 0
+    assert db.selects == 0
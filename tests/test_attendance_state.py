@@ -0,0 +1,77 @@
+"""
+Cooldown/duplicate ditolak dari state in-memory tanpa query DB.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import attendance_state, shared_generation
+from app.attendance import decide_and_record
+from app.models import AttendanceEvent, DailyAttendance
+from app.policy import PolicyData
+
+_POLICY = PolicyData(
+    timezone="UTC", in_start_time="00:00", late_after_time="23:59", out_start_time="00:00", out_end_time="23:59"
+)
+
+
+@pytest.fixture
+def db(db, memory_engine):
+    """Session dari conftest + daftar statement SQL yang dieksekusi."""
+    statements: list[str] = []
+    event.listen(memory_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    db.statements = statements
+    return db
+
+
+def _record(db, name="alice"):
+    return decide_and_record(db, person_name=name, device_id="cam-1", distance=0.4, status="ok", policy=_POLICY)
+
+
+def test_cooldown_is_decided_without_queries(db):
+    assert _record(db)["event_type"] == "IN"
+
+    db.statements.clear()
+    out = _record(db)
+    assert out["status"] == "cooldown"
+    assert db.statements == []
+
+
+def test_out_and_duplicate_after_cooldown(db):
+    assert _record(db)["event_type"] == "IN"
+    # Geser event ok terakhir ke luar jendela cooldown
+    past = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+    db.query(AttendanceEvent).update({AttendanceEvent.ts: past})
+    db.commit()
+    attendance_state.update(db.query(DailyAttendance).one().day, "alice", last_ok_ts=past)
+
+    assert _record(db)["event_type"] == "OUT"
+
+    attendance_state.update(db.query(DailyAttendance).one().day, "alice", last_ok_ts=past)
+    db.statements.clear()
+    assert _record(db)["status"] == "duplicate"
+    assert db.statements == []
+
+
+def test_invalidate_reloads_from_db(db):
+    assert _record(db)["event_type"] == "IN"
+    # Reset di luar decide_and_record (mis. admin) → state harus dimuat ulang
+    db.query(AttendanceEvent).delete()
+    db.query(DailyAttendance).delete()
+    db.commit()
+    attendance_state.invalidate()
+
+    assert _record(db)["event_type"] == "IN"
+
+
+def test_invalidate_in_other_worker_reloads_before_rejecting(db):
+    assert _record(db)["event_type"] == "IN"
+    # Worker lain mengoreksi event alice → bob lalu memanggil invalidate():
+    # di proses ini hanya generation yang berubah, state lokal alice masih cooldown
+    db.query(AttendanceEvent).update({AttendanceEvent.final_name: "bob"})
+    db.query(DailyAttendance).update({DailyAttendance.person_name: "bob"})
+    db.commit()
+    shared_generation.bump("attendance_state")
+
+    assert _record(db)["event_type"] == "IN"
@@ -0,0 +1,100 @@
+"""
+Test micro-batching scheduler embedding.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pytest
+
+from app.embed_batcher import EmbeddingBatcher
+
+
+def _fake_embed(calls):
+    lock = threading.Lock()
+
+    def embed(crops):
+        with lock:
+            calls.append(len(crops))
+        return np.stack([np.full(512, c[0, 0, 0], dtype=np.float32) for c in crops]) if crops else np.zeros((0, 512), dtype=np.float32)
+
+    return embed
+
+
+def _crop(value: int) -> np.ndarray:
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_concurrent_requests_share_one_forward_pass():
+    calls: list[int] = []
+    batcher = EmbeddingBatcher(_fake_embed(calls), window_ms=200, max_batch=6)
+
+    jobs = [[_crop(1), _crop(2)], [_crop(3)], [_crop(4), _crop(5), _crop(6)]]
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        results = list(ex.map(batcher.submit, jobs))
+
+    # Setiap pemanggil menerima embedding miliknya sendiri, urutan terjaga
+    for job, out in zip(jobs, results, strict=True):
+        assert out.shape == (len(job), 512)
+        assert [int(v) for v in out[:, 0]] == [int(c[0, 0, 0]) for c in job]
+
+    assert sum(calls) == 6
+    assert len(calls) < 3
+
+    stats = batcher.stats()
+    assert stats["crops"] == 6
+    assert stats["batches"] == len(calls)
+    assert stats["queue_wait_ms"]["max"] >= 0.0
+
+
+def test_max_batch_flushes_before_window():
+    calls: list[int] = []
+    batcher = EmbeddingBatcher(_fake_embed(calls), window_ms=5000, max_batch=2)
+    out = batcher.submit([_crop(7), _crop(8)])
+    assert out.shape == (2, 512)
+    assert calls == [2]
+
+
+def test_failed_batch_keeps_worker_alive():
+    calls: list[int] = []
+    embed = _fake_embed(calls)
+    bad = {"on": True}
+
+    def flaky(crops):
+        out = embed(crops)
+        return out[:-1] if bad["on"] else out  # split gagal: jumlah embedding tidak cocok
+
+    batcher = EmbeddingBatcher(flaky, window_ms=0, max_batch=4, timeout_s=2.0)
+    with pytest.raises(ValueError):
+        batcher.submit([_crop(1), _crop(2)])
+
+    bad["on"] = False
+    assert batcher.submit([_crop(3)]).shape == (1, 512)
+    assert batcher._thread.is_alive()
+
+
+def test_submit_times_out_instead_of_blocking_forever():
+    gate = threading.Event()
+
+    def stuck(crops):
+        gate.wait(5)
+        return np.zeros((len(crops), 512), dtype=np.float32)
+
+    batcher = EmbeddingBatcher(stuck, window_ms=0, max_batch=4, timeout_s=0.1)
+    with pytest.raises(TimeoutError):
+        batcher.submit([_crop(1)])
+    gate.set()
+
+
+def test_dead_worker_falls_back_to_direct_embedding():
+    calls: list[int] = []
+    batcher = EmbeddingBatcher(_fake_embed(calls), window_ms=0, max_batch=4)
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    batcher._thread = dead
+
+    out = batcher.submit([_crop(9)])
+    assert int(out[0, 0]) == 9
+    assert calls == [1]
+    assert batcher.stats()["batches"] == 0
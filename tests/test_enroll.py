@@ -0,0 +1,65 @@
+"""
+Enroll: embedding dihitung per chunk (_ENROLL_EMBED_BATCH crop), disimpan dengan satu
+bulk insert, lalu hanya centroid orang tsb yang diperbarui di cache.
+"""
+import cv2
+import numpy as np
+import pytest
+
+from app import admin_people, gallery_store, recog
+from app.config import settings
+from app.models import Embedding, Person
+from app.vector_codec import decode_vec
+
+
+@pytest.fixture
+def empty_gallery(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "gallery_dir", str(tmp_path / "gallery"))
+    monkeypatch.setitem(gallery_store._GEN, "map", None)
+    saved = dict(recog._CACHE)
+    recog._set_cache([], np.zeros((recog._MIN_CAPACITY, recog._EMB_DIM), dtype=np.float32), version=0)
+    yield
+    recog._CACHE.update(saved)
+
+
+def _png(seed: int) -> bytes:
+    img = np.random.default_rng(seed).integers(0, 255, (200, 200, 3), dtype=np.uint8)
+    ok, buf = cv2.imencode(".png", img)
+    assert ok
+    return buf.tobytes()
+
+
+def test_enroll_more_than_one_chunk(db, empty_gallery, monkeypatch):
+    monkeypatch.setattr(
+        admin_people, "detect_faces_from_bgr", lambda bgr, max_faces: [{"crop": cv2.resize(bgr, (160, 160))}]
+    )
+    chunks: list[int] = []
+    produced: list[np.ndarray] = []
+
+    def fake_embed(crops):
+        chunks.append(len(crops))
+        rng = np.random.default_rng(len(produced))
+        embs = rng.standard_normal((len(crops), recog._EMB_DIM)).astype(np.float32)
+        produced.extend(embs)
+        return embs
+
+    monkeypatch.setattr(admin_people, "embed_faces", fake_embed)
+    person = Person(name="alice")
+    db.add(person)
+    db.commit()
+
+    # 5 foto x 6 augmentasi = 30 crop → 2 chunk (24 + 6)
+    result = admin_people._enroll_embeddings(db, person, [_png(i) for i in range(5)] + [b"not an image"])
+
+    assert chunks == [admin_people._ENROLL_EMBED_BATCH, 30 - admin_people._ENROLL_EMBED_BATCH]
+    assert result["embeddings_added"] == 30
+    assert result["images_processed"] == 5
+    assert result["skipped"] == 1
+
+    stored = [decode_vec(r.vec_blob) for r in db.query(Embedding).order_by(Embedding.id)]
+    assert len(stored) == 30
+    np.testing.assert_array_equal(np.stack(stored), np.stack(produced))
+
+    assert gallery_store.get_version(db) == 1
+    assert recog._CACHE["names"] == ["alice"]
+    np.testing.assert_allclose(recog._CACHE["vectors"][0], np.mean(produced, axis=0), atol=1e-6)
@@ -0,0 +1,69 @@
+"""
+Buffer centroid gallery di recog: insert/replace/hapus O(1) dengan kapasitas
+tumbuh 2x, swap-with-last saat hapus, dan copy-on-write dari snapshot mmap.
+"""
+import numpy as np
+import pytest
+
+from app import recog
+
+
+@pytest.fixture
+def cache():
+    saved = dict(recog._CACHE)
+    yield recog._CACHE
+    recog._CACHE.update(saved)
+
+
+def _vec(seed: int) -> np.ndarray:
+    return np.full(recog._EMB_DIM, seed, dtype=np.float32)
+
+
+def _assert_aligned(cache, expected: dict[str, np.ndarray]):
+    assert cache["size"] == len(expected) == len(cache["names"])
+    assert sorted(cache["names"]) == sorted(expected)
+    for name, vec in expected.items():
+        row = cache["rows"][name]
+        assert cache["names"][row] == name
+        np.testing.assert_array_equal(cache["vectors"][row], vec)
+
+
+def test_read_only_snapshot_is_copied_before_write(cache):
+    snapshot = np.stack([_vec(1), _vec(2), _vec(3)])
+    snapshot.flags.writeable = False  # seperti mmap read-only dari gallery_store
+    recog._set_cache(["a", "b", "c"], snapshot, version=1)
+
+    recog._cache_put("b", _vec(20))
+
+    assert cache["vectors"] is not snapshot
+    assert cache["vectors"].flags.writeable
+    np.testing.assert_array_equal(snapshot[1], _vec(2))  # snapshot tidak tersentuh
+    _assert_aligned(cache, {"a": _vec(1), "b": _vec(20), "c": _vec(3)})
+
+
+def test_growth_past_capacity(cache):
+    recog._set_cache([], np.zeros((recog._MIN_CAPACITY, recog._EMB_DIM), dtype=np.float32), version=1)
+    expected = {f"p{i}": _vec(i) for i in range(3 * recog._MIN_CAPACITY + 1)}
+    for name, vec in expected.items():
+        recog._cache_put(name, vec)
+
+    assert cache["vectors"].shape[0] >= len(expected)
+    _assert_aligned(cache, expected)
+
+
+def test_swap_remove_keeps_names_and_vectors_aligned(cache):
+    recog._set_cache([], np.zeros((recog._MIN_CAPACITY, recog._EMB_DIM), dtype=np.float32), version=1)
+    expected = {f"p{i}": _vec(i) for i in range(40)}
+    for name, vec in expected.items():
+        recog._cache_put(name, vec)
+
+    for name in ["p0", "p39", "p17", "p5", "missing"]:  # awal, akhir, tengah, tidak ada
+        recog._cache_pop(name)
+        expected.pop(name, None)
+        _assert_aligned(cache, expected)
+
+    for i in range(6, 39):
+        recog._cache_pop(f"p{i}")
+        expected.pop(f"p{i}", None)
+    _assert_aligned(cache, expected)
+    assert cache["vectors"].shape[0] == recog._MIN_CAPACITY  # buffer menyusut lagi
@@ -0,0 +1,145 @@
+"""
+Test index nearest-neighbour gallery (exact & IVF).
+"""
+import numpy as np
+import pytest
+
+from app import gallery_index
+from app.gallery_index import ExactIndex, GalleryIndex, IVFIndex, create_index, evaluate_index
+
+
+def _gallery(n: int, seed: int = 0) -> np.ndarray:
+    x = np.random.default_rng(seed).standard_normal((n, 512)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_exact_matches_linalg_norm():
+    vectors = _gallery(200)
+    queries = _gallery(10, seed=1)
+    index = ExactIndex()
+    index.build(vectors)
+
+    idx, dist = index.search(queries)
+
+    ref = np.linalg.norm(vectors[None, :, :] - queries[:, None, :], axis=2)
+    assert np.array_equal(idx, ref.argmin(axis=1))
+    assert np.allclose(dist, ref.min(axis=1), atol=1e-4)
+
+
+def test_exact_works_on_readonly_vectors():
+    vectors = _gallery(5)
+    vectors.flags.writeable = False
+    index = ExactIndex()
+    index.build(vectors)
+    idx, dist = index.search(vectors[3])
+    assert idx[0] == 3
+    assert dist[0] == pytest.approx(0.0, abs=1e-3)
+
+
+def test_ivf_small_gallery_falls_back_to_exact():
+    vectors = _gallery(50)
+    index = IVFIndex()
+    index.build(vectors)
+    assert evaluate_index(index, vectors, vectors[:20])["recall_at_1"] == 1.0
+
+
+def test_ivf_recall_on_noisy_queries():
+    vectors = _gallery(4000)
+    rng = np.random.default_rng(2)
+    queries = vectors[:200] + 0.02 * rng.standard_normal((200, 512)).astype(np.float32)
+    index = IVFIndex(nprobe=8)
+    index.build(vectors)
+
+    report = evaluate_index(index, vectors, queries)
+    assert report["gallery_size"] == 4000
+    assert report["recall_at_1"] >= 0.9
+
+
+def _edit(vectors: np.ndarray, n: int) -> tuple[np.ndarray, list[int]]:
+    """Replace baris 5, hapus baris 10 (swap-with-last), tambah satu baris — seperti cache recog."""
+    buf = np.zeros((n + 8, 512), dtype=np.float32)
+    buf[:n] = vectors
+    buf[5] = _gallery(1, seed=7)[0]
+    buf[10] = buf[n - 1]
+    buf[n - 1] = _gallery(1, seed=8)[0]
+    return buf[:n], [5, 10, n - 1]
+
+
+def test_exact_update_recomputes_only_changed_rows():
+    vectors = _gallery(100)
+    index = ExactIndex()
+    index.build(vectors)
+    edited, rows = _edit(vectors, 100)
+
+    index.update(edited, rows)
+    assert np.allclose(index.sq_norms, np.einsum("ij,ij->i", edited, edited))
+    index.update(edited[:90], [])
+    assert len(index.sq_norms) == 90
+
+
+def test_ivf_update_assigns_changed_rows_without_retraining(monkeypatch):
+    vectors = _gallery(2000)
+    index = IVFIndex(nprobe=4)
+    index.build(vectors)
+    edited, rows = _edit(vectors, 2000)
+
+    def no_training(*args, **kwargs):
+        raise AssertionError("IVF dilatih ulang")
+
+    monkeypatch.setattr(gallery_index, "_kmeans", no_training)
+    index.update(edited[:1999], rows)
+
+    # Isi list sama dengan assign penuh memakai centroid yang sama
+    expected = gallery_index._assign(edited[:1999], index._centroids)
+    for c, members in enumerate(index._lists):
+        assert sorted(members.tolist()) == np.flatnonzero(expected == c).tolist()
+    idx, _ = index.search(edited[[5, 10]])
+    assert idx.tolist() == [5, 10]
+
+
+def test_ivf_update_retrains_on_size_change():
+    index = IVFIndex()
+    index.build(_gallery(1500))
+    trained = index._centroids
+
+    index.update(_gallery(3100), range(1500, 3100))
+    assert index._centroids is not trained
+    index.update(_gallery(500), [])
+    assert index._centroids is None
+
+
+def test_create_index_rejects_unknown_backend():
+    assert isinstance(create_index("exact"), ExactIndex)
+    assert isinstance(create_index("ivf"), IVFIndex)
+    with pytest.raises(ValueError):
+        create_index("hnsw")
+
+
+@pytest.mark.parametrize("kind", ["exact", "ivf"])
+def test_every_backend_finds_enrolled_identity(kind):
+    vectors = _gallery(1500)
+    index = create_index(kind, nprobe=4)
+    index.build(vectors)
+
+    # Query = centroid yang ter-enroll → harus kembali ke dirinya sendiri dengan jarak ~0
+    idx, dist = index.search(vectors[:50])
+    assert idx.tolist() == list(range(50))
+    assert np.allclose(dist, 0.0, atol=1e-3)
+
+
+def test_default_update_rebuilds_custom_index():
+    class BruteForce(GalleryIndex):
+        name = "brute"
+
+        def build(self, vectors):
+            self.vectors = np.array(vectors)
+
+        def search(self, queries):
+            d = np.linalg.norm(self.vectors[None, :, :] - queries[:, None, :], axis=2)
+            return d.argmin(axis=1), d.min(axis=1)
+
+    index = BruteForce()
+    index.build(_gallery(20))
+    edited, rows = _edit(_gallery(20), 20)
+    index.update(edited, rows)
+    assert index.search(edited[[5, 10]])[0].tolist() == [5, 10]
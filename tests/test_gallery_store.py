@@ -0,0 +1,265 @@
+"""
+Test snapshot gallery di disk (mmap), version counter, dan sinkronisasi antar worker.
+"""
+import copy
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import gallery_store, recog
+from app.config import settings
+from app.database import Base
+from app.models import Embedding, Person
+from app.vector_codec import encode_vec
+
+
+@pytest.fixture
+def gallery_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "gallery_dir", str(tmp_path / "gallery"))
+    monkeypatch.setitem(gallery_store._GEN, "map", None)
+    return tmp_path / "gallery"
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'gallery.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_snapshot_roundtrip_is_mmapped(gallery_dir):
+    vectors = np.random.default_rng(1).standard_normal((3, 512)).astype(np.float32)
+    gallery_store.save_snapshot(["a", "b", "c"], vectors, version=7)
+
+    snapshot = gallery_store.load_snapshot(7)
+    assert snapshot.version == 7
+    assert snapshot.names == ["a", "b", "c"]
+    loaded = snapshot.vectors
+    assert isinstance(loaded, np.memmap)
+    assert not loaded.flags.writeable
+    assert np.array_equal(loaded, vectors)
+
+
+def test_snapshot_only_saves_valid_rows(gallery_dir):
+    buf = np.zeros((16, 512), dtype=np.float32)
+    gallery_store.save_snapshot(["a"], buf, version=1)
+    assert gallery_store.load_snapshot(1).vectors.shape == (1, 512)
+
+
+def test_stale_or_missing_snapshot_returns_none(gallery_dir):
+    assert gallery_store.load_snapshot(0) is None
+    gallery_store.save_snapshot(["a"], np.ones((1, 512), dtype=np.float32), version=1)
+    assert gallery_store.load_snapshot(2) is None
+
+
+def test_corrupt_snapshot_returns_none(gallery_dir):
+    gallery_store.save_snapshot(["a"], np.ones((1, 512), dtype=np.float32), version=1)
+    np.save(gallery_dir / "gallery.npy", np.zeros((1, 512), dtype=np.float32))
+    assert gallery_store.load_snapshot(1) is None
+
+
+def test_generation_reload_skips_hash(gallery_dir, monkeypatch):
+    gallery_store.save_snapshot(["a", "b"], np.ones((2, 512), dtype=np.float32), version=1)
+
+    def no_hash(*args):
+        raise AssertionError("hash dihitung ulang")
+
+    monkeypatch.setattr(gallery_store, "_content_hash", no_hash)
+    assert gallery_store.load_snapshot(verify=False).names == ["a", "b"]
+
+    # Shape tetap dicek walau hash di-skip
+    np.save(gallery_dir / "gallery.npy", np.ones((1, 512), dtype=np.float32))
+    assert gallery_store.load_snapshot(verify=False) is None
+
+
+def test_bump_version(db):
+    assert gallery_store.get_version(db) == 0
+    gallery_store.bump_version(db)
+    db.commit()
+    assert gallery_store.get_version(db) == 1
+
+
+def test_save_bumps_shared_generation(gallery_dir):
+    before = gallery_store.current_generation()
+    with gallery_store.writer_lock():
+        gallery_store.save_snapshot(["a"], np.ones((1, 512), dtype=np.float32), version=1)
+    assert gallery_store.current_generation() == before + 1
+
+    # Worker lain melihat counter yang sama lewat file mmap
+    on_disk = np.fromfile(gallery_dir / "gallery.gen", dtype="<u8")
+    assert int(on_disk[0]) == before + 1
+
+
+def test_empty_gallery_snapshot(gallery_dir):
+    gallery_store.save_snapshot([], np.zeros((16, 512), dtype=np.float32), version=0)
+    snapshot = gallery_store.load_snapshot(0)
+    assert snapshot.names == []
+    assert snapshot.vectors.shape == (0, 512)
+    assert snapshot.version == 0
+
+
+def _enroll(db, name: str, value: float) -> Person:
+    person = Person(name=name)
+    db.add(person)
+    db.flush()
+    db.add(Embedding(person_id=person.id, vec_blob=encode_vec(np.full(512, value, dtype=np.float32))))
+    gallery_store.bump_version(db)
+    db.commit()
+    return person
+
+
+def _worker_state() -> dict:
+    """Salinan _CACHE seolah milik proses worker lain."""
+    state = dict(recog._CACHE)
+    state["names"] = list(state["names"]) if state["names"] is not None else None
+    state["rows"] = dict(state["rows"])
+    if state["vectors"] is not None:
+        state["vectors"] = state["vectors"].copy()
+    state["index"] = copy.deepcopy(state["index"])
+    return state
+
+
+@pytest.fixture
+def workers(gallery_dir):
+    saved = dict(recog._CACHE)
+    unloaded = {
+        "names": None, "vectors": None, "size": 0, "rows": {}, "version": None, "generation": None,
+        "epoch": None, "log_offset": 0, "log_records": 0,
+    }
+    yield unloaded
+    recog._CACHE.update(saved)
+
+
+def test_changes_from_unloaded_worker_reach_other_workers(db, workers):
+    _enroll(db, "alice", 1.0)
+    recog.rebuild_cache(db)
+    worker_b = _worker_state()
+
+    # Worker A baru restart (cache belum dimuat) saat enroll masuk
+    recog._CACHE.update(workers)
+    bob = _enroll(db, "bob", 2.0)
+    recog.update_person_cache(db, bob)
+
+    recog._CACHE.update(worker_b)
+    assert recog.sync_cache()
+    assert sorted(recog._CACHE["names"]) == ["alice", "bob"]
+
+    # Delete juga dari worker yang cache-nya belum dimuat
+    worker_b = _worker_state()
+    recog._CACHE.update(workers)
+    db.delete(bob)
+    db.query(Embedding).filter(Embedding.person_id == bob.id).delete()
+    gallery_store.bump_version(db)
+    db.commit()
+    recog.remove_person_cache(db, "bob")
+
+    recog._CACHE.update(worker_b)
+    assert recog.sync_cache()
+    assert recog._CACHE["names"] == ["alice"]
+
+
+def test_log_records_extend_the_snapshot(gallery_dir):
+    vectors = np.ones((2, 512), dtype=np.float32)
+    with gallery_store.writer_lock():
+        gallery_store.save_snapshot(["a", "b"], vectors, version=1)
+    epoch = gallery_store.load_snapshot(1).epoch
+    before = gallery_store.current_generation()
+
+    with gallery_store.writer_lock():
+        offset = gallery_store.append_log(epoch, gallery_store.LogRecord("put", "c", np.full(512, 3, np.float32), 2))
+        gallery_store.append_log(epoch, gallery_store.LogRecord("pop", "a", None, 3))
+    assert gallery_store.current_generation() == before + 2
+
+    snapshot = gallery_store.load_snapshot(3)
+    assert snapshot.version == 1 and snapshot.latest_version == 3
+    assert [(r.op, r.name, r.version) for r in snapshot.records] == [("put", "c", 2), ("pop", "a", 3)]
+    assert np.array_equal(snapshot.records[0].vector, np.full(512, 3, np.float32))
+
+    # Worker yang sudah membaca sampai `offset` hanya menerima record sesudahnya
+    records, _ = gallery_store.read_log(epoch, offset)
+    assert [r.name for r in records] == ["a"]
+
+
+def test_torn_log_record_is_not_applied(gallery_dir):
+    with gallery_store.writer_lock():
+        gallery_store.save_snapshot(["a"], np.ones((1, 512), dtype=np.float32), version=1)
+        epoch = gallery_store.load_snapshot(1).epoch
+        gallery_store.append_log(epoch, gallery_store.LogRecord("put", "b", np.zeros(512, np.float32), 2))
+    with open(gallery_dir / "gallery.log", "r+b") as f:
+        f.truncate(f.seek(0, 2) - 10)  # writer lain belum selesai menulis
+
+    assert gallery_store.read_log(epoch, 0) == ([], 0)
+    assert gallery_store.load_snapshot(2) is None
+
+
+def test_compaction_replaces_log_with_new_base(gallery_dir):
+    with gallery_store.writer_lock():
+        gallery_store.save_snapshot(["a"], np.ones((1, 512), dtype=np.float32), version=1)
+        old = gallery_store.load_snapshot(1)
+        gallery_store.append_log(old.epoch, gallery_store.LogRecord("pop", "a", None, 2))
+        gallery_store.save_snapshot([], np.zeros((0, 512), dtype=np.float32), version=2)
+
+    snapshot = gallery_store.load_snapshot(2)
+    assert snapshot.epoch != old.epoch
+    assert snapshot.records == []
+    # Offset worker lama tidak berlaku lagi → reload penuh
+    assert gallery_store.read_log(old.epoch, old.log_offset + 1) is None
+
+
+@pytest.fixture
+def loaded(db, workers):
+    _enroll(db, "alice", 1.0)
+    recog.rebuild_cache(db)
+    return db
+
+
+def test_enroll_publishes_delta_without_rewriting_snapshot(loaded, monkeypatch):
+    db = loaded
+    worker_b = _worker_state()
+
+    def full_rewrite(*args, **kwargs):
+        raise AssertionError("snapshot/index ditulis ulang penuh")
+
+    monkeypatch.setattr(gallery_store, "save_snapshot", full_rewrite)
+    monkeypatch.setattr(gallery_store, "_content_hash", full_rewrite)
+    monkeypatch.setattr(recog._CACHE["index"], "build", full_rewrite)
+    bob = _enroll(db, "bob", 2.0)
+    recog.update_person_cache(db, bob)
+    worker_a = _worker_state()
+
+    # Worker lain cukup membaca record baru dari log
+    recog._CACHE.update(worker_b)
+    monkeypatch.setattr(recog._CACHE["index"], "build", full_rewrite)
+    assert recog.sync_cache()
+    assert recog._CACHE["names"] == worker_a["names"] == ["alice", "bob"]
+    assert recog._CACHE["version"] == gallery_store.get_version(db)
+    assert np.array_equal(recog._CACHE["vectors"][:2], worker_a["vectors"][:2])
+    idx, _ = recog._CACHE["index"].search(np.full((1, 512), 2.0, dtype=np.float32))
+    assert recog._CACHE["names"][int(idx[0])] == "bob"
+
+
+def test_cold_load_replays_log(loaded):
+    db = loaded
+    bob = _enroll(db, "bob", 2.0)
+    recog.update_person_cache(db, bob)
+
+    recog._CACHE.update(names=None, generation=None)
+    recog.load_cache(db)  # version DB cocok dengan basis + log, tanpa rebuild
+    assert recog._CACHE["names"] == ["alice", "bob"]
+    assert recog._CACHE["log_records"] == 1
+
+
+def test_long_log_is_compacted(loaded, monkeypatch):
+    db = loaded
+    monkeypatch.setattr(recog, "_MIN_COMPACT_RECORDS", 3)
+    for i, name in enumerate(["bob", "carol", "dave"]):
+        recog.update_person_cache(db, _enroll(db, name, float(i + 2)))
+
+    snapshot = gallery_store.load_snapshot(gallery_store.get_version(db))
+    assert snapshot.records == []
+    assert snapshot.names == ["alice", "bob", "carol", "dave"]
+    assert recog._CACHE["log_records"] == 0
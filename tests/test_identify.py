@@ -0,0 +1,85 @@
+"""
+identify_faces / identify_multiple: semua wajah dalam frame di-embed dalam satu batch
+dan hasilnya dipetakan kembali ke wajah yang benar.
+"""
+import numpy as np
+import pytest
+
+from app import recog
+from app.config import settings
+
+_NAMES = ["alice", "bob", "carol"]
+
+
+@pytest.fixture
+def gallery(monkeypatch):
+    """Gallery 3 orang (centroid = basis vektor) + embedder palsu: nilai piksel crop → orang."""
+    saved = dict(recog._CACHE)
+    vectors = np.zeros((16, recog._EMB_DIM), dtype=np.float32)
+    vectors[np.arange(3), np.arange(3)] = 1.0
+    recog._set_cache(list(_NAMES), vectors, version=1)
+    monkeypatch.setattr(recog, "sync_cache", lambda: False)
+
+    calls: list[int] = []
+
+    def fake_embed(crops):
+        calls.append(len(crops))
+        embs = np.zeros((len(crops), recog._EMB_DIM), dtype=np.float32)
+        for i, crop in enumerate(crops):
+            person = int(crop[0, 0, 0])
+            if person < len(_NAMES):
+                embs[i, person] = 1.0
+            else:
+                embs[i, -1] = 1.0  # jauh dari semua centroid → unknown
+        return embs
+
+    monkeypatch.setattr(recog, "embed_faces_batched", fake_embed)
+    yield calls
+    recog._CACHE.update(saved)
+
+
+def _crop(person: int) -> np.ndarray:
+    return np.full((160, 160, 3), person, dtype=np.uint8)
+
+
+def test_batch_keeps_face_order(gallery):
+    out = recog.identify_faces([_crop(2), _crop(0), _crop(9), _crop(1)], db=None)
+
+    assert gallery == [4]  # satu forward pass untuk seluruh frame
+    assert [r["name"] for r in out] == ["carol", "alice", None, "bob"]
+    assert [r["status"] for r in out] == ["ok", "ok", "unknown", "ok"]
+
+
+def test_small_faces_are_rejected_without_shifting_results(gallery):
+    small = settings.min_face_px - 1
+    out = recog.identify_faces(
+        [_crop(0), _crop(1), _crop(2), _crop(0)], db=None, face_sizes=[small, 120, small, 200]
+    )
+
+    assert gallery == [2]  # hanya wajah yang cukup besar yang di-embed
+    assert [(r["status"], r["name"]) for r in out] == [("reject", None), ("ok", "bob"), ("reject", None), ("ok", "alice")]
+
+
+def test_empty_frame(gallery, monkeypatch):
+    assert recog.identify_faces([], db=None) == []
+    assert gallery == []
+
+    monkeypatch.setattr(recog, "detect_faces", lambda img_bytes, max_faces: [])
+    assert recog.identify_multiple(b"jpeg", db=None) == {"status": "no_face", "faces": [], "recognized_names": []}
+
+
+def test_identify_multiple_maps_results_to_faces(gallery, monkeypatch):
+    faces = [
+        {"crop": _crop(1), "face_px": 150, "bbox": [10, 10, 150, 150], "queue_id": 1, "confidence": 0.99},
+        {"crop": _crop(0), "face_px": 40, "bbox": [200, 10, 240, 50], "queue_id": 2, "confidence": 0.99},
+        {"crop": _crop(2), "face_px": 120, "bbox": [300, 10, 420, 130], "queue_id": 3, "confidence": 0.99},
+    ]
+    monkeypatch.setattr(recog, "detect_faces", lambda img_bytes, max_faces: faces)
+
+    result = recog.identify_multiple(b"jpeg", db=None)
+
+    assert gallery == [2]
+    assert [(f["queue_id"], f["status"], f["name"]) for f in result["faces"]] == [
+        (1, "ok", "bob"), (2, "reject", None), (3, "ok", "carol")
+    ]
+    assert result["recognized_names"] == ["bob", "carol"]
@@ -0,0 +1,89 @@
+"""
+Decode JPEG resolusi rendah untuk recognition (DECODE_MAX_EDGE).
+"""
+import cv2
+import numpy as np
+import pytest
+
+from app import recog
+from app.recog import _decode_for_detection, _jpeg_size
+
+
+@pytest.fixture(scope="module")
+def jpeg_4k():
+    yy, xx = np.mgrid[0:2160, 0:3840]
+    img = np.stack([(xx // 16) % 256, (yy // 16) % 256, ((xx + yy) // 32) % 256], axis=-1).astype(np.uint8)
+    ok, buf = cv2.imencode(".jpg", img)
+    assert ok
+    return buf.tobytes()
+
+
+def test_jpeg_size_reads_header(jpeg_4k):
+    assert _jpeg_size(jpeg_4k) == (3840, 2160)
+    assert _jpeg_size(b"\x89PNG\r\n\x1a\n") is None
+    assert _jpeg_size(b"\xff\xd8\xff") is None
+
+
+@pytest.mark.parametrize(("max_edge", "factor"), [(1920, 2), (960, 4), (480, 8), (3000, 1), (0, 1)])
+def test_reduced_decode_tracks_scale(jpeg_4k, max_edge, factor):
+    bgr, scale = _decode_for_detection(jpeg_4k, max_edge=max_edge)
+    assert bgr.shape[:2] == (2160 // factor, 3840 // factor)
+    assert scale == pytest.approx(factor)
+
+
+def test_non_jpeg_is_decoded_at_full_size():
+    ok, buf = cv2.imencode(".png", np.zeros((400, 600, 3), dtype=np.uint8))
+    assert ok
+    bgr, scale = _decode_for_detection(buf.tobytes(), max_edge=100)
+    assert bgr.shape[:2] == (400, 600)
+    assert scale == 1.0
+
+
+_SQUARE = (1200, 600, 1800, 1200)  # "wajah" di frame 4K asli (x1, y1, x2, y2)
+
+
+def _eyes(box) -> np.ndarray:
+    x1, y1, x2, y2 = box
+    w, h = x2 - x1, y2 - y1
+    return np.array([[x1 + 0.3 * w, y1 + 0.4 * h], [x1 + 0.7 * w, y1 + 0.4 * h]], dtype=np.float32)
+
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    """MTCNN palsu: box = batas kotak terang pada gambar yang DIA terima; landmark turunan box."""
+    seen = {}
+
+    def detect(rgb, min_face_size):
+        seen["shape"] = rgb.shape
+        ys, xs = np.nonzero(rgb[:, :, 0] > 128)
+        box = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], dtype=np.float32)
+        lm = np.concatenate([_eyes(box[0]), np.zeros((3, 2), dtype=np.float32)])[None]
+        return box, np.array([0.999]), lm
+
+    def align(bgr, landmarks, box):
+        seen["landmarks"] = np.asarray(landmarks)
+        return np.zeros((160, 160, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(recog, "_mtcnn_detect", detect)
+    monkeypatch.setattr(recog, "_align_crop", align)
+    return seen
+
+
+@pytest.mark.parametrize(("decode_max_edge", "detect_max_edge"), [(0, 640), (1920, 0), (960, 480), (480, 1280)])
+def test_boxes_and_landmarks_map_back_to_original(fake_detector, decode_max_edge, detect_max_edge):
+    frame = np.zeros((2160, 3840, 3), dtype=np.uint8)
+    x1, y1, x2, y2 = _SQUARE
+    frame[y1:y2, x1:x2] = 255
+    ok, buf = cv2.imencode(".jpg", frame)
+    assert ok
+
+    bgr, coord_scale = _decode_for_detection(buf.tobytes(), max_edge=decode_max_edge)
+    faces = recog._detect_faces_internal(bgr, max_faces=1, max_edge=detect_max_edge, coord_scale=coord_scale)
+
+    # Toleransi: ~2 piksel pada resolusi tempat deteksi berjalan, dinyatakan di koordinat asli
+    detect_scale = recog._detection_scale(bgr.shape, detect_max_edge)
+    tol = 2 * coord_scale / detect_scale
+    assert max(fake_detector["shape"][:2]) == round(max(bgr.shape[:2]) * detect_scale)  # jalur downscale dipakai
+    np.testing.assert_allclose(faces[0]["bbox"], _SQUARE, atol=tol)
+    # Landmark untuk alignment ada di koordinat `bgr` hasil decode
+    np.testing.assert_allclose(fake_detector["landmarks"][:2] * coord_scale, _eyes(_SQUARE), atol=tol)
@@ -0,0 +1,108 @@
+"""
+Parity test backend inference: TorchScript / ONNX Runtime / INT8 vs eager PyTorch.
+
+Memakai InceptionResnetV1 dengan bobot random (tanpa download VGGFace2) —
+yang diuji adalah kesetaraan graph hasil export, bukan akurasi model.
+"""
+import copy
+import sys
+
+import numpy as np
+import pytest
+import torch
+
+facenet_pytorch = pytest.importorskip("facenet_pytorch")
+
+from app.inference_backend import (  # noqa: E402
+    Int8Backend,
+    OnnxBackend,
+    TorchBackend,
+    TorchScriptBackend,
+    create_backend,
+    export_torchscript,
+    int8_artifact_path,
+    quantize_static_int8,
+)
+
+_ATOL = 1e-4
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return facenet_pytorch.InceptionResnetV1(pretrained=None).eval()
+
+
+@pytest.fixture(scope="module")
+def batch():
+    rng = np.random.default_rng(0)
+    return rng.uniform(-1.0, 1.0, size=(3, 3, 160, 160)).astype(np.float32)
+
+
+def test_torchscript_matches_eager(model, batch, tmp_path):
+    expected = TorchBackend(model)(batch)
+    backend = TorchScriptBackend.load_or_export(lambda: model, str(tmp_path))
+
+    out = backend(batch)
+    assert out.shape == (3, 512)
+    assert np.allclose(out, expected, atol=_ATOL)
+    # Start berikutnya memakai artifact yang sudah di-cache, tanpa model eager
+    cached = TorchScriptBackend.load_or_export(lambda: pytest.fail("model should not be loaded"), str(tmp_path))
+    assert np.allclose(cached(batch), expected, atol=_ATOL)
+
+
+def test_onnx_matches_eager(model, batch, tmp_path):
+    pytest.importorskip("onnxruntime")
+    expected = TorchBackend(model)(batch)
+    backend = OnnxBackend.load_or_export(lambda: model, str(tmp_path), intra_op_threads=1)
+
+    out = backend(batch)
+    assert out.shape == (3, 512)
+    assert np.allclose(out, expected, atol=_ATOL)
+
+
+def test_unknown_backend_falls_back_to_torch(model, tmp_path):
+    backend = create_backend("tensorrt", lambda: model, cache_dir=str(tmp_path))
+    assert backend.name == "torch"
+
+
+def test_int8_dynamic_fallback_stays_close_to_fp32(model, batch, tmp_path):
+    expected = TorchBackend(model)(batch)
+    backend = Int8Backend.load(lambda: copy.deepcopy(model), str(tmp_path))
+
+    assert backend.mode == "dynamic"
+    out = backend(batch)
+    assert out.shape == (3, 512)
+    assert np.linalg.norm(out - expected, axis=1).max() < 0.1
+
+
+def test_int8_static_artifact_is_reused(model, batch, tmp_path):
+    expected = TorchBackend(model)(batch)
+    quantized = quantize_static_int8(copy.deepcopy(model), [batch[:2], batch[2:]])
+    export_torchscript(quantized, int8_artifact_path(str(tmp_path)))
+
+    backend = Int8Backend.load(lambda: pytest.fail("model should not be loaded"), str(tmp_path))
+    assert backend.mode == "static"
+    out = backend(batch)
+    # Embedding ter-normalisasi L2 — drift INT8 harus jauh di bawah MAX_DISTANCE
+    assert np.linalg.norm(out - expected, axis=1).max() < 0.2
+
+
+@pytest.mark.parametrize("kind", ["torch", "torchscript"])
+def test_create_backend_matches_eager(kind, model, batch, tmp_path):
+    expected = TorchBackend(model)(batch)
+    backend = create_backend(kind, lambda: model, cache_dir=str(tmp_path))
+
+    assert backend.name == kind
+    assert np.allclose(backend(batch), expected, atol=_ATOL)
+
+
+def test_onnx_without_onnxruntime_falls_back_to_torch(model, batch, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)  # import onnxruntime → ImportError
+    expected = TorchBackend(model)(batch)
+
+    backend = create_backend("onnx", lambda: model, cache_dir=str(tmp_path))
+    assert backend.name == "torch"
+    assert np.allclose(backend(batch), expected, atol=_ATOL)
+    # Gagal sebelum export — tidak meninggalkan artifact setengah jadi
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,105 @@
+"""
+Backpressure inference pool: kapasitas penuh → ditolak langsung (HTTP 503),
+slot selalu dilepas termasuk saat pekerjaan gagal.
+"""
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import main, readiness
+from app.inference_pool import InferencePool, InferenceQueueFullError
+
+
+def test_saturated_pool_rejects_immediately():
+    async def scenario():
+        pool = InferencePool(workers=1, queue_size=0)
+        gate = threading.Event()
+        busy = asyncio.ensure_future(pool.run(gate.wait))
+        await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        with pytest.raises(InferenceQueueFullError):
+            await pool.run(lambda: None)
+        assert time.perf_counter() - started < 0.1
+        assert pool.stats()["rejected"] == 1
+
+        gate.set()
+        await busy
+        assert await pool.run(lambda: "ok") == "ok"
+        pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_released_after_exception():
+    async def scenario():
+        pool = InferencePool(workers=1, queue_size=0)
+
+        def boom():
+            raise RuntimeError("inference failed")
+
+        for _ in range(3):  # kapasitas 1: akan macet jika slot tidak dilepas
+            with pytest.raises(RuntimeError):
+                await pool.run(boom)
+        assert pool.stats()["in_flight"] == 0
+        assert await pool.run(lambda: 42) == 42
+        pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_recognize_returns_503_when_pool_is_full(monkeypatch):
+    pool = InferencePool(workers=1, queue_size=0)
+    assert pool._slots.acquire(blocking=False)  # kapasitas habis
+    monkeypatch.setattr(main, "inference_pool", pool)
+    monkeypatch.setitem(main.app.dependency_overrides, readiness.require_ready, lambda: None)
+
+    started = time.perf_counter()
+    resp = TestClient(main.app).post(
+        "/v1/recognize_multi",
+        files={"file": ("frame.jpg", b"jpeg", "image/jpeg")},
+        headers={"X-Device-Id": "test_device", "X-Device-Token": "test_token"},
+    )
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert time.perf_counter() - started < 1.0
+    assert pool.stats()["rejected"] == 1
+    pool.shutdown()
+
+
+def test_recognize_opens_its_session_inside_the_job(monkeypatch, memory_engine):
+    events = []
+
+    class TrackedSession(Session):
+        def close(self):
+            events.append(("close", threading.current_thread().name))
+            super().close()
+
+    def fake_recognize(img_bytes, device_id, db):
+        events.append(("job", threading.current_thread().name, isinstance(db, TrackedSession)))
+        return {"status": "no_face", "device_id": device_id, "faces": []}
+
+    pool = InferencePool(workers=1, queue_size=0)
+    monkeypatch.setattr(main, "inference_pool", pool)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=memory_engine, class_=TrackedSession))
+    monkeypatch.setattr(main, "_recognize_and_record", fake_recognize)
+    monkeypatch.setitem(main.app.dependency_overrides, readiness.require_ready, lambda: None)
+
+    resp = TestClient(main.app).post(
+        "/v1/recognize_multi",
+        files={"file": ("frame.jpg", b"jpeg", "image/jpeg")},
+        headers={"X-Device-Id": "test_device", "X-Device-Token": "test_token"},
+    )
+
+    assert resp.status_code == 200
+    (_, job_thread, tracked), (_, close_thread) = events
+    assert tracked
+    # Dibuka dan ditutup di thread pool yang sama, bukan oleh dependency request
+    assert job_thread == close_thread
+    assert job_thread.startswith("inference")
+    pool.shutdown()
@@ -0,0 +1,69 @@
+"""
+PolicyData pre-parsed + cache yang dibangun ulang hanya saat row policy berubah
+atau generation policy lintas worker naik.
+"""
+from datetime import time as dtime
+
+import pytest
+
+from app import admin_policy, shared_generation
+from app import policy as policy_module
+from app.models import AttendancePolicy
+from app.policy import PolicyData, get_policy
+
+
+def test_policy_times_are_parsed_once():
+    policy = PolicyData(timezone="UTC", late_after_time="08:30", out_start_time="bad", out_end_time="17:45")
+    assert policy.tz.key == "UTC"
+    assert policy.late_after == dtime(8, 30)
+    assert policy.out_start == dtime(8, 0)  # fallback
+    assert policy.out_end == dtime(17, 45)
+
+
+def test_unchanged_row_reuses_compiled_policy(db, monkeypatch):
+    first = get_policy(db)
+    monkeypatch.setattr(policy_module, "_CHECK_INTERVAL", 0.0)
+    assert get_policy(db) is first
+
+
+def test_changed_row_rebuilds_policy(db, monkeypatch):
+    monkeypatch.setattr(policy_module, "_CHECK_INTERVAL", 0.0)
+    first = get_policy(db)
+    row = db.get(AttendancePolicy, 1)
+    row.late_after_time = "09:15"
+    db.commit()
+
+    second = get_policy(db)
+    assert second is not first
+    assert second.late_after == dtime(9, 15)
+    assert second.updated_at >= first.updated_at
+
+
+def test_cached_policy_skips_db_until_generation_changes(db):
+    first = get_policy(db)
+    row = db.get(AttendancePolicy, 1)
+    row.late_after_time = "09:15"
+    db.commit()
+    assert get_policy(db) is first  # edit di luar aplikasi: tunggu backstop atau generation
+
+    shared_generation.bump("policy")  # worker lain menyimpan policy
+    assert get_policy(db).late_after == dtime(9, 15)
+
+
+def test_admin_policy_update_applies_immediately(db, admin_client):
+    client = admin_client(admin_policy.router)
+    assert get_policy(db).late_after == dtime(8, 0)
+    generation = shared_generation.current("policy")
+
+    resp = client.put("/admin/policy", json={"late_after_time": "08:45", "timezone": "UTC"})
+    assert resp.status_code == 200
+    assert resp.json()["late_after_time"] == "08:45"
+    assert shared_generation.current("policy") == generation + 1
+    assert get_policy(db).late_after == dtime(8, 45)
+    assert get_policy(db).tz.key == "UTC"
+
+
+@pytest.mark.parametrize("payload", [{}, {"out_end_time": "25:00"}, {"timezone": "Mars/Base"}, {"retention_days": 0}])
+def test_admin_policy_rejects_invalid_payload(db, admin_client, payload):
+    client = admin_client(admin_policy.router)
+    assert client.put("/admin/policy", json=payload).status_code == 400
@@ -0,0 +1,42 @@
+"""
+Test liveness (/health) vs readiness (/ready) selama model masih dimuat.
+"""
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import pytest
+
+from app import readiness
+from app.main import app
+
+# Tanpa context manager → startup event (warm-up model) tidak dijalankan
+client = TestClient(app)
+
+
+@pytest.fixture
+def restore_state():
+    saved = dict(readiness._STATE)
+    yield
+    readiness._STATE.update(saved)
+
+
+def test_health_is_live_while_models_load(restore_state):
+    readiness.set_status("models", "loading")
+
+    assert client.get("/health").status_code == 200
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["models"] == "loading"
+    assert response.json()["status"] == "not_ready"
+
+
+def test_require_ready_returns_retry_after(restore_state):
+    readiness.set_status("models", "ready")
+    readiness.set_status("gallery", "loading")
+    with pytest.raises(HTTPException) as exc:
+        readiness.require_ready()
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+
+    readiness.set_status("gallery", "ready")
+    readiness.require_ready()
+    assert client.get("/ready").status_code == 200
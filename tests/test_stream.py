@@ -0,0 +1,105 @@
+"""
+Test WebSocket streaming recognition (/v1/stream).
+"""
+import time
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from starlette.websockets import WebSocketDisconnect
+
+from app import main, readiness
+from app.database import Base
+from app.main import app
+from app.models import Person
+
+client = TestClient(app)
+
+_HEADERS = {"x-device-id": "cam-1", "x-device-token": "secret"}
+
+
+@pytest.fixture
+def stream_env(monkeypatch):
+    calls: list[bytes] = []
+
+    def fake_recognize(img_bytes, device_id, db):
+        calls.append(img_bytes)
+        time.sleep(0.2)  # inference lambat → frame yang menumpuk harus dibuang
+        return {"status": "ok", "device_id": device_id, "faces": [], "recognized_names": []}
+
+    monkeypatch.setattr(main, "DEVICE_TOKEN_MAP", {"cam-1": "secret"})
+    monkeypatch.setattr(main, "_recognize_and_record", fake_recognize)
+    monkeypatch.setitem(readiness._STATE, "models", "ready")
+    monkeypatch.setitem(readiness._STATE, "gallery", "ready")
+    return calls
+
+
+def test_stream_rejects_unknown_device(stream_env):
+    with pytest.raises(WebSocketDisconnect) as exc, client.websocket_connect(
+        "/v1/stream", headers={"x-device-id": "cam-1", "x-device-token": "wrong"}
+    ):
+        pass
+    assert exc.value.code == 1008
+
+
+def test_stream_drops_stale_frames(stream_env):
+    with client.websocket_connect("/v1/stream", headers=_HEADERS) as ws:
+        for i in range(5):
+            ws.send_bytes(b"frame-%d" % i)
+        first = ws.receive_json()
+        assert first["status"] == "ok"
+        assert first["device_id"] == "cam-1"
+
+        # Frame berikutnya yang diproses adalah yang terbaru, bukan antrian lama
+        last = first
+        while last["seq"] < 5:
+            last = ws.receive_json()
+
+    assert stream_env[-1] == b"frame-4"
+    assert len(stream_env) < 5
+    assert last["dropped"] == 5 - len(stream_env)
+
+
+@pytest.fixture
+def snapshot_sessions(tmp_path, monkeypatch):
+    """
+    SQLite WAL + BEGIN eksplisit: transaksi yang sudah membaca tetap melihat snapshot
+    lamanya (seperti REPEATABLE READ di MySQL) sampai commit/rollback.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'stream.db'}",
+        connect_args={"check_same_thread": False, "isolation_level": None},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(main, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def test_stream_frame_sees_writes_committed_between_frames(stream_env, snapshot_sessions, monkeypatch):
+    def count_persons(img_bytes, device_id, db):
+        return {"status": "ok", "device_id": device_id, "persons": db.query(Person).count()}
+
+    monkeypatch.setattr(main, "_recognize_and_record", count_persons)
+    with client.websocket_connect("/v1/stream", headers=_HEADERS) as ws:
+        ws.send_bytes(b"frame-0")
+        assert ws.receive_json()["persons"] == 0
+
+        # Enroll dari worker lain di antara dua frame
+        with snapshot_sessions() as other:
+            other.add(Person(name="alice"))
+            other.commit()
+
+        ws.send_bytes(b"frame-1")
+        assert ws.receive_json()["persons"] == 1
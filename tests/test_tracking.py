@@ -0,0 +1,92 @@
+"""
+Test tracker wajah lintas frame (reuse identitas tanpa embedding ulang).
+"""
+from app import main
+from app.tracking import FaceTracker
+
+_OK = {"status": "ok", "name": "alice", "distance": 0.4}
+
+
+def _face(x: int, confidence: float = 0.99) -> dict:
+    return {"bbox": [x, 100, x + 120, 240], "confidence": confidence}
+
+
+def test_identity_is_reused_until_track_is_stale():
+    tracker = FaceTracker(reuse_frames=2, ttl_seconds=10)
+    [track] = tracker.match([_face(100)], now=0.0)
+    assert track is None
+    track = tracker.observe(None, _face(100), _OK, embedded=True, gallery_version=1, now=0.0)
+
+    reused = 0
+    for step in range(1, 5):
+        face = _face(100 + 5 * step)  # bergerak sedikit → tetap track yang sama
+        [matched] = tracker.match([face], now=step * 0.1)
+        assert matched is track
+        if tracker.reusable(matched, face, gallery_version=1, now=step * 0.1):
+            reused += 1
+            tracker.observe(matched, face, _OK, embedded=False, gallery_version=1, now=step * 0.1)
+        else:
+            tracker.observe(matched, face, _OK, embedded=True, gallery_version=1, now=step * 0.1)
+    # reuse_frames=2 → 2 frame dipakai ulang, frame ke-3 embed ulang, lalu reuse lagi
+    assert reused == 3
+
+
+def test_new_face_low_confidence_or_gallery_change_forces_embedding():
+    tracker = FaceTracker(reuse_frames=5, ttl_seconds=10)
+    track = tracker.observe(None, _face(100), _OK, embedded=True, gallery_version=1, now=0.0)
+
+    assert tracker.match([_face(900)], now=0.1) == [None]
+    assert not tracker.reusable(track, _face(100, confidence=0.8), gallery_version=1, now=0.1)
+    assert not tracker.reusable(track, _face(100), gallery_version=2, now=0.1)
+    assert tracker.reusable(track, _face(100), gallery_version=1, now=0.1)
+
+
+def test_unknown_faces_and_expired_tracks_are_not_reused():
+    tracker = FaceTracker(reuse_frames=5, ttl_seconds=1)
+    unknown = tracker.observe(
+        None, _face(100), {"status": "unknown", "name": None, "distance": 1.2}, embedded=True, gallery_version=1, now=0.0
+    )
+    assert not tracker.reusable(unknown, _face(100), gallery_version=1, now=0.1)
+
+    tracker.observe(None, _face(500), _OK, embedded=True, gallery_version=1, now=0.0)
+    assert tracker.match([_face(500)], now=5.0) == [None]
+
+
+def test_small_face_is_not_reused():
+    tracker = FaceTracker(reuse_frames=5, ttl_seconds=10, min_face_px=80)
+    track = tracker.observe(None, _face(100), _OK, embedded=True, gallery_version=1, now=0.0)
+
+    # Sama dengan identify_faces: wajah < MIN_FACE_PX tidak boleh dikenali
+    assert not tracker.reusable(track, {**_face(100), "face_px": 60}, gallery_version=1, now=0.1)
+    assert tracker.reusable(track, {**_face(100), "face_px": 120}, gallery_version=1, now=0.1)
+
+
+def test_other_person_in_same_spot_does_not_take_over_track():
+    tracker = FaceTracker(reuse_frames=5, ttl_seconds=10)
+    big = {"bbox": [100, 100, 300, 340], "confidence": 0.99}
+    tracker.observe(None, big, _OK, embedded=True, gallery_version=1, now=0.0)
+
+    # Wajah lain di depan/belakang posisi yang sama: overlap kecil, centroid dekat
+    other = {"bbox": [120, 120, 220, 220], "confidence": 0.99}
+    assert tracker.match([other], now=0.1) == [None]
+
+
+def test_reused_identity_is_not_recorded(monkeypatch):
+    faces = [
+        {"queue_id": 0, "bbox": [0, 0, 100, 100], "status": "ok", "name": "alice", "distance": 0.4, "tracked": False},
+        {"queue_id": 1, "bbox": [200, 0, 300, 100], "status": "ok", "name": "bob", "distance": 0.5, "tracked": True},
+    ]
+    recorded = []
+
+    def fake_record_batch(db, items, **kwargs):
+        recorded.extend(item["person_name"] for item in items)
+        return [{"status": "ok", "event_type": "in", "is_late": False} for _ in items]
+
+    monkeypatch.setattr(main, "identify_multiple", lambda *a, **k: {"status": "ok", "faces": faces})
+    monkeypatch.setattr(main, "get_policy", lambda db: None)
+    monkeypatch.setattr(main, "record_batch", fake_record_batch)
+
+    result = main._recognize_and_record(b"jpeg", "cam-1", db=None)
+    assert recorded == ["alice"]
+    assert result["recognized_names"] == ["alice"]
+    assert [f["status"] for f in result["faces"]] == ["ok", "tracked"]